@@ -0,0 +1,100 @@
+"""
+Incremental aggregates of an analysis result set.
+
+Metric cards, charts and the analyse.py summary all read from one
+ResultAggregates instead of rescanning the full DataFrame. Rows can be added
+chunk by chunk as they stream in.
+"""
+
+from collections import Counter
+from typing import Dict, List, Union
+
+import numpy as np
+import pandas as pd
+
+SENTIMENTS = ['positive', 'neutral', 'negative']
+
+CONFIDENCE_BINS = 20
+
+
+def _counts(series: pd.Series) -> Dict:
+    """Non-zero value counts (categorical columns also list unused categories)."""
+    counts = series.value_counts()
+    return counts[counts > 0].to_dict()
+
+
+class ResultAggregates:
+    """
+    Counts by sentiment, theme and topic, theme x sentiment crosstab and a
+    confidence histogram, all updated incrementally.
+    """
+
+    def __init__(self, bins: int = CONFIDENCE_BINS):
+        self.total = 0
+        self.sentiments = Counter()
+        self.themes = Counter()
+        self.topics = Counter()
+        self.crosstab = Counter()
+        self.confidence_edges = np.linspace(0.0, 1.0, bins + 1)
+        self.confidence_counts = np.zeros(bins, dtype=np.int64)
+        self.confidence_sum = 0.0
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "ResultAggregates":
+        """Build aggregates for a complete result set."""
+        aggregates = cls()
+        if df is not None and len(df) > 0:
+            aggregates.update(df)
+        return aggregates
+
+    def update(self, rows: Union[pd.DataFrame, List[Dict]]):
+        """
+        Add a chunk of analyzed rows.
+
+        Args:
+            rows: DataFrame or list of record dicts with sentiment, theme, topic and confidence
+        """
+        chunk = rows if isinstance(rows, pd.DataFrame) else pd.DataFrame(rows)
+        if chunk.empty:
+            return
+
+        self.total += len(chunk)
+        self.sentiments.update(_counts(chunk['sentiment']))
+        if 'theme' in chunk:
+            self.themes.update(_counts(chunk['theme']))
+            self.crosstab.update(chunk.groupby(['theme', 'sentiment'], observed=True).size().to_dict())
+        if 'topic' in chunk:
+            self.topics.update(_counts(chunk['topic']))
+
+        confidence = chunk['confidence'].dropna().to_numpy(dtype=np.float64)
+        self.confidence_sum += float(confidence.sum())
+        counts, _ = np.histogram(np.clip(confidence, 0.0, 1.0), bins=self.confidence_edges)
+        self.confidence_counts += counts
+
+    @property
+    def mean_confidence(self) -> float:
+        return self.confidence_sum / self.total if self.total else 0.0
+
+    def sentiment_count(self, sentiment: str) -> int:
+        return self.sentiments.get(sentiment, 0)
+
+    def top_themes(self, n: int = None) -> pd.Series:
+        """Theme counts, most frequent first."""
+        return pd.Series(dict(self.themes.most_common(n)), dtype=np.int64)
+
+    def top_topics(self, n: int = None) -> pd.Series:
+        """Topic counts, most frequent first."""
+        return pd.Series(dict(self.topics.most_common(n)), dtype=np.int64)
+
+    def sentiment_distribution(self) -> pd.Series:
+        """Sentiment counts, most frequent first."""
+        return pd.Series(dict(self.sentiments.most_common()), dtype=np.int64)
+
+    def crosstab_frame(self) -> pd.DataFrame:
+        """Theme x sentiment counts, like pd.crosstab(df['theme'], df['sentiment'])."""
+        if not self.crosstab:
+            return pd.DataFrame()
+        frame = pd.Series(self.crosstab).unstack(fill_value=0)
+        frame.index.name = 'theme'
+        frame.columns.name = 'sentiment'
+        return frame.sort_index()
@@ -1,12 +1,24 @@
 import os
+import argparse
 import logging
-import pandas as pd
 from pathlib import Path
 from dotenv import load_dotenv
-from typing import List
+from typing import Callable, Dict, List
 import json
+from PIL import Image
 import google.generativeai as genai
 from transformers import pipeline, CamembertTokenizer, AutoModelForSequenceClassification
+from label_index import LabelIndex
+from aggregates import ResultAggregates
+from columnar import RecordBuilder, ResultsWriter
+from store import ResultsStore, new_batch_id
+from profiling import PROFILE, api_call, instrument_pipeline, span, timed
+from metrics import COMMENTS_PROCESSED, MODEL_BATCH_SIZE, start_metrics_server
+from cassette import MODES as CASSETTE_MODES, Cassette
+from memory import MemoryBudget, budget_limit_from_env, peak_rss_mb
+from cascade import CascadeSentimentModel, cascade_from_path
+from prefilter import AnalysisCache, CommentFilter
+from model_server import ModelServerError, RemoteSentimentModel
 
 load_dotenv()
 
@@ -41,13 +53,54 @@ Example output format:
 ["First comment here", "Second comment here", "Third comment here"]
 """
 
-def load_models():
+# Prompt for extracting several screenshots in one request
+PROMPT_EXTRACT_MULTI = """Extract all user comments from each of the {count} screenshots below.
+Each screenshot is preceded by its label, "Image 0" to "Image {last}".
+
+Return a JSON object with one key per screenshot number ("0" to "{last}"), whose value is the
+array of comment strings found in that screenshot. Just the object, nothing else.
+
+Rules:
+- Every screenshot number must be present, with an empty array if it has no comments
+- Never attribute a comment to another screenshot than the one it appears in
+- Include only the actual comment text, not usernames, timestamps, or UI elements
+- Each comment should be a separate string in the array
+- Preserve the original text exactly as written
+- If a comment spans multiple lines, keep it as one string
+- Skip empty or duplicate comments
+- Maintain the order of comments as they appear
+
+Example output format:
+{{"0": ["First comment of image 0", "Second comment of image 0"], "1": ["Only comment of image 1"]}}
+"""
+
+# Packing limits: screenshots per request, and total pixels per request
+MAX_PACK_IMAGES = 8
+MAX_PACK_PIXELS = 6_000_000
+
+def load_models(cascade_model: str = None, cascade_threshold: float = None, model_server: str = None):
     """
     Load models for sentiment analysis.
     
+    Args:
+        cascade_model: First stage of the sentiment cascade (see cascade.py); None reads
+            SENTIMENTPRO_CASCADE_MODEL, an empty string loads the pipeline alone
+        cascade_threshold: Escalation threshold overriding the calibrated one
+        model_server: Socket of a shared model server (see model_server.py); None reads
+            SENTIMENTPRO_MODEL_SOCKET, an empty string always loads the model in this process
+    
     Returns:
-        tuple: sentiment pipeline
+        tuple: sentiment pipeline, the cascade wrapping it, or a client of the model server
     """
+    if model_server is None:
+        model_server = os.getenv("SENTIMENTPRO_MODEL_SOCKET")
+    if model_server:
+        remote = RemoteSentimentModel(model_server)
+        if remote.ping():
+            logger.info(f"Using the shared model server on {model_server}")
+            return remote
+        logger.warning(f"Model server {model_server} not reachable, loading the model in this process")
+    
     logger.info("="*80)
     logger.info("MODEL LOADING")
     logger.info("="*80)
@@ -66,8 +119,18 @@ def load_models():
             tokenizer=tokenizer,
             device=-1
         )
+        instrument_pipeline(sentiment_pipeline)
         logger.info("Sentiment model loaded successfully")
         
+        if cascade_model is None:
+            cascade_model = os.getenv("SENTIMENTPRO_CASCADE_MODEL")
+            if cascade_threshold is None and os.getenv("SENTIMENTPRO_CASCADE_THRESHOLD"):
+                cascade_threshold = float(os.environ["SENTIMENTPRO_CASCADE_THRESHOLD"])
+        if cascade_model:
+            sentiment_pipeline = cascade_from_path(sentiment_pipeline, cascade_model, cascade_threshold)
+            logger.info(f"Sentiment cascade enabled: {cascade_model}, "
+                        f"escalating below {sentiment_pipeline.threshold} confidence")
+        
         logger.info("="*80)
         logger.info("SENTIMENT MODEL LOADED SUCCESSFULLY")
         logger.info("="*80)
@@ -79,12 +142,14 @@ def load_models():
         raise
 
 
-def extract_comments_from_screenshot(image_path: str):
+@timed("extract")
+def extract_comments_from_screenshot(image_path: str, uploaded_file=None):
     """
     Extract comments from screenshot using Gemini API.
     
     Args:
         image_path: Path to the screenshot image
+        uploaded_file: The image already uploaded with genai.upload_file, if any
         
     Returns:
         list: Extracted comment texts
@@ -92,8 +157,10 @@ def extract_comments_from_screenshot(image_path: str):
     try:
         logger.info(f"Processing image: {image_path}")
         
-        uploaded_file = genai.upload_file(image_path)
-        logger.info(f"Image uploaded successfully")
+        if uploaded_file is None:
+            with api_call("gemini.upload"):
+                uploaded_file = genai.upload_file(image_path)
+            logger.info(f"Image uploaded successfully")
         
         model = genai.GenerativeModel(
             model_name="gemini-2.0-flash",
@@ -102,7 +169,8 @@ def extract_comments_from_screenshot(image_path: str):
             }
         )
         
-        response = model.generate_content([PROMPT_EXTRACT, uploaded_file])
+        with api_call("gemini.extract"):
+            response = model.generate_content([PROMPT_EXTRACT, uploaded_file])
         
         result = json.loads(response.text)
         
@@ -131,6 +199,159 @@ def extract_comments_from_screenshot(image_path: str):
         return []
 
 
+def _image_pixels(image_path: str) -> int:
+    """Pixel count of an image, read from its header only."""
+    try:
+        with Image.open(image_path) as image:
+            width, height = image.size
+        return width * height
+    except Exception:
+        # Unreadable header: count it as a full pack so it is sent alone
+        return MAX_PACK_PIXELS
+
+
+def plan_extraction_packs(
+    image_paths: List[str],
+    max_images: int = MAX_PACK_IMAGES,
+    max_pixels: int = MAX_PACK_PIXELS
+):
+    """
+    Group consecutive screenshots into packs for multi-image extraction.
+    
+    Small screenshots are packed together up to max_images, large ones get
+    smaller packs so that a request stays under max_pixels; a screenshot
+    larger than max_pixels is sent alone.
+    
+    Args:
+        image_paths: Screenshot paths, in processing order
+        max_images: Most screenshots per request
+        max_pixels: Most pixels per request
+    
+    Returns:
+        list: Lists of paths, one per request, in the original order
+    """
+    packs = []
+    pack, pack_pixels = [], 0
+    for image_path in image_paths:
+        pixels = _image_pixels(image_path)
+        if pack and (len(pack) >= max_images or pack_pixels + pixels > max_pixels):
+            packs.append(pack)
+            pack, pack_pixels = [], 0
+        pack.append(image_path)
+        pack_pixels += pixels
+    if pack:
+        packs.append(pack)
+    return packs
+
+
+def _parse_packed_comments(text: str, count: int) -> List[List[str]]:
+    """Comment lists of a multi-image response, by image position; ValueError if incomplete."""
+    result = json.loads(text)
+    if isinstance(result, list):
+        result = {str(item.get("image", item.get("index"))): item.get("comments", []) for item in result}
+    if not isinstance(result, dict):
+        raise ValueError(f"unexpected response format: {type(result).__name__}")
+    comments = []
+    for index in range(count):
+        image_comments = result.get(str(index), result.get(f"Image {index}"))
+        if not isinstance(image_comments, list):
+            raise ValueError(f"no comment list for image {index}")
+        comments.append([comment for comment in image_comments if isinstance(comment, str)])
+    return comments
+
+
+def extract_comments_from_screenshots(image_paths: List[str], uploads: Dict[str, object] = None):
+    """
+    Extract comments from several screenshots with one Gemini request.
+    
+    When the response cannot be parsed or misses a screenshot, the pack is
+    split in two and each half retried; a single screenshot falls back to
+    extract_comments_from_screenshot.
+    
+    Args:
+        image_paths: Screenshots of one pack (see plan_extraction_packs)
+        uploads: Already uploaded files by path, reused across retries
+        
+    Returns:
+        dict: Extracted comment texts by image path
+    """
+    uploads = uploads if uploads is not None else {}
+    if len(image_paths) == 1:
+        return {image_paths[0]: extract_comments_from_screenshot(image_paths[0], uploads.get(image_paths[0]))}
+    
+    try:
+        logger.info(f"Processing {len(image_paths)} images in one request: {', '.join(image_paths)}")
+        
+        # One "extract" occurrence per image; failed attempts are timed too
+        with span("extract", items=len(image_paths)):
+            contents = [PROMPT_EXTRACT_MULTI.format(count=len(image_paths), last=len(image_paths) - 1)]
+            for index, image_path in enumerate(image_paths):
+                if image_path not in uploads:
+                    with api_call("gemini.upload"):
+                        uploads[image_path] = genai.upload_file(image_path)
+                contents.extend([f"Image {index}:", uploads[image_path]])
+            
+            model = genai.GenerativeModel(
+                model_name="gemini-2.0-flash",
+                generation_config={
+                    "response_mime_type": "application/json",
+                }
+            )
+            
+            with api_call("gemini.extract_pack"):
+                response = model.generate_content(contents)
+            
+            comments = _parse_packed_comments(response.text, len(image_paths))
+        logger.info(f"Extracted {sum(len(c) for c in comments)} comment(s) from {len(image_paths)} image(s)")
+        return dict(zip(image_paths, comments))
+        
+    except Exception as e:
+        middle = len(image_paths) // 2
+        logger.warning(f"Packed extraction of {len(image_paths)} images failed ({e}), "
+                       f"retrying as {middle} + {len(image_paths) - middle}")
+    
+    results = extract_comments_from_screenshots(image_paths[:middle], uploads)
+    results.update(extract_comments_from_screenshots(image_paths[middle:], uploads))
+    return results
+
+
+def map_sentiment_label(label: str, score: float):
+    """
+    Map a raw model label to positive/negative/neutral.
+    
+    Args:
+        label: Label returned by the sentiment pipeline
+        score: Score returned by the sentiment pipeline
+        
+    Returns:
+        tuple: (sentiment_label, confidence_score)
+    """
+    # Robust handling for different label formats
+    label_lower = label.lower()
+
+    if 'star' in label_lower:
+        # This handles the output of models like 'nlptown/bert-base-multilingual-uncased-sentiment'.
+        # This strongly suggests that the intended model ('cmarkea/distilcamembert-base-sentiment')
+        # may not have loaded correctly.
+        logger.warning(f"Unexpected 'star' label found: '{label}'. Mapping to standard sentiment.")
+        if label_lower in ['1 star', '2 stars']:
+            return 'negative', score
+        elif label_lower == '3 stars':
+            return 'neutral', score
+        else: # 4 and 5 stars
+            return 'positive', score
+    
+    # This is the expected path for 'cmarkea/distilcamembert-base-sentiment'
+    # which returns 'POSITIVE', 'NEGATIVE', 'NEUTRAL'.
+    if label_lower in ['positive', 'negative', 'neutral']:
+        return label_lower, score
+    
+    # Fallback for any other unexpected labels
+    logger.warning(f"Unexpected label format: '{label}'. Defaulting to neutral.")
+    return "neutral", score
+
+
+@timed("sentiment")
 def analyze_sentiment_french(text: str, sentiment_model):
     """
     Analyze sentiment of French text, with robust handling for different model outputs.
@@ -143,39 +364,48 @@ def analyze_sentiment_french(text: str, sentiment_model):
         tuple: (sentiment_label, confidence_score)
     """
     try:
+        MODEL_BATCH_SIZE.observe(1)
         result = sentiment_model(text[:512])[0]
-        label = result['label']
-        score = result['score']
-
-        # Robust handling for different label formats
-        label_lower = label.lower()
-
-        if 'star' in label_lower:
-            # This handles the output of models like 'nlptown/bert-base-multilingual-uncased-sentiment'.
-            # This strongly suggests that the intended model ('cmarkea/distilcamembert-base-sentiment')
-            # may not have loaded correctly.
-            logger.warning(f"Unexpected 'star' label found: '{label}'. Mapping to standard sentiment.")
-            if label_lower in ['1 star', '2 stars']:
-                return 'negative', score
-            elif label_lower == '3 stars':
-                return 'neutral', score
-            else: # 4 and 5 stars
-                return 'positive', score
-        
-        # This is the expected path for 'cmarkea/distilcamembert-base-sentiment'
-        # which returns 'POSITIVE', 'NEGATIVE', 'NEUTRAL'.
-        if label_lower in ['positive', 'negative', 'neutral']:
-            return label_lower, score
-        
-        # Fallback for any other unexpected labels
-        logger.warning(f"Unexpected label format: '{label}'. Defaulting to neutral.")
-        return "neutral", score
+        return map_sentiment_label(result['label'], result['score'])
         
+    except (ModelServerError, OSError):
+        # An unreachable model server is not a neutral comment
+        raise
     except Exception as e:
         logger.error(f"Error analyzing sentiment: {e}", exc_info=True)
         return "neutral", 0.0
 
 
+def analyze_sentiment_batch(texts: List[str], sentiment_model, batch_size: int = 32):
+    """
+    Analyze sentiment of many French texts in batched forward passes.
+    
+    Args:
+        texts: Texts to analyze
+        sentiment_model: Sentiment analysis pipeline
+        batch_size: Number of texts per forward pass
+        
+    Returns:
+        list: (sentiment_label, confidence_score) tuples, aligned with texts
+    """
+    if not texts:
+        return []
+    try:
+        for start in range(0, len(texts), batch_size):
+            MODEL_BATCH_SIZE.observe(min(batch_size, len(texts) - start))
+        with span("sentiment", items=len(texts)):
+            results = sentiment_model([text[:512] for text in texts], batch_size=batch_size)
+        return [map_sentiment_label(result['label'], result['score']) for result in results]
+        
+    except (ModelServerError, OSError):
+        # An unreachable model server is not a batch of neutral comments
+        raise
+    except Exception as e:
+        logger.error(f"Error analyzing sentiment batch: {e}", exc_info=True)
+        return [("neutral", 0.0)] * len(texts)
+
+
+@timed("topic")
 def identify_topic_and_theme(text: str):
     """
     Identify topic and theme using Gemini API.
@@ -215,7 +445,8 @@ Output:
             }
         )
         
-        response = model.generate_content(prompt)
+        with api_call("gemini.topic"):
+            response = model.generate_content(prompt)
         
         result = json.loads(response.text)
         
@@ -235,9 +466,165 @@ Output:
         return "Non défini", "Non défini"
 
 
+def identify_topics_and_themes_batch(texts: List[str], batch_size: int = 20):
+    """
+    Identify topic and theme for many comments, several comments per Gemini call.
+    
+    Args:
+        texts: Comment texts to analyze
+        batch_size: Number of comments sent in one prompt
+        
+    Returns:
+        list: (topic, theme) tuples, aligned with texts
+    """
+    results = []
+    model = genai.GenerativeModel(
+        model_name="gemini-2.0-flash",
+        generation_config={
+            "response_mime_type": "application/json",
+        }
+    )
+    
+    for start in range(0, len(texts), batch_size):
+        chunk = texts[start:start + batch_size]
+        numbered = "\n".join(f'{i}. "{text}"' for i, text in enumerate(chunk))
+        prompt = f"""
+Analyze each of the following numbered user comments and generate a relevant 'topic' and 'theme' for each.
+
+Comments:
+{numbered}
+
+Rules:
+- The 'theme' should be a single, high-level category (e.g., "Qualité de service", "Problème technique", "Avis général").
+- The 'topic' should be a more specific sub-category of the theme (e.g., "Réactivité du support", "Panne de réseau", "Félicitations").
+- Both topic and theme must be in French.
+- Return a JSON array with one object per comment, in the same order, each with the keys "index", "topic" and "theme".
+"""
+        try:
+            with api_call("gemini.topic_batch"):
+                response = model.generate_content(prompt)
+            parsed = json.loads(response.text)
+            by_index = {
+                int(item["index"]): (item.get("topic", "Généré par IA"), item.get("theme", "Généré par IA"))
+                for item in parsed
+            }
+            if len(by_index) != len(chunk):
+                raise ValueError(f"expected {len(chunk)} items, got {len(by_index)}")
+            results.extend(by_index.get(i, ("Non défini", "Non défini")) for i in range(len(chunk)))
+        except Exception as e:
+            # Fall back to one call per comment so a bad batch never loses labels
+            logger.warning(f"Batched topic/theme call failed ({e}), retrying comment by comment")
+            results.extend(identify_topic_and_theme(text) for text in chunk)
+    
+    return results
+
+
+def analyze_comments(
+    comments: List[str],
+    image_source: str,
+    sentiment_model,
+    theme_index: LabelIndex,
+    topic_index: LabelIndex,
+    on_record: Callable[[dict], None] = None,
+    analysis_cache: AnalysisCache = None
+):
+    """
+    Run sentiment and topic/theme analysis on the comments of one image.
+    
+    Args:
+        comments: Comment texts extracted from the image
+        image_source: File name recorded in each result
+        sentiment_model: Sentiment analysis pipeline
+        theme_index: Canonical theme labels
+        topic_index: Canonical topic labels
+        on_record: Called with each record as soon as its comment is analyzed
+        analysis_cache: Results of comments already analyzed in the run, reused for repeats
+    
+    Returns:
+        list: One dict per analyzed comment, following Entities/CommentAnalysis.json
+    """
+    records = []
+    
+    for comment_idx, comment in enumerate(comments, 1):
+        if not comment.strip() or len(comment) < 10:
+            continue
+        
+        logger.info(f"Analyzing comment {comment_idx}/{len(comments)}")
+        
+        analysis = analysis_cache.get(comment) if analysis_cache is not None else None
+        if analysis is None:
+            sentiment, confidence = analyze_sentiment_french(
+                comment,
+                sentiment_model
+            )
+            
+            topic, theme = identify_topic_and_theme(
+                comment
+            )
+            topic = topic_index.canonicalize(topic)
+            theme = theme_index.canonicalize(theme)
+            if analysis_cache is not None:
+                analysis_cache.put(comment, (sentiment, confidence, topic, theme))
+        else:
+            sentiment, confidence, topic, theme = analysis
+        
+        record = {
+            'image_source': image_source,
+            'comment': comment,
+            'sentiment': sentiment,
+            'confidence': round(confidence, 4),
+            'topic': topic,
+            'theme': theme
+        }
+        records.append(record)
+        COMMENTS_PROCESSED.labels(sentiment).inc()
+        if on_record is not None:
+            on_record(record)
+        
+        logger.info(f"Comment: {comment[:80]}...")
+        logger.info(f"Result: sentiment={sentiment} (conf={confidence:.2f}), topic={topic}, theme={theme}")
+    
+    return records
+
+
+def iter_extracted_comments(image_paths: List[str], pack_size: int = 1, budget: MemoryBudget = None):
+    """
+    Extract the comments of every screenshot, one request per image or per pack.
+    
+    Args:
+        image_paths: Screenshot paths
+        pack_size: Most screenshots per request; packs are planned by plan_extraction_packs
+        budget: Memory budget; each request waits for headroom first
+    
+    Yields:
+        tuple: (image path, extracted comment texts), in the order of image_paths
+    """
+    if pack_size > 1:
+        packs = plan_extraction_packs(image_paths, max_images=pack_size)
+        logger.info(f"Extracting {len(image_paths)} image(s) in {len(packs)} request(s)")
+    else:
+        packs = [[image_path] for image_path in image_paths]
+    
+    for pack in packs:
+        if budget is not None and budget.wait_for_headroom():
+            logger.info(f"Memory budget: resumed at {budget.sample():.0f}/{budget.limit_mb:.0f} MB")
+        if len(pack) == 1:
+            yield pack[0], extract_comments_from_screenshot(pack[0])
+            continue
+        extracted = extract_comments_from_screenshots(pack)
+        for image_path in pack:
+            yield image_path, extracted.get(image_path, [])
+
+
 def process_multiple_images(
     image_paths: List[str],
-    sentiment_model
+    sentiment_model,
+    theme_index: LabelIndex = None,
+    topic_index: LabelIndex = None,
+    on_records: Callable[[List[dict]], None] = None,
+    budget: MemoryBudget = None,
+    pack_size: int = 1,
+    comment_filter: CommentFilter = None
 ):
     """
     Process multiple screenshots and create structured dataset.
@@ -245,55 +632,52 @@ def process_multiple_images(
     Args:
         image_paths: List of image file paths
         sentiment_model: Sentiment analysis pipeline
+        theme_index: Canonical theme labels (a fresh index is used if None)
+        topic_index: Canonical topic labels (a fresh index is used if None)
+        on_records: Called with the records of each image as soon as it is analyzed
+        budget: Memory budget; each extraction request waits for headroom first
+        pack_size: Most screenshots per extraction request (1 sends one request per image)
+        comment_filter: Normalizes and screens the extracted comments (a fresh filter is used if None)
     
     Returns:
-        pd.DataFrame: Structured dataset with all analyzed comments
+        pd.DataFrame: Structured dataset with all analyzed comments (categorical labels, float32 confidence)
     """
-    all_data = []
+    theme_index = theme_index if theme_index is not None else LabelIndex()
+    topic_index = topic_index if topic_index is not None else LabelIndex()
+    comment_filter = comment_filter if comment_filter is not None else CommentFilter()
+    analysis_cache = AnalysisCache()
+    results = RecordBuilder()
     total_images = len(image_paths)
     
-    for img_idx, img_path in enumerate(image_paths, 1):
+    for img_idx, (img_path, comments) in enumerate(iter_extracted_comments(image_paths, pack_size, budget), 1):
         logger.info("="*80)
         logger.info(f"Processing image {img_idx}/{total_images}: {img_path}")
         logger.info("="*80)
         
-        comments = extract_comments_from_screenshot(img_path)
-        
+        with span("prefilter", items=len(comments)):
+            comments = comment_filter(comments)
         if not comments:
             logger.warning(f"No comments found in {img_path}")
             continue
         
-        for comment_idx, comment in enumerate(comments, 1):
-            if not comment.strip() or len(comment) < 10:
-                continue
-            
-            logger.info(f"Analyzing comment {comment_idx}/{len(comments)}")
-            
-            sentiment, confidence = analyze_sentiment_french(
-                comment,
-                sentiment_model
-            )
-            
-            topic, theme = identify_topic_and_theme(
-                comment
-            )
-            
-            all_data.append({
-                'image_source': os.path.basename(img_path),
-                'comment': comment,
-                'sentiment': sentiment,
-                'confidence': round(confidence, 4),
-                'topic': topic,
-                'theme': theme
-            })
-            
-            logger.info(f"Comment: {comment[:80]}...")
-            logger.info(f"Result: sentiment={sentiment} (conf={confidence:.2f}), topic={topic}, theme={theme}")
+        records = analyze_comments(
+            comments,
+            os.path.basename(img_path),
+            sentiment_model,
+            theme_index,
+            topic_index,
+            analysis_cache=analysis_cache
+        )
+        results.extend(records)
+        if on_records is not None:
+            on_records(records)
     
-    df = pd.DataFrame(all_data)
+    df = results.to_frame()
     
     logger.info("="*80)
     logger.info(f"PROCESSING COMPLETE: {len(df)} comments analyzed")
+    logger.info(f"Pre-filter: {comment_filter.describe()}")
+    logger.info(f"Repeated comments reusing an earlier analysis: {analysis_cache.hits}")
     logger.info("="*80)
     
     return df
@@ -319,12 +703,139 @@ def test_gemini_api():
         logger.error("="*80)
         return False
 
+def parse_args():
+    """
+    Parse command line arguments.
+    
+    Returns:
+        argparse.Namespace: Parsed arguments
+    """
+    parser = argparse.ArgumentParser(description="Comment sentiment and topic analysis")
+    parser.add_argument("--text-input", help="CSV/JSONL/Parquet comment export to analyze instead of screenshots")
+    parser.add_argument("--text-column", help="Column holding the comment text (auto-detected if omitted)")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="Rows read and analyzed at a time")
+    parser.add_argument("--output", default="comments_dataset_final.csv", help="Output CSV file")
+    parser.add_argument(
+        "--columnar",
+        choices=["parquet", "arrow", "none"],
+        default="parquet",
+        help="Also write results incrementally to a columnar file next to the CSV"
+    )
+    parser.add_argument(
+        "--profile",
+        help="Run profile JSON file (default: next to the output, with a .profile.json suffix)"
+    )
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        help="Serve Prometheus metrics on this local port while the run lasts"
+    )
+    parser.add_argument(
+        "--gemini-cassette",
+        default=os.getenv("SENTIMENTPRO_GEMINI_CASSETTE"),
+        help="Record Gemini responses to, or replay them from, this cassette file"
+    )
+    parser.add_argument(
+        "--gemini-mode",
+        choices=CASSETTE_MODES,
+        default=os.getenv("SENTIMENTPRO_GEMINI_MODE", "replay"),
+        help="record: call Gemini and store responses; replay: offline from the cassette; auto: replay or record"
+    )
+    parser.add_argument(
+        "--replay-latency-ms",
+        type=float,
+        default=float(os.environ["SENTIMENTPRO_REPLAY_LATENCY_MS"]) if os.getenv("SENTIMENTPRO_REPLAY_LATENCY_MS") else None,
+        help="Delay per replayed call (default: the latency measured when recording)"
+    )
+    parser.add_argument(
+        "--pack-images",
+        type=int,
+        default=1,
+        metavar="N",
+        help=f"Extract up to N screenshots per Gemini request, fewer for large images (e.g. {MAX_PACK_IMAGES})"
+    )
+    parser.add_argument(
+        "--model-server",
+        default=os.getenv("SENTIMENTPRO_MODEL_SOCKET"),
+        help="Send sentiment batches to the model server on this Unix socket instead of loading the model"
+    )
+    parser.add_argument(
+        "--cascade-model",
+        default=os.getenv("SENTIMENTPRO_CASCADE_MODEL"),
+        help="Score comments with this hashed n-gram first stage and escalate only uncertain ones to the transformer"
+    )
+    parser.add_argument(
+        "--cascade-threshold",
+        type=float,
+        default=float(os.environ["SENTIMENTPRO_CASCADE_THRESHOLD"]) if os.getenv("SENTIMENTPRO_CASCADE_THRESHOLD") else None,
+        help="First-stage confidence below which a comment is escalated (default: the calibrated threshold)"
+    )
+    parser.add_argument(
+        "--memory-budget-mb",
+        type=float,
+        default=budget_limit_from_env(),
+        help="Hold back new images/chunks while the process is near this RSS and keep results in compact dtypes"
+    )
+    return parser.parse_args()
+
+
+def log_run_profile(profile_path: str, comments: int, budget: MemoryBudget = None, sentiment_model=None):
+    """
+    Log the per-stage timing profile of the run and write it as JSON.
+    
+    Args:
+        profile_path: JSON file receiving the profile
+        comments: Number of comments analyzed during the run
+        budget: Memory budget of the run, if any (its report is included)
+        sentiment_model: Sentiment model of the run; cascade routing stats are included for a cascade
+    """
+    wall = PROFILE.report()['wall_seconds']
+    memory = budget.report() if budget is not None else {'process_peak_rss_mb': round(peak_rss_mb(), 1)}
+    cascade = sentiment_model.stats() if isinstance(sentiment_model, CascadeSentimentModel) else None
+    report = PROFILE.write_json(
+        profile_path,
+        comments=comments,
+        comments_per_second=round(comments / wall, 3) if wall > 0 else None,
+        memory=memory,
+        cascade=cascade
+    )
+    
+    logger.info("="*80)
+    logger.info("RUN PROFILE")
+    logger.info("="*80)
+    logger.info(f"\nWall time: {report['wall_seconds']:.1f}s, {comments} comment(s), "
+                f"{report['comments_per_second'] or 0:.2f} comment(s)/s")
+    if budget is not None:
+        logger.info(f"Memory: peak {memory['peak_rss_mb']:.0f} MB of a {memory['limit_mb']:.0f} MB budget, "
+                    f"held back {memory['throttled']} time(s) for {memory['throttle_seconds']:.1f}s")
+    else:
+        logger.info(f"Memory: peak {memory['process_peak_rss_mb']:.0f} MB")
+    if cascade is not None:
+        logger.info(f"Sentiment cascade: {cascade['escalated']}/{cascade['comments']} comment(s) escalated "
+                    f"to the model (threshold {cascade['threshold']})")
+    logger.info("\nStage timings:")
+    logger.info(PROFILE.frame().drop(columns='mean_ms').to_string())
+    logger.info("\nAPI calls:")
+    for api, outcomes in sorted(report['api_calls'].items()):
+        logger.info(f"  {api}: " + ", ".join(f"{outcome}={count}" for outcome, count in sorted(outcomes.items())))
+    logger.info(f"\nProfile saved to: {profile_path}")
+
+
 def main():
     """
     Main execution function.
     """
+    args = parse_args()
+    
+    cassette = None
+    if args.gemini_cassette:
+        cassette = Cassette(args.gemini_cassette, mode=args.gemini_mode, latency_ms=args.replay_latency_ms)
+        cassette.activate()
+        logger.info(f"Gemini cassette {args.gemini_cassette} ({args.gemini_mode} mode, {len(cassette)} response(s))")
+    offline = cassette is not None and cassette.mode == 'replay'
+    
     # Verify that the Google API key is available
-    if not GOOGLE_API_KEY:
+    if not GOOGLE_API_KEY and not offline:
         logger.error("="*80)
         logger.error("FATAL: GOOGLE_API_KEY not found.")
         logger.error("Please make sure your .env file is correctly set up with your Google API key.")
@@ -332,10 +843,47 @@ def main():
         return  # Stop execution
 
     # Test Gemini API connection
-    if not test_gemini_api():
+    if not offline and not test_gemini_api():
         return  # Stop execution if test fails
 
-    sentiment_model = load_models()
+    if args.metrics_port is not None:
+        server = start_metrics_server(args.metrics_port)
+        logger.info(f"Metrics available at http://{server.server_address[0]}:{server.server_address[1]}/metrics")
+    
+    sentiment_model = load_models(args.cascade_model or "", args.cascade_threshold, args.model_server or "")
+    PROFILE.reset()
+    budget = MemoryBudget(args.memory_budget_mb) if args.memory_budget_mb else None
+    profile_path = args.profile or str(Path(args.output).with_suffix('.profile.json'))
+    
+    columnar_path = None
+    if args.columnar != "none":
+        columnar_path = str(Path(args.output).with_suffix(f".{args.columnar}"))
+    
+    store = ResultsStore()
+    batch_id = new_batch_id()
+    
+    if args.text_input:
+        from ingest import analyze_text_file
+        store.create_batch(batch_id, 'text')
+        summary = analyze_text_file(
+            args.text_input,
+            sentiment_model,
+            args.output,
+            text_column=args.text_column,
+            chunk_size=args.chunk_size,
+            columnar_path=columnar_path,
+            on_records=lambda records: store.add_records(batch_id, records),
+            budget=budget
+        )
+        logger.info(f"Results stored as batch {batch_id} in {store.db_path}")
+        logger.info("\nSentiment distribution:")
+        logger.info(summary['aggregates'].sentiment_distribution().to_string())
+        logger.info("\nSentiment by theme:")
+        logger.info(summary['aggregates'].crosstab_frame().to_string())
+        log_run_profile(profile_path, summary['analyzed'], budget, sentiment_model)
+        if cassette is not None:
+            logger.info(f"Gemini cassette: {cassette.stats}")
+        return
     
     images_folder = 'images'
     
@@ -359,40 +907,62 @@ def main():
         logger.error(f"Current directory: {Path.cwd()}")
         return
     
-    df_results = process_multiple_images(
-        image_paths,
-        sentiment_model
-    )
+    aggregates = ResultAggregates()
+    writer = ResultsWriter(columnar_path) if columnar_path else None
+    store.create_batch(batch_id, 'cli', images=len(image_paths))
+    
+    def on_records(records):
+        aggregates.update(records)
+        store.add_records(batch_id, records)
+        if writer is not None:
+            with span("export.columnar", items=len(records)):
+                writer.write_batch(records)
+    
+    try:
+        df_results = process_multiple_images(
+            image_paths,
+            sentiment_model,
+            on_records=on_records,
+            budget=budget,
+            pack_size=args.pack_images
+        )
+        logger.info(f"Results stored as batch {batch_id} in {store.db_path}")
+    finally:
+        if writer is not None:
+            writer.close()
+            logger.info(f"Columnar dataset saved to: {columnar_path} ({writer.rows} rows)")
     
     if len(df_results) > 0:
         logger.info("="*80)
         logger.info("RESULTS SUMMARY")
         logger.info("="*80)
         
-        logger.info(f"\nTotal comments: {len(df_results)}")
+        logger.info(f"\nTotal comments: {aggregates.total}")
         
         logger.info("\nSentiment distribution:")
-        logger.info(df_results['sentiment'].value_counts().to_string())
+        logger.info(aggregates.sentiment_distribution().to_string())
         
         logger.info("\nTop 10 topics:")
-        logger.info(df_results['topic'].value_counts().head(10).to_string())
+        logger.info(aggregates.top_topics(10).to_string())
         
         logger.info("\nTheme distribution:")
-        logger.info(df_results['theme'].value_counts().to_string())
+        logger.info(aggregates.top_themes().to_string())
         
-        logger.info(f"\nAverage confidence: {df_results['confidence'].mean():.4f}")
+        logger.info(f"\nAverage confidence: {aggregates.mean_confidence:.4f}")
         
         logger.info("\nSentiment by theme:")
-        logger.info(pd.crosstab(df_results['theme'], df_results['sentiment']).to_string())
+        logger.info(aggregates.crosstab_frame().to_string())
         
         # Sauvegarde des résultats
-        output_csv = 'comments_dataset_final.csv'
-        df_results.to_csv(output_csv, index=False, encoding='utf-8')
+        output_csv = args.output
+        with span("export.csv", items=len(df_results)):
+            df_results.to_csv(output_csv, index=False, encoding='utf-8')
         logger.info(f"\nDataset saved to: {output_csv}")
         
         try:
-            output_excel = 'comments_dataset_final.xlsx'
-            df_results.to_excel(output_excel, index=False)
+            output_excel = str(Path(output_csv).with_suffix('.xlsx'))
+            with span("export.excel", items=len(df_results)):
+                df_results.to_excel(output_excel, index=False)
             logger.info(f"Dataset also saved to: {output_excel}")
         except Exception as e:
             logger.info(f"Excel export skipped: {e}")
@@ -401,6 +971,10 @@ def main():
         logger.info(df_results.head(10).to_string())
     else:
         logger.warning("No comments were extracted from any images.")
+    
+    log_run_profile(profile_path, len(df_results), budget, sentiment_model)
+    if cassette is not None:
+        logger.info(f"Gemini cassette: {cassette.stats}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,320 @@
+"""
+HTTP API exposing the analyse.py pipeline to other services.
+
+Usage:
+    python api.py --port 8080 --workers 2
+
+Endpoints (JSON in, JSON out):
+    POST /v1/sentiment  {"texts": [...]}
+    POST /v1/extract    {"images": [{"name": "...", "data": "<base64>"}]}
+    POST /v1/analyze    {"images": [...]} or {"texts": [...]}, optional "batch_id"
+    GET  /v1/stats      latency percentiles per endpoint and batching metrics
+    GET  /metrics       Prometheus metrics of the worker process that answers
+    GET  /health
+
+Analysis records follow Entities/CommentAnalysis.json. /v1/analyze also
+saves them in the results store under the batch_id (source 'api'), so API
+runs are listed and reopened like app and CLI runs; reusing a batch_id
+appends to it. Comments extracted from images go through the same
+pre-filter as the app (its report is returned as "filtered"), and repeated
+comments reuse their first analysis. Each worker process keeps one warm
+sentiment model and coalesces concurrent requests into shared forward
+passes.
+"""
+
+import argparse
+import base64
+import binascii
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+from analyse import (
+    analyze_sentiment_batch,
+    extract_comments_from_screenshot,
+    identify_topics_and_themes_batch,
+    load_models,
+    logger,
+)
+from cassette import install_from_env
+from batching import DEFAULT_MAX_BATCH_SIZE, DEFAULT_MAX_WAIT_MS, MicroBatcher
+from label_index import LabelIndex
+from metrics import COMMENTS_PROCESSED, CONTENT_TYPE as METRICS_CONTENT_TYPE, REGISTRY
+from prefilter import AnalysisCache, CommentFilter
+from store import ResultsStore, new_batch_id
+
+MAX_BODY_BYTES = 64 * 1024 * 1024
+POST_ENDPOINTS = ("/v1/sentiment", "/v1/extract", "/v1/analyze")
+
+
+class ApiError(Exception):
+    """Client error reported as an HTTP 4xx response."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class LatencyTracker:
+    """Rolling window of request latencies per endpoint."""
+
+    def __init__(self, window: int = 10000):
+        self._lock = threading.Lock()
+        self._samples: Dict[str, deque] = {}
+        self._counts: Dict[str, int] = {}
+        self.window = window
+
+    def observe(self, endpoint: str, seconds: float):
+        with self._lock:
+            self._samples.setdefault(endpoint, deque(maxlen=self.window)).append(seconds)
+            self._counts[endpoint] = self._counts.get(endpoint, 0) + 1
+
+    def summary(self) -> Dict:
+        with self._lock:
+            snapshot = {endpoint: np.array(samples) for endpoint, samples in self._samples.items()}
+            counts = dict(self._counts)
+        summary = {}
+        for endpoint, samples in snapshot.items():
+            p50, p95, p99 = np.percentile(samples, [50, 95, 99]) * 1000
+            summary[endpoint] = {
+                'requests': counts[endpoint],
+                'p50_ms': round(float(p50), 2),
+                'p95_ms': round(float(p95), 2),
+                'p99_ms': round(float(p99), 2),
+            }
+        return summary
+
+
+class AnalysisService:
+    """Warm model, request coalescer, label indexes, analysis cache and results store of one worker process."""
+
+    def __init__(self, max_batch_size: int, max_wait_ms: float):
+        sentiment_model = load_models()
+        self.batcher = MicroBatcher(
+            lambda texts: analyze_sentiment_batch(texts, sentiment_model, batch_size=max_batch_size),
+            max_batch_size=max_batch_size,
+            max_wait_ms=max_wait_ms
+        )
+        self.theme_index = LabelIndex()
+        self.topic_index = LabelIndex()
+        self.analysis_cache = AnalysisCache()
+        self.store = ResultsStore()
+        self.latency = LatencyTracker()
+
+    def sentiment(self, texts: List[str]) -> List[Dict]:
+        return [
+            {'comment': text, 'sentiment': sentiment, 'confidence': round(confidence, 4)}
+            for text, (sentiment, confidence) in zip(texts, self.batcher.submit(texts))
+        ]
+
+    def extract(self, images: List[Dict]) -> List[Dict]:
+        results = []
+        with tempfile.TemporaryDirectory(prefix="sentimentpro-api-") as tmp_dir:
+            for position, image in enumerate(images):
+                name = Path(image['name']).name or f"image_{position}"
+                path = Path(tmp_dir) / f"{position:05d}_{name}"
+                path.write_bytes(image['content'])
+                results.append({'image_source': name, 'comments': extract_comments_from_screenshot(str(path))})
+        return results
+
+    def analyze(self, texts: List[str], sources: List[str], batch_id: str, images: int = 0) -> List[Dict]:
+        # Repeated comments reuse the analysis of their first occurrence
+        analyses = {}
+        for text in texts:
+            if text not in analyses:
+                analyses[text] = self.analysis_cache.get(text)
+        fresh = [text for text, analysis in analyses.items() if analysis is None]
+        if fresh:
+            sentiments = self.batcher.submit(fresh)
+            labels = identify_topics_and_themes_batch(fresh)
+            topics = self.topic_index.canonicalize_many([topic for topic, _ in labels])
+            themes = self.theme_index.canonicalize_many([theme for _, theme in labels])
+            for text, (sentiment, confidence), topic, theme in zip(fresh, sentiments, topics, themes):
+                analyses[text] = (sentiment, confidence, topic, theme)
+                self.analysis_cache.put(text, analyses[text])
+
+        records = []
+        for text, source in zip(texts, sources):
+            sentiment, confidence, topic, theme = analyses[text]
+            records.append({
+                'image_source': source,
+                'comment': text,
+                'sentiment': sentiment,
+                'confidence': round(confidence, 4),
+                'topic': topic,
+                'theme': theme,
+                'batch_id': batch_id
+            })
+            COMMENTS_PROCESSED.labels(sentiment).inc()
+        self.store.create_batch(batch_id, 'api', images=images)
+        self.store.add_records(batch_id, records)
+        return records
+
+
+def _parse_texts(payload: Dict) -> List[str]:
+    texts = payload.get('texts')
+    if not isinstance(texts, list) or not all(isinstance(text, str) for text in texts):
+        raise ApiError(400, "'texts' must be a list of strings")
+    return texts
+
+
+def _parse_images(payload: Dict) -> List[Dict]:
+    images = payload.get('images')
+    if not isinstance(images, list) or not images:
+        raise ApiError(400, "'images' must be a non-empty list")
+    parsed = []
+    for image in images:
+        if not isinstance(image, dict) or not isinstance(image.get('data'), str):
+            raise ApiError(400, "each image needs a base64 'data' field")
+        try:
+            content = base64.b64decode(image['data'], validate=True)
+        except binascii.Error:
+            raise ApiError(400, f"invalid base64 data for image {image.get('name')!r}")
+        parsed.append({'name': str(image.get('name', '')), 'content': content})
+    return parsed
+
+
+class ApiHandler(BaseHTTPRequestHandler):
+    """Routes requests to the AnalysisService attached to the server."""
+
+    server_version = "SentimentProAPI/1.0"
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.address_string()} - {format % args}")
+
+    def _send_json(self, status: int, body):
+        data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_json(self) -> Dict:
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            raise ApiError(400, "invalid Content-Length")
+        if length < 0:
+            raise ApiError(400, "invalid Content-Length")
+        if length > MAX_BODY_BYTES:
+            raise ApiError(413, "request body too large")
+        try:
+            payload = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError as e:
+            raise ApiError(400, f"invalid JSON: {e}")
+        if not isinstance(payload, dict):
+            raise ApiError(400, "request body must be a JSON object")
+        return payload
+
+    def do_GET(self):
+        service = self.server.service
+        if self.path == "/health":
+            self._send_json(200, {'status': 'ok', 'pid': os.getpid()})
+        elif self.path == "/metrics":
+            data = REGISTRY.exposition().encode('utf-8')
+            self.send_response(200)
+            self.send_header("Content-Type", METRICS_CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        elif self.path == "/v1/stats":
+            self._send_json(200, {
+                'pid': os.getpid(),
+                'latency': service.latency.summary(),
+                'batching': service.batcher.stats()
+            })
+        else:
+            self._send_json(404, {'error': f"unknown endpoint {self.path}"})
+
+    def do_POST(self):
+        service = self.server.service
+        start = time.perf_counter()
+        try:
+            payload = self._read_json()
+            if self.path == "/v1/sentiment":
+                body = {'results': service.sentiment(_parse_texts(payload))}
+            elif self.path == "/v1/extract":
+                body = {'results': service.extract(_parse_images(payload))}
+            elif self.path == "/v1/analyze":
+                batch_id = str(payload.get('batch_id') or new_batch_id())
+                images = 0
+                comment_filter = None
+                if 'images' in payload:
+                    texts, sources = [], []
+                    extracted_images = service.extract(_parse_images(payload))
+                    images = len(extracted_images)
+                    comment_filter = CommentFilter()
+                    for extracted in extracted_images:
+                        for comment in comment_filter(extracted['comments']):
+                            texts.append(comment)
+                            sources.append(extracted['image_source'])
+                else:
+                    texts = _parse_texts(payload)
+                    sources = [None] * len(texts)
+                body = {'batch_id': batch_id, 'results': service.analyze(texts, sources, batch_id, images)}
+                if comment_filter is not None:
+                    body['filtered'] = comment_filter.report()
+            else:
+                raise ApiError(404, f"unknown endpoint {self.path}")
+            self._send_json(200, body)
+        except ApiError as e:
+            self._send_json(e.status, {'error': str(e)})
+        except Exception as e:
+            logger.error(f"Error handling {self.path}: {e}", exc_info=True)
+            self._send_json(500, {'error': "internal error"})
+        finally:
+            # Failed and rejected requests count too, or slow failures would hide from the percentiles
+            if self.path in POST_ENDPOINTS:
+                service.latency.observe(self.path, time.perf_counter() - start)
+
+
+def serve(server: ThreadingHTTPServer, max_batch_size: int, max_wait_ms: float):
+    """Load the model in this process and serve requests forever."""
+    install_from_env()
+    server.service = AnalysisService(max_batch_size, max_wait_ms)
+    logger.info(f"API worker {os.getpid()} listening on {server.server_address}")
+    server.serve_forever()
+
+
+def main():
+    """
+    Main execution function.
+    """
+    parser = argparse.ArgumentParser(description="SentimentPro HTTP API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=1, help="Pre-forked worker processes, one model each")
+    parser.add_argument("--max-batch-size", type=int, default=DEFAULT_MAX_BATCH_SIZE)
+    parser.add_argument("--max-wait-ms", type=float, default=DEFAULT_MAX_WAIT_MS)
+    args = parser.parse_args()
+
+    # Bind once in the parent so every forked worker accepts on the same socket
+    server = ThreadingHTTPServer((args.host, args.port), ApiHandler)
+    server.daemon_threads = True
+
+    if args.workers == 1:
+        serve(server, args.max_batch_size, args.max_wait_ms)
+        return
+
+    children = []
+    for _ in range(args.workers):
+        pid = os.fork()
+        if pid == 0:
+            serve(server, args.max_batch_size, args.max_wait_ms)
+            os._exit(0)
+        children.append(pid)
+    for pid in children:
+        os.waitpid(pid, 0)
+
+
+if __name__ == "__main__":
+    main()
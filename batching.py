@@ -0,0 +1,134 @@
+"""
+Request coalescing for the sentiment model.
+
+Concurrent callers submit small lists of texts; a single background thread
+gathers them for a few milliseconds (or until the batch is full) and runs
+one forward pass for all of them.
+
+Defaults can be tuned with SENTIMENTPRO_BATCH_MAX_SIZE and
+SENTIMENTPRO_BATCH_MAX_WAIT_MS.
+"""
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, List
+
+from metrics import QUEUE_DEPTH
+
+DEFAULT_MAX_BATCH_SIZE = int(os.getenv("SENTIMENTPRO_BATCH_MAX_SIZE", "32"))
+DEFAULT_MAX_WAIT_MS = float(os.getenv("SENTIMENTPRO_BATCH_MAX_WAIT_MS", "5"))
+
+
+class MicroBatcher:
+    """
+    Coalesce concurrent calls to a batch function into shared batches.
+
+    Args:
+        batch_fn: Function mapping a list of items to a list of results of the same length
+        max_batch_size: Flush as soon as this many items are pending
+        max_wait_ms: Maximum time the first pending item waits for company
+    """
+
+    def __init__(
+        self,
+        batch_fn: Callable[[List], List],
+        max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+        max_wait_ms: float = DEFAULT_MAX_WAIT_MS
+    ):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self._queued_items = 0
+        self._max_queued_items = 0
+        self._batches = 0
+        self._batched_items = 0
+        self._wait_seconds = 0.0
+        self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, items: List) -> List:
+        """
+        Queue items and block until their results are ready.
+
+        Args:
+            items: Items to process
+
+        Returns:
+            list: Results aligned with items
+        """
+        if not items:
+            return []
+        items = list(items)
+        future = Future()
+        with self._stats_lock:
+            self._queued_items += len(items)
+            self._max_queued_items = max(self._max_queued_items, self._queued_items)
+        QUEUE_DEPTH.labels('sentiment_batcher').inc(len(items))
+        self._queue.put((items, future, time.monotonic()))
+        return future.result()
+
+    def stats(self) -> Dict:
+        """
+        Snapshot of the coalescer metrics.
+
+        Returns:
+            dict: Current and peak queue depth (in items), batch count and mean batch size/wait
+        """
+        with self._stats_lock:
+            batches = self._batches
+            return {
+                'queue_depth': self._queued_items,
+                'max_queue_depth': self._max_queued_items,
+                'batches': batches,
+                'items': self._batched_items,
+                'mean_batch_size': round(self._batched_items / batches, 2) if batches else 0.0,
+                'mean_wait_ms': round(self._wait_seconds / self._batched_items * 1000, 3) if self._batched_items else 0.0,
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait * 1000,
+            }
+
+    def _collect(self):
+        """Block for the first request, then gather more until full or timed out."""
+        pending = [self._queue.get()]
+        size = len(pending[0][0])
+        deadline = time.monotonic() + self.max_wait
+        while size < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            pending.append(request)
+            size += len(request[0])
+        return pending
+
+    def _run(self):
+        while True:
+            pending = self._collect()
+            flat = [item for items, _, _ in pending for item in items]
+            started = time.monotonic()
+            with self._stats_lock:
+                self._queued_items -= len(flat)
+                self._batches += 1
+                self._batched_items += len(flat)
+                self._wait_seconds += sum((started - queued_at) * len(items) for items, _, queued_at in pending)
+            QUEUE_DEPTH.labels('sentiment_batcher').dec(len(flat))
+
+            try:
+                results = self.batch_fn(flat)
+            except Exception as e:
+                for _, future, _ in pending:
+                    future.set_exception(e)
+                continue
+
+            offset = 0
+            for items, future, _ in pending:
+                future.set_result(results[offset:offset + len(items)])
+                offset += len(items)
@@ -0,0 +1,3 @@
+"""
+Reproducible benchmarks for the analysis pipeline (python -m benchmarks).
+"""
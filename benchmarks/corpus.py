@@ -0,0 +1,79 @@
+"""
+Fixed French comment corpus used by every benchmark.
+
+The base comments never change, so numbers stay comparable across commits;
+larger corpora are built by cycling through them with a numbered suffix.
+"""
+
+from typing import List
+
+BASE_COMMENTS = [
+    "Votre connexion est nulle, ça coupe tout le temps le soir !",
+    "Très satisfait du service client, conseiller rapide et efficace.",
+    "La fibre a été installée en deux jours, rien à redire.",
+    "Trois semaines sans internet et personne ne rappelle, inadmissible.",
+    "Le débit est correct mais les prix ont encore augmenté ce mois-ci.",
+    "Application mobile claire, je gère mon forfait facilement.",
+    "Facture incompréhensible, des frais apparaissent sans explication.",
+    "Réseau 4G excellent même à la campagne, bravo.",
+    "Le technicien n'est jamais venu au rendez-vous prévu.",
+    "Bon rapport qualité prix, je recommande à mes proches.",
+    "Impossible de joindre le support, attente de plus d'une heure.",
+    "La box redémarre toute seule plusieurs fois par jour.",
+    "Offre promotionnelle intéressante pour les nouveaux clients.",
+    "Le service après-vente a remplacé mon décodeur sans difficulté.",
+    "Coupures fréquentes depuis la dernière mise à jour de la box.",
+    "Je suis client depuis dix ans et toujours aussi content.",
+    "Le chat en ligne répond à côté de la question à chaque fois.",
+    "Tarifs trop élevés par rapport à la concurrence.",
+    "Installation simple, tout fonctionne parfaitement.",
+    "On m'a prélevé deux fois le même mois, remboursement en attente.",
+    "Débit très lent aux heures de pointe, c'est pénible.",
+    "Personnel en boutique accueillant et de bon conseil.",
+    "La résiliation a été un vrai parcours du combattant.",
+    "Couverture réseau correcte en ville, faible en montagne.",
+    "Merci pour la réactivité lors de la panne de dimanche.",
+    "Le nouveau forfait est enfin adapté à mes besoins.",
+    "Toujours pas de fibre dans mon quartier malgré les promesses.",
+    "Le conseiller a pris le temps de tout m'expliquer, merci.",
+    "Ma ligne fixe grésille depuis des semaines.",
+    "Service correct sans plus, rien de particulier à signaler.",
+    "Les appels vers l'étranger sont facturés beaucoup trop cher.",
+    "Changement d'offre effectué en cinq minutes sur l'application.",
+    "Panne générale hier soir sans aucune information des équipes.",
+    "Très bonne qualité d'image sur la télévision par internet.",
+    "Le remboursement promis n'est jamais arrivé.",
+    "Les horaires d'ouverture de la boutique ne sont pas pratiques.",
+    "Wifi stable dans toute la maison depuis le répéteur.",
+    "Je vais changer d'opérateur si rien ne bouge.",
+    "Procédure de portabilité du numéro rapide et sans coupure.",
+    "Le mail de confirmation n'est jamais arrivé.",
+    "Débit conforme à ce qui était annoncé, satisfait.",
+    "Hotline aimable mais le problème n'est toujours pas résolu.",
+    "Augmentation de prix sans prévenir, très déçu.",
+    "Le colis avec la nouvelle box est arrivé endommagé.",
+    "Excellente couverture 5G dans le centre-ville.",
+    "Les frais de résiliation sont abusifs.",
+    "Le service client répond vite sur les réseaux sociaux.",
+    "Internet coupé pendant mes heures de télétravail, catastrophique.",
+    "Offre famille très avantageuse pour quatre lignes.",
+    "Rien à dire, tout fonctionne comme prévu.",
+]
+
+
+def make_corpus(size: int) -> List[str]:
+    """
+    Build a deterministic corpus of the requested size.
+
+    Args:
+        size: Number of comments
+
+    Returns:
+        list: Base comments in order, then repeated with a numbered suffix
+    """
+    corpus = []
+    for index in range(size):
+        comment = BASE_COMMENTS[index % len(BASE_COMMENTS)]
+        cycle = index // len(BASE_COMMENTS)
+        corpus.append(comment if cycle == 0 else f"{comment} ({cycle})")
+    return corpus
@@ -0,0 +1,158 @@
+"""
+Deterministic local stand-in for the Gemini API.
+
+FakeGemini replaces google.generativeai.upload_file and GenerativeModel, so
+analyse.py and inter.py run unchanged without network access. Extraction
+returns the comments embedded in the benchmark screenshots, uploaded or
+sent inline (keyed by image
+label for multi-image requests); topic/theme classification uses a fixed
+keyword table. Latency and error rate are configurable and errors are drawn
+from a seeded generator.
+"""
+
+import io
+import json
+import random
+import re
+import threading
+import time
+import zlib
+from collections import Counter
+from contextlib import contextmanager
+
+import google.generativeai as genai
+
+from benchmarks.screenshots import read_embedded_comments
+
+# (keywords, topic, theme), first match wins
+TOPIC_RULES = [
+    (("coupe", "coupure", "panne", "grésille", "redémarre"), "Coupures fréquentes", "Problème de connexion"),
+    (("débit", "lent", "wifi", "fibre", "4g", "5g", "réseau", "couverture"), "Débit et couverture", "Qualité du réseau"),
+    (("prix", "tarif", "cher", "facture", "frais", "prélevé", "remboursement"), "Tarifs et facturation", "Prix et facturation"),
+    (("conseiller", "support", "hotline", "service client", "chat", "joindre", "personnel"), "Réactivité du support", "Qualité de service"),
+    (("installation", "technicien", "box", "décodeur", "colis", "application"), "Équipement et installation", "Installation"),
+    (("résiliation", "opérateur", "portabilité", "offre", "forfait"), "Offres et abonnement", "Gestion du contrat"),
+]
+DEFAULT_LABELS = ("Avis général", "Avis général")
+
+_COMMENT_LINE = re.compile(r'^\s*(\d+)\. "(.*)"\s*$')
+_SINGLE_COMMENT = re.compile(r'Comment: "(.*)"')
+_IMAGE_LABEL = re.compile(r'^Image (\d+):$')
+
+
+class FakeGeminiError(RuntimeError):
+    """Injected API failure."""
+
+
+def classify(text: str):
+    """Deterministic (topic, theme) of a comment."""
+    lowered = text.lower()
+    for keywords, topic, theme in TOPIC_RULES:
+        if any(keyword in lowered for keyword in keywords):
+            return topic, theme
+    return DEFAULT_LABELS
+
+
+class _Response:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class _File:
+    def __init__(self, path: str):
+        self.path = str(path)
+        self.name = f"files/{zlib.crc32(self.path.encode()):08x}"
+
+
+def _image_source(part):
+    """Path of an uploaded file, or a stream over inline image bytes."""
+    if isinstance(part, _File):
+        return part.path
+    return io.BytesIO(part['data'])
+
+
+class _Model:
+    def __init__(self, fake: "FakeGemini", model_name: str = "gemini-2.0-flash", generation_config=None, **kwargs):
+        self.fake = fake
+        self.model_name = model_name
+
+    def generate_content(self, contents, **kwargs):
+        return self.fake._generate(contents)
+
+
+class FakeGemini:
+    """
+    Fake Gemini backend with configurable latency and error rate.
+
+    Args:
+        latency_ms: Delay added to every call
+        error_rate: Probability that a call raises FakeGeminiError
+        seed: Seed of the error generator
+    """
+
+    def __init__(self, latency_ms: float = 20.0, error_rate: float = 0.0, seed: int = 0):
+        self.latency = latency_ms / 1000.0
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = Counter()
+
+    def _call(self, kind: str):
+        with self._lock:
+            self.calls[kind] += 1
+            failed = self._random.random() < self.error_rate
+        if self.latency:
+            time.sleep(self.latency)
+        if failed:
+            with self._lock:
+                self.calls[f"{kind}.error"] += 1
+            raise FakeGeminiError(f"503 fake Gemini {kind} failure")
+
+    def upload_file(self, path, **kwargs):
+        self._call("upload")
+        return _File(path)
+
+    def _generate(self, contents):
+        if isinstance(contents, (list, tuple)):
+            uploaded = [part for part in contents
+                        if isinstance(part, _File) or (isinstance(part, dict) and 'data' in part)]
+            labels = [match.group(1) for part in contents if isinstance(part, str)
+                      for match in [_IMAGE_LABEL.match(part)] if match]
+            if uploaded and len(labels) == len(uploaded):
+                self._call("extract_pack")
+                packed = {label: read_embedded_comments(_image_source(part)) for label, part in zip(labels, uploaded)}
+                return _Response(json.dumps(packed, ensure_ascii=False))
+            if uploaded:
+                self._call("extract")
+                comments = []
+                for part in uploaded:
+                    comments.extend(read_embedded_comments(_image_source(part)))
+                return _Response(json.dumps(comments, ensure_ascii=False))
+            contents = "\n".join(str(part) for part in contents)
+
+        numbered = [_COMMENT_LINE.match(line) for line in contents.splitlines()]
+        numbered = [match for match in numbered if match]
+        if numbered:
+            self._call("topic_batch")
+            items = [
+                {"index": int(match.group(1)), "topic": topic, "theme": theme}
+                for match in numbered
+                for topic, theme in [classify(match.group(2))]
+            ]
+            return _Response(json.dumps(items, ensure_ascii=False))
+
+        self._call("topic")
+        match = _SINGLE_COMMENT.search(contents)
+        topic, theme = classify(match.group(1) if match else contents)
+        return _Response(json.dumps({"topic": topic, "theme": theme}, ensure_ascii=False))
+
+    @contextmanager
+    def install(self):
+        """Route google.generativeai calls to this fake for the duration of the block."""
+        original = genai.upload_file, genai.GenerativeModel
+        genai.upload_file = self.upload_file
+        genai.GenerativeModel = lambda *args, **kwargs: _Model(self, *args, **kwargs)
+        try:
+            yield self
+        finally:
+            genai.upload_file, genai.GenerativeModel = original
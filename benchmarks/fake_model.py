@@ -0,0 +1,32 @@
+"""
+Lexicon-based stand-in for the sentiment pipeline.
+
+Used when torch or the model weights are not available. It has the same
+call signature and output format as the transformers pipeline, so the
+benchmarks still measure everything around the model.
+"""
+
+from typing import Dict, List, Union
+
+POSITIVE_WORDS = {"satisfait", "bravo", "merci", "excellent", "excellente", "recommande", "content",
+                  "rapide", "efficace", "simple", "parfaitement", "avantageuse", "stable", "bonne", "bon"}
+NEGATIVE_WORDS = {"nulle", "inadmissible", "jamais", "impossible", "déçu", "cher", "abusifs", "catastrophique",
+                  "pénible", "coupe", "coupé", "coupures", "panne", "grésille", "incompréhensible", "lent"}
+
+
+class FakeSentimentModel:
+    """Callable like pipeline("sentiment-analysis"), deterministic and CPU-cheap."""
+
+    def _score(self, text: str) -> Dict:
+        words = {word.strip(".,;:!?()'").lower() for word in text.split()}
+        balance = len(words & POSITIVE_WORDS) - len(words & NEGATIVE_WORDS)
+        if balance > 0:
+            return {'label': 'POSITIVE', 'score': min(0.99, 0.6 + 0.1 * balance)}
+        if balance < 0:
+            return {'label': 'NEGATIVE', 'score': min(0.99, 0.6 - 0.1 * balance)}
+        return {'label': 'NEUTRAL', 'score': 0.55}
+
+    def __call__(self, texts: Union[str, List[str]], batch_size: int = 1, **kwargs) -> List[Dict]:
+        if isinstance(texts, str):
+            texts = [texts]
+        return [self._score(text) for text in texts]
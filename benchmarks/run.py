@@ -0,0 +1,316 @@
+"""
+Benchmark runner for the analysis pipeline.
+
+Usage:
+    python -m benchmarks
+    python -m benchmarks --suite sentiment --batch-sizes 1 8 32 --model fake
+    python -m benchmarks --compare .sentimentpro/benchmarks/<commit>.json
+
+Suites:
+    startup    import time of analyse.py and inter.py, model load time
+    sentiment  analyze_sentiment_batch comments/sec per batch size, analyze_sentiment_french
+               (--cascade-model also measures the confidence-gated cascade at batch size 32)
+    pipeline   process_multiple_images on generated screenshots, images/minute
+               (--pack-images N packs several screenshots per extraction request)
+    export     inter.export_data for every format
+
+Every suite runs in a fresh interpreter, so startup cost and peak RSS are
+measured in isolation. Gemini is replaced by a seeded local fake and the
+corpus is fixed, so results are comparable across commits. With --cassette
+the pipeline suite replays recorded Gemini responses instead (see
+cassette.py). Results are written as JSON tagged with the current commit.
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, Tuple
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+SUITES = ['startup', 'sentiment', 'pipeline', 'export']
+
+
+def _timed(fn: Callable, repeat: int) -> Tuple[float, object]:
+    """Median wall time of fn over repeat runs, and the result of the last run."""
+    durations = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        durations.append(time.perf_counter() - start)
+    return statistics.median(durations), result
+
+
+def _peak_rss_mb(who: int = resource.RUSAGE_SELF) -> float:
+    peak = resource.getrusage(who).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def _load_model(kind: str):
+    """Sentiment pipeline and the kind actually used ('real' or 'fake')."""
+    if kind in ('auto', 'real'):
+        try:
+            from analyse import load_models
+            return load_models(), 'real'
+        except Exception:
+            if kind == 'real':
+                raise
+    from benchmarks.fake_model import FakeSentimentModel
+    return FakeSentimentModel(), 'fake'
+
+
+def suite_startup(args) -> Dict:
+    results = {}
+    for module in ('analyse', 'inter'):
+        seconds, _ = _timed(
+            lambda: subprocess.run(
+                [sys.executable, '-c', f'import {module}'],
+                cwd=REPO_ROOT, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            ),
+            args.repeat
+        )
+        results[f'import_{module}_seconds'] = round(seconds, 4)
+    # Largest of the import subprocesses above
+    results['import_peak_rss_mb'] = _peak_rss_mb(resource.RUSAGE_CHILDREN)
+    start = time.perf_counter()
+    _, kind = _load_model(args.model)
+    results['model_load_seconds'] = round(time.perf_counter() - start, 4)
+    results['model'] = kind
+    return results
+
+
+def suite_sentiment(args) -> Dict:
+    from analyse import analyze_sentiment_batch, analyze_sentiment_french
+    from benchmarks.corpus import make_corpus
+
+    model, kind = _load_model(args.model)
+    corpus = make_corpus(args.comments)
+    results = {'model': kind, 'comments': len(corpus), 'batch': {}}
+
+    for batch_size in args.batch_sizes:
+        seconds, _ = _timed(lambda: analyze_sentiment_batch(corpus, model, batch_size=batch_size), args.repeat)
+        results['batch'][str(batch_size)] = {
+            'seconds': round(seconds, 4),
+            'comments_per_second': round(len(corpus) / seconds, 2),
+        }
+
+    if args.cascade_model:
+        from cascade import cascade_from_path
+        cascade = cascade_from_path(model, args.cascade_model)
+        seconds, _ = _timed(lambda: analyze_sentiment_batch(corpus, cascade, batch_size=32), args.repeat)
+        results['cascade'] = {
+            'seconds': round(seconds, 4),
+            'comments_per_second': round(len(corpus) / seconds, 2),
+            'escalation_rate': cascade.stats()['escalation_rate'],
+        }
+
+    single = corpus[:args.single_comments]
+    seconds, _ = _timed(lambda: [analyze_sentiment_french(text, model) for text in single], args.repeat)
+    results['single'] = {
+        'comments': len(single),
+        'seconds': round(seconds, 4),
+        'comments_per_second': round(len(single) / seconds, 2),
+    }
+    return results
+
+
+def suite_pipeline(args) -> Dict:
+    from analyse import process_multiple_images
+    from benchmarks.fake_gemini import FakeGemini
+    from benchmarks.screenshots import generate_screenshots
+
+    model, kind = _load_model(args.model)
+    if args.cassette:
+        from cassette import Cassette
+        backend = Cassette(args.cassette, mode='replay', latency_ms=args.replay_latency_ms)
+    else:
+        backend = FakeGemini(args.gemini_latency_ms, args.gemini_error_rate, args.seed)
+    with tempfile.TemporaryDirectory(prefix="sentimentpro-bench-") as folder:
+        paths = generate_screenshots(folder, args.images, args.comments_per_image)
+        with backend.install():
+            seconds, df = _timed(
+                lambda: process_multiple_images(paths, model, pack_size=args.pack_images), args.repeat
+            )
+
+    if args.cassette:
+        calls = {'replayed': backend.stats['replayed'] / args.repeat, 'misses': backend.stats['misses'] / args.repeat}
+    else:
+        calls = {name: count / args.repeat for name, count in sorted(backend.calls.items())}
+    return {
+        'model': kind,
+        'images': len(paths),
+        'comments': len(df),
+        'seconds': round(seconds, 4),
+        'images_per_minute': round(len(paths) / seconds * 60, 2),
+        'comments_per_second': round(len(df) / seconds, 2),
+        'gemini_calls_per_run': calls,
+    }
+
+
+def suite_export(args) -> Dict:
+    import pandas as pd
+    from benchmarks.corpus import make_corpus
+    from benchmarks.fake_gemini import classify
+    from benchmarks.fake_model import FakeSentimentModel
+    from analyse import map_sentiment_label
+
+    logging.getLogger('streamlit').setLevel(logging.ERROR)
+    import inter
+
+    corpus = make_corpus(args.export_rows)
+    scored = [map_sentiment_label(result['label'], result['score']) for result in FakeSentimentModel()(corpus)]
+    labels = [classify(text) for text in corpus]
+    df = pd.DataFrame({
+        'image_source': [f"screenshot_{index // 10:03d}.png" for index in range(len(corpus))],
+        'comment': corpus,
+        'sentiment': [sentiment for sentiment, _ in scored],
+        'confidence': [round(confidence, 4) for _, confidence in scored],
+        'topic': [topic for topic, _ in labels],
+        'theme': [theme for _, theme in labels],
+    })
+
+    results = {'rows': len(df), 'formats': {}}
+    for format_type in inter.EXPORT_FORMATS:
+        seconds, data = _timed(lambda: inter.export_data(df, format_type), args.repeat)
+        results['formats'][format_type] = {
+            'seconds': round(seconds, 4),
+            'bytes': len(data),
+            'rows_per_second': round(len(df) / seconds, 2),
+        }
+    return results
+
+
+SUITE_FUNCTIONS = {
+    'startup': suite_startup,
+    'sentiment': suite_sentiment,
+    'pipeline': suite_pipeline,
+    'export': suite_export,
+}
+
+
+def _git(*command) -> str:
+    try:
+        return subprocess.run(
+            ['git', *command], cwd=REPO_ROOT, check=True, capture_output=True, text=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def _flatten(results: Dict, prefix: str = "") -> Dict[str, float]:
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            flat.update(_flatten(value, name))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def compare(baseline: Dict, current: Dict):
+    """Print the relative change of every numeric metric present in both runs."""
+    before = _flatten(baseline['suites'])
+    after = _flatten(current['suites'])
+    print(f"\nComparison with {baseline.get('commit') or 'baseline'}:")
+    for name in sorted(before.keys() & after.keys()):
+        old, new = before[name], after[name]
+        change = f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+        print(f"  {name:60s} {old:>14,.4g} -> {new:>14,.4g}  {change}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="SentimentPro benchmark suite")
+    parser.add_argument("--suite", nargs="+", choices=SUITES, default=SUITES, help="Suites to run")
+    parser.add_argument("--model", choices=["auto", "real", "fake"], default="auto",
+                        help="Sentiment model: the real pipeline, the lexicon fake, or real when available")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement (median is kept)")
+    parser.add_argument("--comments", type=int, default=512, help="Corpus size for the sentiment suite")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 16, 32, 64])
+    parser.add_argument("--cascade-model", help="First-stage model file for the cascade measurement")
+    parser.add_argument("--single-comments", type=int, default=64, help="Comments for analyze_sentiment_french")
+    parser.add_argument("--images", type=int, default=8, help="Screenshots for the pipeline suite")
+    parser.add_argument("--comments-per-image", type=int, default=6)
+    parser.add_argument("--pack-images", type=int, default=1, help="Screenshots per extraction request")
+    parser.add_argument("--gemini-latency-ms", type=float, default=20.0, help="Latency of every fake Gemini call")
+    parser.add_argument("--gemini-error-rate", type=float, default=0.0, help="Probability of a fake Gemini failure")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--cassette", help="Replay Gemini responses from this cassette in the pipeline suite")
+    parser.add_argument("--replay-latency-ms", type=float,
+                        help="Fixed latency of replayed calls (default: the recorded latency)")
+    parser.add_argument("--export-rows", type=int, default=5000, help="Rows for the export suite")
+    parser.add_argument("--output", help="Results JSON (default: .sentimentpro/benchmarks/<commit>.json)")
+    parser.add_argument("--compare", help="Earlier results JSON to compare against")
+    parser.add_argument("--child", choices=SUITES, help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def run_child(args):
+    """Run one suite in this interpreter and print its results as JSON."""
+    logging.disable(logging.INFO)
+    results = SUITE_FUNCTIONS[args.child](args)
+    results['peak_rss_mb'] = _peak_rss_mb()
+    print(json.dumps(results))
+
+
+def main(argv=None):
+    """
+    Main execution function.
+    """
+    argv = sys.argv[1:] if argv is None else argv
+    args = parse_args(argv)
+    if args.child:
+        run_child(args)
+        return
+
+    commit = _git('rev-parse', '--short', 'HEAD')
+    report = {
+        'commit': commit,
+        'dirty': bool(_git('status', '--porcelain', '--untracked-files=no')),
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'params': {key: value for key, value in vars(args).items() if key not in ('output', 'compare', 'child')},
+        'suites': {},
+    }
+
+    env = {**os.environ, 'PYTHONPATH': os.pathsep.join(filter(None, [str(REPO_ROOT), os.getenv('PYTHONPATH')]))}
+    for suite in args.suite:
+        print(f"Running {suite}...", flush=True)
+        completed = subprocess.run(
+            [sys.executable, '-m', 'benchmarks', *argv, '--child', suite],
+            cwd=REPO_ROOT, env=env, capture_output=True, text=True
+        )
+        if completed.returncode != 0:
+            print(completed.stderr[-2000:], file=sys.stderr)
+            report['suites'][suite] = {'error': completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else 'failed'}
+            continue
+        report['suites'][suite] = json.loads(completed.stdout.strip().splitlines()[-1])
+        print(json.dumps(report['suites'][suite], indent=2))
+
+    if args.output:
+        output = Path(args.output)
+    else:
+        from store import DATA_DIR
+        output = REPO_ROOT / DATA_DIR / 'benchmarks' / f"{commit or 'unknown'}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding='utf-8')
+    print(f"\nResults saved to {output}")
+
+    if args.compare:
+        compare(json.loads(Path(args.compare).read_text(encoding='utf-8')), report)
+
+
+if __name__ == "__main__":
+    main()
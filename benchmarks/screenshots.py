@@ -0,0 +1,67 @@
+"""
+Deterministic sample screenshots for the end-to-end benchmarks.
+
+Each image renders a few corpus comments like a comment thread and carries
+the same comments as JSON in a PNG text chunk, which is what the fake
+Gemini reads back instead of doing OCR.
+"""
+
+import json
+from pathlib import Path
+from typing import List
+
+from PIL import Image, ImageDraw, ImageFont
+from PIL.PngImagePlugin import PngInfo
+
+from benchmarks.corpus import make_corpus
+
+COMMENTS_KEY = "sentimentpro-comments"
+
+WIDTH = 1080
+ROW_HEIGHT = 120
+
+
+def render_screenshot(comments: List[str], path: Path):
+    """Draw one comment thread and embed its comments in the PNG metadata."""
+    image = Image.new("RGB", (WIDTH, ROW_HEIGHT * len(comments) + 40), "white")
+    draw = ImageDraw.Draw(image)
+    font = ImageFont.load_default()
+    for row, comment in enumerate(comments):
+        top = 20 + row * ROW_HEIGHT
+        draw.rounded_rectangle((20, top, WIDTH - 20, top + ROW_HEIGHT - 16), radius=16, fill=(240, 242, 245))
+        draw.ellipse((36, top + 16, 76, top + 56), fill=(0, 102, 255))
+        draw.text((92, top + 18), f"utilisateur_{row}", fill=(23, 43, 77), font=font)
+        draw.text((92, top + 48), comment, fill=(66, 82, 110), font=font)
+
+    metadata = PngInfo()
+    metadata.add_text(COMMENTS_KEY, json.dumps(comments, ensure_ascii=False))
+    image.save(path, pnginfo=metadata)
+
+
+def generate_screenshots(folder: str, images: int, comments_per_image: int) -> List[str]:
+    """
+    Write the sample screenshots, reusing the corpus in order.
+
+    Args:
+        folder: Output folder (created if needed)
+        images: Number of screenshots
+        comments_per_image: Comments rendered on each screenshot
+
+    Returns:
+        list: Paths of the generated PNG files
+    """
+    folder = Path(folder)
+    folder.mkdir(parents=True, exist_ok=True)
+    corpus = make_corpus(images * comments_per_image)
+    paths = []
+    for index in range(images):
+        path = folder / f"screenshot_{index:03d}.png"
+        render_screenshot(corpus[index * comments_per_image:(index + 1) * comments_per_image], path)
+        paths.append(str(path))
+    return paths
+
+
+def read_embedded_comments(source) -> List[str]:
+    """Comments embedded by render_screenshot (from a path or a binary stream), or an empty list."""
+    with Image.open(source) as image:
+        return json.loads(image.text.get(COMMENTS_KEY, "[]"))
@@ -0,0 +1,430 @@
+"""
+Confidence-gated sentiment cascade.
+
+A linear classifier over hashed word and character n-grams scores every
+comment first; only the comments it is not confident about (top class
+probability under the threshold) are escalated to the distilcamembert
+pipeline. Short, clear comments, the bulk of most exports, never reach the
+transformer.
+
+CascadeSentimentModel is called like the transformers pipeline, so
+analyze_sentiment_french, analyze_sentiment_batch and the micro-batcher use
+it unchanged. The first stage is enabled with --cascade-model in analyse.py,
+or SENTIMENTPRO_CASCADE_MODEL for the workers, the API and the Streamlit app.
+
+Usage:
+    python cascade.py train                      # distill from the results store
+    python cascade.py train --labeled avis.csv   # or learn from labeled comments
+    python cascade.py calibrate --labeled avis.csv
+
+calibrate runs both stages on a labeled set, reports coverage, accuracy and
+first-stage/transformer agreement for a range of thresholds, and stores the
+lowest threshold that keeps the cascade within --max-accuracy-drop of the
+transformer alone in the model file.
+"""
+
+import argparse
+import json
+import os
+import re
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from metrics import CASCADE_COMMENTS
+from profiling import span
+from store import DATA_DIR
+
+LABELS = ('NEGATIVE', 'NEUTRAL', 'POSITIVE')
+HASH_DIM = 1 << 18
+DEFAULT_THRESHOLD = 0.9
+DEFAULT_MODEL_PATH = DATA_DIR / "cascade.npz"
+CALIBRATION_THRESHOLDS = (0.5, 0.6, 0.7, 0.75, 0.8, 0.85, 0.9, 0.925, 0.95, 0.975, 0.99)
+
+# Gold labels accepted in labeled sets, on top of LABELS in any case
+LABEL_ALIASES = {
+    'positif': 'POSITIVE', 'positive': 'POSITIVE', 'pos': 'POSITIVE',
+    'négatif': 'NEGATIVE', 'negatif': 'NEGATIVE', 'negative': 'NEGATIVE', 'neg': 'NEGATIVE',
+    'neutre': 'NEUTRAL', 'neutral': 'NEUTRAL',
+}
+
+_WORD = re.compile(r"\w+")
+
+
+def _hash(feature: str, dim: int) -> int:
+    return zlib.crc32(feature.encode("utf-8")) % dim
+
+
+def hashed_features(texts: Sequence[str], dim: int = HASH_DIM) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Hash the word unigrams/bigrams and in-word character trigrams of each text.
+
+    Every row also gets a length bucket feature, so no row is empty.
+
+    Args:
+        texts: Comment texts
+        dim: Number of hash buckets
+
+    Returns:
+        tuple: (indptr, indices, values) of an L2-normalized CSR matrix
+    """
+    indptr = np.zeros(len(texts) + 1, dtype=np.int64)
+    indices = []
+    for row, text in enumerate(texts):
+        words = _WORD.findall(str(text).lower())
+        features = [f"len:{min(len(words), 40) // 5}"]
+        features += [f"w:{word}" for word in words]
+        features += [f"b:{first} {second}" for first, second in zip(words, words[1:])]
+        for word in words:
+            padded = f"<{word}>"
+            features += [f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2)]
+        indices.extend(_hash(feature, dim) for feature in features)
+        indptr[row + 1] = len(indices)
+    lengths = np.diff(indptr)
+    values = np.repeat(1.0 / np.sqrt(lengths), lengths).astype(np.float32)
+    return indptr, np.asarray(indices, dtype=np.int64), values
+
+
+def normalize_gold_label(label) -> Optional[str]:
+    """LABELS entry for a labeled-set value ('positif', 'NEGATIVE', ...), or None."""
+    label = str(label).strip()
+    if label.upper() in LABELS:
+        return label.upper()
+    return LABEL_ALIASES.get(label.lower())
+
+
+class HashedNgramClassifier:
+    """
+    Multinomial logistic regression on hashed n-grams, numpy only.
+
+    Args:
+        dim: Number of hash buckets
+        threshold: Confidence from which the cascade keeps the first-stage answer
+    """
+
+    def __init__(self, dim: int = HASH_DIM, threshold: float = DEFAULT_THRESHOLD):
+        self.dim = dim
+        self.threshold = threshold
+        self.weights = np.zeros((dim, len(LABELS)), dtype=np.float32)
+        self.bias = np.zeros(len(LABELS), dtype=np.float32)
+
+    def _logits(self, indptr: np.ndarray, indices: np.ndarray, values: np.ndarray) -> np.ndarray:
+        contributions = self.weights[indices] * values[:, None]
+        return np.add.reduceat(contributions, indptr[:-1], axis=0) + self.bias
+
+    def predict_proba(self, texts: Sequence[str]) -> np.ndarray:
+        """
+        Class probabilities of each text.
+
+        Returns:
+            np.ndarray: (len(texts), len(LABELS)) float32 probabilities
+        """
+        if len(texts) == 0:
+            return np.zeros((0, len(LABELS)), dtype=np.float32)
+        logits = self._logits(*hashed_features(texts, self.dim))
+        logits -= logits.max(axis=1, keepdims=True)
+        exp = np.exp(logits)
+        return exp / exp.sum(axis=1, keepdims=True)
+
+    def fit(self, texts: Sequence[str], labels: Sequence[str], epochs: int = 8, batch_size: int = 256,
+            learning_rate: float = 0.5, l2: float = 1e-6, seed: int = 0) -> "HashedNgramClassifier":
+        """
+        Train with mini-batch AdaGrad on the softmax loss.
+
+        Args:
+            texts: Training comments
+            labels: LABELS entry of each comment
+            epochs: Passes over the data
+            batch_size: Comments per update
+            learning_rate: AdaGrad step size
+            l2: Weight decay
+            seed: Shuffling seed
+
+        Returns:
+            HashedNgramClassifier: self
+        """
+        targets = np.array([LABELS.index(label) for label in labels], dtype=np.int64)
+        indptr, indices, values = hashed_features(texts, self.dim)
+        weight_sq = np.full_like(self.weights, 1e-8)
+        bias_sq = np.full_like(self.bias, 1e-8)
+        rng = np.random.default_rng(seed)
+
+        for _ in range(epochs):
+            order = rng.permutation(len(targets))
+            for start in range(0, len(order), batch_size):
+                rows = order[start:start + batch_size]
+                # Sub-matrix of the batch rows
+                lengths = indptr[rows + 1] - indptr[rows]
+                positions = np.concatenate([np.arange(indptr[row], indptr[row + 1]) for row in rows])
+                batch_indptr = np.concatenate([[0], np.cumsum(lengths)])
+                batch_indices, batch_values = indices[positions], values[positions]
+
+                logits = self._logits(batch_indptr, batch_indices, batch_values)
+                logits -= logits.max(axis=1, keepdims=True)
+                probabilities = np.exp(logits)
+                probabilities /= probabilities.sum(axis=1, keepdims=True)
+                errors = probabilities
+                errors[np.arange(len(rows)), targets[rows]] -= 1.0
+                errors /= len(rows)
+
+                gradient = np.zeros_like(self.weights)
+                np.add.at(gradient, batch_indices, np.repeat(errors, lengths, axis=0) * batch_values[:, None])
+                touched = np.unique(batch_indices)
+                gradient[touched] += l2 * self.weights[touched]
+                weight_sq[touched] += gradient[touched] ** 2
+                self.weights[touched] -= learning_rate * gradient[touched] / np.sqrt(weight_sq[touched])
+
+                bias_gradient = errors.sum(axis=0)
+                bias_sq += bias_gradient ** 2
+                self.bias -= learning_rate * bias_gradient / np.sqrt(bias_sq)
+        return self
+
+    def save(self, path: Union[str, Path]):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'wb') as f:
+            np.savez_compressed(f, weights=self.weights, bias=self.bias, dim=self.dim, threshold=self.threshold)
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> "HashedNgramClassifier":
+        with np.load(path) as data:
+            classifier = cls(dim=int(data['dim']), threshold=float(data['threshold']))
+            classifier.weights = data['weights']
+            classifier.bias = data['bias']
+        return classifier
+
+
+class CascadeSentimentModel:
+    """
+    Callable like pipeline("sentiment-analysis"): first stage for confident comments, the model for the rest.
+
+    Args:
+        fast: First-stage classifier
+        model: Sentiment pipeline receiving the escalated comments
+        threshold: Escalate below this first-stage confidence (default: the calibrated one of fast)
+    """
+
+    def __init__(self, fast: HashedNgramClassifier, model, threshold: float = None):
+        self.fast = fast
+        self.model = model
+        self.threshold = threshold if threshold is not None else fast.threshold
+        self._lock = threading.Lock()
+        self.comments = 0
+        self.escalated = 0
+
+    def __call__(self, texts: Union[str, List[str]], batch_size: int = 1, **kwargs) -> List[Dict]:
+        if isinstance(texts, str):
+            texts = [texts]
+        with span("sentiment.fast", items=len(texts)):
+            probabilities = self.fast.predict_proba(texts)
+        best = probabilities.argmax(axis=1)
+        confidence = probabilities.max(axis=1)
+        results = [{'label': LABELS[label], 'score': float(score)} for label, score in zip(best, confidence)]
+
+        escalate = np.flatnonzero(confidence < self.threshold)
+        if len(escalate):
+            escalated = self.model([texts[row] for row in escalate], batch_size=batch_size, **kwargs)
+            for row, result in zip(escalate, escalated):
+                results[row] = result
+
+        with self._lock:
+            self.comments += len(texts)
+            self.escalated += len(escalate)
+        CASCADE_COMMENTS.labels('fast').inc(len(texts) - len(escalate))
+        CASCADE_COMMENTS.labels('escalated').inc(len(escalate))
+        return results
+
+    def stats(self) -> Dict:
+        """Comments scored so far and the share escalated to the model."""
+        with self._lock:
+            return {
+                'threshold': self.threshold,
+                'comments': self.comments,
+                'escalated': self.escalated,
+                'escalation_rate': round(self.escalated / self.comments, 4) if self.comments else 0.0,
+            }
+
+
+def cascade_from_path(sentiment_model, path: Union[str, Path], threshold: float = None) -> CascadeSentimentModel:
+    """Wrap a sentiment pipeline behind the first stage saved at path."""
+    return CascadeSentimentModel(HashedNgramClassifier.load(path), sentiment_model, threshold)
+
+
+def cascade_from_env(sentiment_model):
+    """
+    Wrap a sentiment pipeline in the cascade configured by environment variables, if any.
+
+    Returns:
+        The cascade when SENTIMENTPRO_CASCADE_MODEL is set, else sentiment_model itself
+    """
+    path = os.getenv("SENTIMENTPRO_CASCADE_MODEL")
+    if not path:
+        return sentiment_model
+    threshold = os.getenv("SENTIMENTPRO_CASCADE_THRESHOLD")
+    return cascade_from_path(sentiment_model, path, float(threshold) if threshold else None)
+
+
+def calibrate(fast: HashedNgramClassifier, sentiment_model, texts: List[str], labels: List[str],
+              thresholds: Sequence[float] = CALIBRATION_THRESHOLDS, max_accuracy_drop: float = 0.01,
+              batch_size: int = 32) -> Dict:
+    """
+    Measure the cascade against the model alone on a labeled set.
+
+    Args:
+        fast: First-stage classifier
+        sentiment_model: Sentiment pipeline (the second stage)
+        texts: Labeled comments
+        labels: LABELS entry of each comment
+        thresholds: Confidence thresholds to evaluate
+        max_accuracy_drop: Largest accuracy loss accepted for the recommended threshold
+        batch_size: Texts per model forward pass
+
+    Returns:
+        dict: Stage accuracies and timings, one row per threshold (coverage, accuracy,
+              agreement with the model on the comments kept by the first stage,
+              estimated speedup) and the recommended threshold
+    """
+    gold = np.array([LABELS.index(label) for label in labels])
+    texts = [text[:512] for text in texts]
+
+    start = time.perf_counter()
+    probabilities = fast.predict_proba(texts)
+    fast_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    model_results = sentiment_model(texts, batch_size=batch_size)
+    model_seconds = time.perf_counter() - start
+
+    fast_labels = probabilities.argmax(axis=1)
+    confidence = probabilities.max(axis=1)
+    model_labels = np.array([
+        LABELS.index(normalize_gold_label(result['label']) or 'NEUTRAL') for result in model_results
+    ])
+    model_accuracy = float((model_labels == gold).mean())
+
+    rows = []
+    for threshold in thresholds:
+        kept = confidence >= threshold
+        coverage = float(kept.mean())
+        cascade_labels = np.where(kept, fast_labels, model_labels)
+        # Time per comment of the first stage plus the share still sent to the model
+        cascade_seconds = fast_seconds + (1 - coverage) * model_seconds
+        rows.append({
+            'threshold': threshold,
+            'coverage': round(coverage, 4),
+            'accuracy': round(float((cascade_labels == gold).mean()), 4),
+            'fast_accuracy_kept': round(float((fast_labels[kept] == gold[kept]).mean()), 4) if kept.any() else None,
+            'agreement_kept': round(float((fast_labels[kept] == model_labels[kept]).mean()), 4) if kept.any() else None,
+            'speedup': round(model_seconds / cascade_seconds, 2) if cascade_seconds > 0 else None,
+        })
+
+    eligible = [row['threshold'] for row in rows if row['accuracy'] >= model_accuracy - max_accuracy_drop]
+    return {
+        'comments': len(texts),
+        'model_accuracy': round(model_accuracy, 4),
+        'fast_accuracy': round(float((fast_labels == gold).mean()), 4),
+        'agreement': round(float((fast_labels == model_labels).mean()), 4),
+        'fast_comments_per_second': round(len(texts) / fast_seconds, 1) if fast_seconds > 0 else None,
+        'model_comments_per_second': round(len(texts) / model_seconds, 1) if model_seconds > 0 else None,
+        'max_accuracy_drop': max_accuracy_drop,
+        'thresholds': rows,
+        'recommended_threshold': min(eligible) if eligible else max(thresholds),
+    }
+
+
+def load_labeled(path: str, text_column: str = None, label_column: str = 'sentiment') -> Tuple[List[str], List[str]]:
+    """
+    Read a labeled CSV/JSONL/Parquet set, dropping rows whose label is not a sentiment.
+
+    Returns:
+        tuple: (texts, LABELS entries)
+    """
+    from ingest import _input_format, resolve_text_column
+
+    path = Path(path)
+    column = resolve_text_column(path, text_column)
+    input_format = _input_format(path)
+    if input_format == 'csv':
+        df = pd.read_csv(path, usecols=[column, label_column], dtype=str)
+    elif input_format == 'jsonl':
+        df = pd.read_json(path, lines=True, dtype=False)[[column, label_column]]
+    else:
+        df = pd.read_parquet(path, columns=[column, label_column])
+    labels = df[label_column].map(normalize_gold_label)
+    kept = df[column].notna() & labels.notna()
+    return df.loc[kept, column].astype(str).tolist(), labels[kept].tolist()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Train and calibrate the first stage of the sentiment cascade")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    train = commands.add_parser("train", help="Fit the hashed n-gram classifier")
+    train.add_argument("--labeled", help="Labeled CSV/JSONL/Parquet (default: every comment of the results store)")
+    train.add_argument("--epochs", type=int, default=8)
+
+    calibration = commands.add_parser("calibrate", help="Report agreement and pick the escalation threshold")
+    calibration.add_argument("--labeled", required=True, help="Labeled CSV/JSONL/Parquet held out from training")
+    calibration.add_argument("--max-accuracy-drop", type=float, default=0.01,
+                             help="Accuracy the cascade may lose against the model alone")
+    calibration.add_argument("--report", help="Also write the calibration report to this JSON file")
+
+    for command in (train, calibration):
+        command.add_argument("--model", default=str(DEFAULT_MODEL_PATH), help="First-stage model file")
+        command.add_argument("--text-column", help="Column holding the comment text (auto-detected if omitted)")
+        command.add_argument("--label-column", default="sentiment", help="Column holding the gold sentiment")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """
+    Main execution function.
+    """
+    args = parse_args(argv)
+    from analyse import load_models, logger
+
+    if args.command == "train":
+        if args.labeled:
+            texts, labels = load_labeled(args.labeled, args.text_column, args.label_column)
+        else:
+            from store import ResultsStore
+            # Distillation: the stored sentiments are the transformer's answers
+            df = ResultsStore().labeled_comments()
+            texts, labels = df['comment'].tolist(), [normalize_gold_label(label) for label in df['sentiment']]
+        if not texts:
+            logger.error("No labeled comments to train on")
+            return
+        classifier = HashedNgramClassifier().fit(texts, labels, epochs=args.epochs)
+        classifier.save(args.model)
+        logger.info(f"First stage trained on {len(texts)} comment(s), saved to {args.model}")
+        logger.info("Run 'python cascade.py calibrate --labeled <held-out set>' to set its threshold")
+        return
+
+    classifier = HashedNgramClassifier.load(args.model)
+    texts, labels = load_labeled(args.labeled, args.text_column, args.label_column)
+    report = calibrate(classifier, load_models(cascade_model="", model_server=""), texts, labels,
+                       max_accuracy_drop=args.max_accuracy_drop)
+
+    logger.info("="*80)
+    logger.info("CASCADE CALIBRATION")
+    logger.info("="*80)
+    logger.info(f"\n{report['comments']} labeled comment(s): model accuracy {report['model_accuracy']:.4f}, "
+                f"first stage accuracy {report['fast_accuracy']:.4f}, agreement {report['agreement']:.4f}")
+    logger.info(f"Throughput: first stage {report['fast_comments_per_second']} comment(s)/s, "
+                f"model {report['model_comments_per_second']} comment(s)/s")
+    logger.info("\n" + pd.DataFrame(report['thresholds']).to_string(index=False))
+
+    classifier.threshold = report['recommended_threshold']
+    classifier.save(args.model)
+    logger.info(f"\nThreshold {classifier.threshold} saved to {args.model}")
+    if args.report:
+        Path(args.report).write_text(json.dumps(report, indent=2), encoding='utf-8')
+        logger.info(f"Calibration report saved to: {args.report}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+"""
+Record/replay of Gemini calls.
+
+In record mode every upload_file/generate_content call goes to the live API
+and its response is stored in a SQLite cassette under a fingerprint of the
+request (model, generation config, prompt text and the SHA-256 of uploaded
+or inline images). In replay mode the same calls are served from the cassette with no
+network access, at the recorded latency or a fixed one. 'auto' replays what
+is recorded and records the rest.
+
+analyse.py takes --gemini-cassette/--gemini-mode; the workers, the API and
+the Streamlit app read SENTIMENTPRO_GEMINI_CASSETTE, SENTIMENTPRO_GEMINI_MODE
+and SENTIMENTPRO_REPLAY_LATENCY_MS.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Mapping, Optional
+
+import google.generativeai as genai
+
+MODES = ('record', 'replay', 'auto')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    fingerprint TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    request TEXT NOT NULL,
+    response TEXT NOT NULL,
+    latency_ms REAL NOT NULL,
+    recorded_at TEXT NOT NULL
+);
+"""
+
+
+class CassetteMiss(LookupError):
+    """A replayed request has no recorded response."""
+
+
+class _Response:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class _ReplayFile:
+    """Stand-in for an uploaded file in replay mode."""
+
+    def __init__(self, digest: str):
+        self.digest = digest
+        self.name = f"files/replay-{digest[:16]}"
+
+
+def _file_digest(path) -> str:
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+class _Model:
+    """GenerativeModel replacement routing generate_content through the cassette."""
+
+    def __init__(self, cassette: "Cassette", model_name: str = "gemini-2.0-flash", generation_config=None, **kwargs):
+        self.cassette = cassette
+        self.model_name = model_name
+        self.generation_config = generation_config
+        self.kwargs = kwargs
+
+    def generate_content(self, contents, **kwargs):
+        return self.cassette._generate(self, contents, **kwargs)
+
+
+class Cassette:
+    """
+    SQLite store of Gemini responses keyed by request fingerprint.
+
+    Args:
+        path: Cassette file
+        mode: 'record', 'replay' or 'auto'
+        latency_ms: Replay delay per call; None replays the recorded latency
+    """
+
+    def __init__(self, path: str, mode: str = 'replay', latency_ms: Optional[float] = None):
+        if mode not in MODES:
+            raise ValueError(f"Unknown cassette mode '{mode}' (expected one of {MODES})")
+        self.path = Path(path)
+        self.mode = mode
+        self.latency_ms = latency_ms
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        self._uploads: Dict[str, str] = {}
+        self.stats = {'recorded': 0, 'replayed': 0, 'misses': 0}
+        self._live = (genai.upload_file, genai.GenerativeModel)
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def __len__(self):
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def _count(self, key: str):
+        with self._lock:
+            self.stats[key] += 1
+
+    def fingerprint(self, model_name: str, generation_config, parts: List) -> str:
+        """Stable hash of a request; uploaded files contribute their content digest."""
+        request = {
+            'model': model_name,
+            'generation_config': generation_config,
+            'parts': [self._describe_part(part) for part in parts],
+        }
+        encoded = json.dumps(request, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+    def _describe_part(self, part):
+        if isinstance(part, str):
+            return part
+        if isinstance(part, Mapping) and 'data' in part:
+            # Inline image bytes
+            return {'inline': hashlib.sha256(part['data']).hexdigest(), 'mime_type': part.get('mime_type')}
+        if isinstance(part, _ReplayFile):
+            return {'file': part.digest}
+        digest = self._uploads.get(getattr(part, 'name', None))
+        if digest is not None:
+            return {'file': digest}
+        return repr(part)
+
+    def lookup(self, fingerprint: str) -> Optional[Dict]:
+        """Recorded response and latency for a fingerprint, or None."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT response, latency_ms FROM responses WHERE fingerprint = ?", (fingerprint,)
+            ).fetchone()
+        return {'response': row[0], 'latency_ms': row[1]} if row else None
+
+    def save(self, fingerprint: str, model_name: str, parts: List, response: str, latency_ms: float):
+        """Store (or overwrite) the response of one request."""
+        request = json.dumps([self._describe_part(part) for part in parts], ensure_ascii=False, default=str)
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                (fingerprint, model_name, request, response, latency_ms,
+                 datetime.now().isoformat(timespec='seconds'))
+            )
+        self._count('recorded')
+
+    # Patched google.generativeai entry points
+
+    def upload_file(self, path, **kwargs):
+        digest = _file_digest(path)
+        if self.mode == 'replay':
+            return _ReplayFile(digest)
+        uploaded = self._live[0](path, **kwargs)
+        with self._lock:
+            self._uploads[uploaded.name] = digest
+        return uploaded
+
+    def _generate(self, model: _Model, contents, **kwargs):
+        parts = list(contents) if isinstance(contents, (list, tuple)) else [contents]
+        fingerprint = self.fingerprint(model.model_name, model.generation_config, parts)
+
+        if self.mode != 'record':
+            recorded = self.lookup(fingerprint)
+            if recorded is not None:
+                self._count('replayed')
+                delay = recorded['latency_ms'] if self.latency_ms is None else self.latency_ms
+                if delay:
+                    time.sleep(delay / 1000.0)
+                return _Response(recorded['response'])
+            if self.mode == 'replay':
+                self._count('misses')
+                raise CassetteMiss(f"No recorded Gemini response for request {fingerprint[:12]} in {self.path}")
+            if any(isinstance(part, _ReplayFile) for part in parts):
+                raise CassetteMiss(f"Request {fingerprint[:12]} references a file that was never uploaded")
+
+        live_model = self._live[1](
+            model_name=model.model_name, generation_config=model.generation_config, **model.kwargs
+        )
+        start = time.perf_counter()
+        response = live_model.generate_content(contents, **kwargs)
+        latency_ms = (time.perf_counter() - start) * 1000
+        self.save(fingerprint, model.model_name, parts, response.text, latency_ms)
+        return response
+
+    @contextmanager
+    def install(self):
+        """Route google.generativeai calls through the cassette for the duration of the block."""
+        self.activate()
+        try:
+            yield self
+        finally:
+            self.deactivate()
+
+    def activate(self):
+        """Route google.generativeai calls through the cassette until deactivate()."""
+        # Calls go to whatever was installed before, unless it is another cassette
+        active = getattr(genai.upload_file, '__self__', None)
+        self._live = active._live if isinstance(active, Cassette) else (genai.upload_file, genai.GenerativeModel)
+        genai.upload_file = self.upload_file
+        genai.GenerativeModel = lambda *args, **kwargs: _Model(self, *args, **kwargs)
+
+    def deactivate(self):
+        genai.upload_file, genai.GenerativeModel = self._live
+
+
+def env_mode() -> Optional[str]:
+    """Cassette mode configured by environment variables, or None."""
+    if not os.getenv("SENTIMENTPRO_GEMINI_CASSETTE"):
+        return None
+    return os.getenv("SENTIMENTPRO_GEMINI_MODE", "replay")
+
+
+def install_from_env() -> Optional[Cassette]:
+    """
+    Activate a cassette configured by environment variables, if any.
+
+    Returns:
+        Cassette: The active cassette, or None when SENTIMENTPRO_GEMINI_CASSETTE is unset
+    """
+    mode = env_mode()
+    if mode is None:
+        return None
+    latency = os.getenv("SENTIMENTPRO_REPLAY_LATENCY_MS")
+    cassette = Cassette(
+        os.getenv("SENTIMENTPRO_GEMINI_CASSETTE"),
+        mode=mode,
+        latency_ms=float(latency) if latency else None
+    )
+    cassette.activate()
+    return cassette
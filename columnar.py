@@ -0,0 +1,277 @@
+"""
+Columnar (Parquet / Arrow IPC) output for analysis results.
+
+Repeated labels are stored as categoricals/dictionaries and confidence as
+float32. RecordBuilder collects records of a run in that layout in memory,
+ResultsWriter appends one row group per finished batch, and read_results
+memory-maps the file back into a DataFrame.
+"""
+
+import time
+from array import array
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+
+CATEGORICAL_COLUMNS = ['image_source', 'sentiment', 'topic', 'theme']
+
+RESULT_COLUMNS = ['image_source', 'comment', 'sentiment', 'confidence', 'topic', 'theme']
+
+# Parquet keeps dictionary encoding per row group, so categoricals round-trip
+PARQUET_SCHEMA = pa.schema([
+    ('image_source', pa.dictionary(pa.int32(), pa.string())),
+    ('comment', pa.string()),
+    ('sentiment', pa.dictionary(pa.int8(), pa.string())),
+    ('confidence', pa.float32()),
+    ('topic', pa.dictionary(pa.int32(), pa.string())),
+    ('theme', pa.dictionary(pa.int32(), pa.string())),
+])
+
+# The IPC file format forbids dictionary replacement between batches, so
+# labels are written as plain strings and re-categorized on read
+ARROW_SCHEMA = pa.schema([
+    (field.name, field.type.value_type if pa.types.is_dictionary(field.type) else field.type)
+    for field in PARQUET_SCHEMA
+])
+
+
+def to_compact_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Convert a result DataFrame to compact dtypes.
+
+    Args:
+        df: Results following Entities/CommentAnalysis.json
+
+    Returns:
+        pd.DataFrame: Same rows with categorical labels and float32 confidence
+    """
+    compact = df.copy(deep=False)
+    for column in CATEGORICAL_COLUMNS:
+        if column in compact and not isinstance(compact[column].dtype, pd.CategoricalDtype):
+            compact[column] = compact[column].astype('category')
+    if 'confidence' in compact:
+        compact['confidence'] = compact['confidence'].astype('float32')
+    return compact
+
+
+# Smallest code dtype pandas keeps for a given number of categories
+_CODE_DTYPES = (np.int8, np.int16, np.int32)
+
+# Rows staged in array.array buffers before one vectorized copy into numpy
+_FLUSH_ROWS = 4096
+
+
+class _LabelColumn:
+    """Interned label column: integer codes into categories in order of first appearance."""
+
+    def __init__(self, capacity: int):
+        self.categories: List[str] = []
+        self.lookup: Dict[str, int] = {}
+        self.codes = np.empty(capacity, dtype=np.int8)
+        self.pending = array('i')
+
+    def code(self, value) -> int:
+        if value is None or value != value:
+            return -1
+        code = self.lookup.get(value)
+        if code is None:
+            code = len(self.categories)
+            if code + 1 >= np.iinfo(self.codes.dtype).max:
+                self.codes = self.codes.astype(_CODE_DTYPES[_CODE_DTYPES.index(self.codes.dtype.type) + 1])
+            self.lookup[value] = code
+            self.categories.append(value)
+        return code
+
+
+class RecordBuilder:
+    """
+    Append-only columnar buffer for the records of one run.
+
+    Labels are interned into categorical codes, confidence goes into a
+    float32 array and timestamps are whole-second offsets from one batch
+    start time. Rows are staged in small C arrays and copied into numpy
+    buffers in bulk; buffers grow by doubling. to_frame() returns views of
+    them, and later appends never touch rows already handed out.
+
+    Args:
+        started_at: Batch start time; records get a 'timestamp' column only when given
+        capacity: Initial number of rows
+    """
+
+    def __init__(self, started_at: Optional[datetime] = None, capacity: int = 1024):
+        self.started_at = started_at.replace(microsecond=0) if started_at is not None else None
+        self._start_epoch = self.started_at.timestamp() if started_at is not None else None
+        self._size = 0
+        self._comments = np.empty(capacity, dtype=object)
+        self._confidence = np.empty(capacity, dtype=np.float32)
+        self._offsets = np.empty(capacity, dtype=np.uint32) if started_at is not None else None
+        self._labels = {column: _LabelColumn(capacity) for column in CATEGORICAL_COLUMNS}
+        self._pending_comments = []
+        self._pending_confidence = array('f')
+        self._pending_offsets = array('I')
+
+    def __len__(self):
+        return self._size + len(self._pending_comments)
+
+    def _grow(self, needed: int):
+        capacity = len(self._comments)
+        while capacity < needed:
+            capacity *= 2
+        for name in ('_comments', '_confidence', '_offsets'):
+            old = getattr(self, name)
+            if old is not None:
+                new = np.empty(capacity, dtype=old.dtype)
+                new[:self._size] = old[:self._size]
+                setattr(self, name, new)
+        for column in self._labels.values():
+            codes = np.empty(capacity, dtype=column.codes.dtype)
+            codes[:self._size] = column.codes[:self._size]
+            column.codes = codes
+
+    def _flush(self):
+        count = len(self._pending_comments)
+        if not count:
+            return
+        start, end = self._size, self._size + count
+        if end > len(self._comments):
+            self._grow(end)
+        self._comments[start:end] = self._pending_comments
+        self._confidence[start:end] = np.frombuffer(self._pending_confidence, dtype=np.float32)
+        if self._offsets is not None:
+            self._offsets[start:end] = np.frombuffer(self._pending_offsets, dtype=np.uint32)
+        for column in self._labels.values():
+            column.codes[start:end] = np.frombuffer(column.pending, dtype=np.int32)
+            del column.pending[:]
+        self._pending_comments.clear()
+        del self._pending_confidence[:]
+        del self._pending_offsets[:]
+        self._size = end
+
+    def append(self, record: Dict):
+        """Add one record (a dict with the RESULT_COLUMNS keys)."""
+        self._pending_comments.append(record.get('comment'))
+        confidence = record.get('confidence')
+        self._pending_confidence.append(float('nan') if confidence is None else confidence)
+        for name, column in self._labels.items():
+            column.pending.append(column.code(record.get(name)))
+        if self._start_epoch is not None:
+            self._pending_offsets.append(max(0, int(time.time() - self._start_epoch)))
+        if len(self._pending_comments) >= _FLUSH_ROWS:
+            self._flush()
+
+    def extend(self, records: Iterable[Dict]):
+        """Add several records."""
+        for record in records:
+            self.append(record)
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        Results so far as a DataFrame sharing the builder's buffers.
+
+        Returns:
+            pd.DataFrame: RESULT_COLUMNS (plus 'timestamp') with categorical labels and float32 confidence
+        """
+        self._flush()
+        size = self._size
+        columns = {}
+        for name in RESULT_COLUMNS:
+            if name in self._labels:
+                column = self._labels[name]
+                columns[name] = pd.Categorical.from_codes(
+                    column.codes[:size], categories=pd.Index(column.categories, dtype=object)
+                )
+            elif name == 'comment':
+                columns[name] = self._comments[:size]
+            else:
+                columns[name] = self._confidence[:size]
+        if self._offsets is not None:
+            # The only derived column: batch start + offsets
+            start = np.datetime64(self.started_at, 's')
+            columns['timestamp'] = start + self._offsets[:size].astype('timedelta64[s]')
+        return pd.DataFrame(columns, copy=False)
+
+
+def _to_table(rows: Union[pd.DataFrame, List[Dict]], schema: pa.Schema) -> pa.Table:
+    frame = rows if isinstance(rows, pd.DataFrame) else pd.DataFrame(rows, columns=RESULT_COLUMNS)
+    frame = frame.reindex(columns=RESULT_COLUMNS)
+    arrays = []
+    for field in schema:
+        values = frame[field.name]
+        if pa.types.is_dictionary(field.type):
+            arrays.append(pa.array(values.astype(object), type=field.type.value_type).dictionary_encode()
+                          .cast(field.type))
+        else:
+            arrays.append(pa.array(values, type=field.type, from_pandas=True))
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+class ResultsWriter:
+    """
+    Incremental Parquet or Arrow IPC writer; each write_batch call is one row group/record batch.
+
+    Args:
+        path: Output file (.parquet or .arrow)
+        compression: Parquet compression codec
+    """
+
+    def __init__(self, path: str, compression: str = 'zstd'):
+        self.path = Path(path)
+        self.format = 'arrow' if self.path.suffix.lower() in ('.arrow', '.feather', '.ipc') else 'parquet'
+        self.rows = 0
+        if self.format == 'parquet':
+            self._writer = pq.ParquetWriter(self.path, PARQUET_SCHEMA, compression=compression)
+        else:
+            self._sink = pa.OSFile(str(self.path), 'wb')
+            self._writer = ipc.new_file(self._sink, ARROW_SCHEMA)
+
+    def write_batch(self, rows: Union[pd.DataFrame, List[Dict]]):
+        """Append finished records as one row group."""
+        if len(rows) == 0:
+            return
+        schema = PARQUET_SCHEMA if self.format == 'parquet' else ARROW_SCHEMA
+        self._writer.write_table(_to_table(rows, schema))
+        self.rows += len(rows)
+
+    def close(self):
+        self._writer.close()
+        if self.format == 'arrow':
+            self._sink.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_results(path: str, memory_map: bool = True) -> pd.DataFrame:
+    """
+    Load a Parquet or Arrow IPC result file written by ResultsWriter.
+
+    Args:
+        path: Result file
+        memory_map: Map the file instead of reading it into memory
+
+    Returns:
+        pd.DataFrame: Results with compact dtypes
+    """
+    path = Path(path)
+    if path.suffix.lower() in ('.arrow', '.feather', '.ipc'):
+        source = pa.memory_map(str(path)) if memory_map else pa.OSFile(str(path))
+        table = ipc.open_file(source).read_all()
+    else:
+        table = pq.read_table(path, memory_map=memory_map)
+    return to_compact_frame(table.to_pandas())
+
+
+def to_parquet_bytes(df: pd.DataFrame) -> bytes:
+    """Serialize a result DataFrame to an in-memory Parquet file."""
+    sink = pa.BufferOutputStream()
+    pq.write_table(pa.Table.from_pandas(to_compact_frame(df), preserve_index=False), sink, compression='zstd')
+    return sink.getvalue().to_pybytes()
@@ -0,0 +1,124 @@
+"""
+Deferred topic/theme enrichment for two-phase analysis.
+
+In two-phase mode the app stores each record as soon as the local model
+has scored its sentiment, with topic and theme left empty. A
+TopicEnrichment then labels those comments with batched Gemini calls in a
+background thread, writes the labels back to the results store and keeps
+them by record position, so the app can patch its result frame and charts
+while the enrichment is still running.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List
+
+import numpy as np
+
+from analyse import identify_topics_and_themes_batch, logger
+from label_index import LabelIndex
+from store import ResultsStore
+
+ENRICH_BATCH_SIZE = 20
+ENRICH_CONCURRENCY = 4
+
+
+class TopicEnrichment:
+    """
+    Background topic/theme labelling of the records of one stored batch.
+
+    Args:
+        store: Results store holding the batch
+        batch_id: Batch whose records have no topic/theme yet
+        comments: Comment texts, in the insertion order of the batch records
+        label_indexes: {'topic': LabelIndex, 'theme': LabelIndex} used to canonicalize labels
+        batch_size: Comments per Gemini call
+        concurrency: Gemini calls in flight
+    """
+
+    def __init__(self, store: ResultsStore, batch_id: str, comments: List[str],
+                 label_indexes: Dict[str, LabelIndex],
+                 batch_size: int = ENRICH_BATCH_SIZE, concurrency: int = ENRICH_CONCURRENCY):
+        self.store = store
+        self.batch_id = batch_id
+        self.comments = list(comments)
+        self.label_indexes = label_indexes
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.topics = np.full(len(self.comments), None, dtype=object)
+        self.themes = np.full(len(self.comments), None, dtype=object)
+        self.done = 0
+        self.error = None
+        self.finished = False
+        self._lock = threading.Lock()
+        self._thread = None
+        self._cancelled = threading.Event()
+
+    @property
+    def total(self) -> int:
+        return len(self.comments)
+
+    def start(self) -> "TopicEnrichment":
+        """Run the enrichment in a daemon thread."""
+        self._thread = threading.Thread(
+            target=self._run, name=f"enrichment-{self.batch_id}", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def join(self, timeout: float = None):
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def cancel(self):
+        """Stop labelling; chunks already sent to Gemini still complete."""
+        self._cancelled.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def _label_chunk(self, start: int, row_ids: List[int]):
+        if self._cancelled.is_set():
+            return
+        chunk = self.comments[start:start + self.batch_size]
+        labels = identify_topics_and_themes_batch(chunk, batch_size=self.batch_size)
+        topics = self.label_indexes['topic'].canonicalize_many([topic for topic, _ in labels])
+        themes = self.label_indexes['theme'].canonicalize_many([theme for _, theme in labels])
+        self.store.set_labels(list(zip(row_ids[start:start + len(chunk)], topics, themes)))
+        with self._lock:
+            self.topics[start:start + len(chunk)] = topics
+            self.themes[start:start + len(chunk)] = themes
+            self.done += len(chunk)
+
+    def _run(self):
+        try:
+            row_ids = self.store.comment_ids(self.batch_id)
+            if len(row_ids) != self.total:
+                raise RuntimeError(f"batch has {len(row_ids)} stored records, expected {self.total}")
+            with ThreadPoolExecutor(self.concurrency, thread_name_prefix="enrichment") as pool:
+                futures = [
+                    pool.submit(self._label_chunk, start, row_ids)
+                    for start in range(0, self.total, self.batch_size)
+                ]
+                for future in as_completed(futures):
+                    future.result()
+            if self._cancelled.is_set():
+                logger.info(f"Topic enrichment of batch {self.batch_id} cancelled ({self.done}/{self.total} comment(s))")
+            else:
+                logger.info(f"Topic enrichment of batch {self.batch_id} done ({self.total} comment(s))")
+        except Exception as e:
+            logger.error(f"Topic enrichment of batch {self.batch_id} failed: {e}", exc_info=True)
+            self.error = str(e)
+        finally:
+            self.finished = True
+
+    def snapshot(self):
+        """
+        Labels found so far.
+
+        Returns:
+            tuple: (done count, topics array, themes array); pending positions hold None
+        """
+        with self._lock:
+            return self.done, self.topics.copy(), self.themes.copy()
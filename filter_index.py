@@ -0,0 +1,150 @@
+"""
+Precomputed filter index for the Results tab.
+
+Built once per result set: an accent-folded comment column, categorical
+sentiment/theme codes with their row positions, and an inverted token index
+for search. Search matches substrings of the folded text, like str.contains,
+but only the vocabulary is scanned, not every comment. Filters return row
+positions (no DataFrame copy) and are memoized on (search, sentiment, theme).
+"""
+
+import re
+from collections import OrderedDict
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+from metrics import CACHE_LOOKUPS
+
+_TOKEN = re.compile(r"\w+")
+# Letters NFKD does not decompose, spelled out before the ASCII fold ("cœur" -> "coeur")
+_LIGATURES = str.maketrans({"œ": "oe", "Œ": "OE", "æ": "ae", "Æ": "AE", "ß": "ss"})
+
+
+def fold_series(texts: pd.Series) -> pd.Series:
+    """Lowercase and strip accents from a whole text column at once."""
+    return (
+        texts.fillna("").astype(str)
+        .str.translate(_LIGATURES)
+        .str.normalize("NFKD")
+        .str.encode("ascii", errors="ignore")
+        .str.decode("ascii")
+        .str.lower()
+    )
+
+
+def fold_text(text: str) -> str:
+    """Lowercase and strip accents from one string, like fold_series."""
+    return fold_series(pd.Series([text])).iloc[0]
+
+
+def _positions_by_code(codes: np.ndarray, n_categories: int) -> List[np.ndarray]:
+    """Sorted row positions for every category code."""
+    order = np.argsort(codes, kind="stable")
+    bounds = np.searchsorted(codes[order], np.arange(n_categories + 1))
+    return [order[bounds[i]:bounds[i + 1]] for i in range(n_categories)]
+
+
+class ResultsFilterIndex:
+    """
+    Search and category index over one result DataFrame.
+
+    Args:
+        df: Results with 'comment', 'sentiment' and 'theme' columns
+        cache_size: Number of filter results kept in memory
+    """
+
+    def __init__(self, df: pd.DataFrame, cache_size: int = 256):
+        self.size = len(df)
+        self.folded = fold_series(df['comment']).to_numpy(dtype=object)
+
+        self.sentiment = pd.Categorical(df['sentiment'])
+        self.theme = pd.Categorical(df['theme'], categories=pd.unique(df['theme'].dropna().astype(object)))
+        self._sentiment_rows = _positions_by_code(self.sentiment.codes, len(self.sentiment.categories))
+        self._theme_rows = _positions_by_code(self.theme.codes, len(self.theme.categories))
+
+        tokens = pd.Series(self.folded).str.findall(_TOKEN.pattern).explode().dropna()
+        postings = tokens.groupby(tokens, sort=True).groups
+        self._vocabulary = list(postings.keys())
+        self._postings = [np.unique(np.asarray(postings[token])) for token in self._vocabulary]
+
+        self._cache: "OrderedDict[tuple, np.ndarray]" = OrderedDict()
+        self._cache_size = cache_size
+
+    @property
+    def themes(self) -> List[str]:
+        """Themes in order of first appearance."""
+        return list(self.theme.categories)
+
+    def _category_rows(self, categorical: pd.Categorical, rows: List[np.ndarray], value: str) -> np.ndarray:
+        try:
+            return rows[categorical.categories.get_loc(value)]
+        except KeyError:
+            return np.empty(0, dtype=np.int64)
+
+    def _token_rows(self, token: str) -> np.ndarray:
+        """Rows containing a word that contains token (scan of the vocabulary, not of the rows)."""
+        words = np.flatnonzero(np.fromiter(
+            (token in word for word in self._vocabulary), dtype=bool, count=len(self._vocabulary)
+        ))
+        if not len(words):
+            return np.empty(0, dtype=np.int64)
+        return np.unique(np.concatenate([self._postings[word] for word in words]))
+
+    def _search_rows(self, search: str) -> np.ndarray:
+        query = fold_text(search).strip()
+        if not query:
+            # Only emoji or other characters the fold drops; a blank search never gets here
+            return np.empty(0, dtype=np.int64)
+        tokens = _TOKEN.findall(query)
+        if not tokens:
+            candidates = np.arange(self.size)
+        else:
+            candidates = self._token_rows(tokens[0])
+            for token in tokens[1:]:
+                if not len(candidates):
+                    break
+                candidates = np.intersect1d(candidates, self._token_rows(token), assume_unique=True)
+            # A single word occurs in a text exactly when it occurs in one of its words
+            if len(tokens) == 1 and query == tokens[0]:
+                return candidates
+        # Multi-word or punctuated queries must still match as a phrase
+        folded = self.folded[candidates]
+        return candidates[np.fromiter((query in text for text in folded), dtype=bool, count=len(folded))]
+
+    def filter(self, search: str = "", sentiment: Optional[str] = None, theme: Optional[str] = None) -> np.ndarray:
+        """
+        Row positions matching all filters, in the original order.
+
+        Args:
+            search: Free text, matched accent- and case-insensitively anywhere in the comment
+            sentiment: Sentiment label to keep, or None for all
+            theme: Theme to keep, or None for all
+
+        Returns:
+            np.ndarray: Sorted row positions (use with df.iloc)
+        """
+        key = (search.strip(), sentiment, theme)
+        if key in self._cache:
+            CACHE_LOOKUPS.labels('filter_index', 'hit').inc()
+            self._cache.move_to_end(key)
+            return self._cache[key]
+        CACHE_LOOKUPS.labels('filter_index', 'miss').inc()
+
+        rows = None
+        if sentiment is not None:
+            rows = self._category_rows(self.sentiment, self._sentiment_rows, sentiment)
+        if theme is not None:
+            theme_rows = self._category_rows(self.theme, self._theme_rows, theme)
+            rows = theme_rows if rows is None else np.intersect1d(rows, theme_rows, assume_unique=True)
+        if key[0]:
+            search_rows = self._search_rows(key[0])
+            rows = search_rows if rows is None else np.intersect1d(rows, search_rows, assume_unique=True)
+        if rows is None:
+            rows = np.arange(self.size)
+
+        self._cache[key] = rows
+        if len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+        return rows
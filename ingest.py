@@ -0,0 +1,193 @@
+"""
+Text-only ingestion for comment exports (CSV, JSONL, Parquet).
+
+Comments are streamed from disk in chunks, skip the Gemini screenshot
+extraction entirely and go straight to the batched sentiment and
+topic/theme stages. Results are appended to the output file chunk by
+chunk, so memory stays bounded whatever the input size.
+"""
+
+import os
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional
+
+import pandas as pd
+
+from analyse import (
+    analyze_sentiment_batch,
+    identify_topics_and_themes_batch,
+    logger,
+)
+from aggregates import ResultAggregates
+from columnar import ResultsWriter
+from label_index import LabelIndex
+from memory import MemoryBudget
+from metrics import COMMENTS_PROCESSED
+from prefilter import CommentFilter
+from profiling import span
+
+# Column names tried, in order, when no text column is given
+TEXT_COLUMN_CANDIDATES = ['comment', 'text', 'message', 'body', 'content', 'commentaire']
+
+OUTPUT_COLUMNS = ['image_source', 'comment', 'sentiment', 'confidence', 'topic', 'theme']
+
+
+def _input_format(path: Path) -> str:
+    suffix = path.suffix.lower()
+    if suffix == '.csv':
+        return 'csv'
+    if suffix in ('.jsonl', '.ndjson'):
+        return 'jsonl'
+    if suffix in ('.parquet', '.pq'):
+        return 'parquet'
+    raise ValueError(f"Unsupported input format '{suffix}' (expected .csv, .jsonl or .parquet)")
+
+
+def _column_names(path: Path, input_format: str) -> List[str]:
+    """Read only the schema/header of the input file."""
+    if input_format == 'csv':
+        return list(pd.read_csv(path, nrows=0).columns)
+    if input_format == 'jsonl':
+        return list(next(pd.read_json(path, lines=True, chunksize=1)).columns)
+    import pyarrow.parquet as pq
+    return pq.ParquetFile(path).schema_arrow.names
+
+
+def resolve_text_column(path: Path, text_column: Optional[str] = None) -> str:
+    """
+    Find the column holding the comment text.
+
+    Args:
+        path: Input file
+        text_column: Explicit column name, if known
+
+    Returns:
+        str: Name of the text column
+    """
+    columns = _column_names(path, _input_format(path))
+    if text_column:
+        if text_column not in columns:
+            raise ValueError(f"Column '{text_column}' not found in {path} (columns: {columns})")
+        return text_column
+    lowered = {column.lower(): column for column in columns}
+    for candidate in TEXT_COLUMN_CANDIDATES:
+        if candidate in lowered:
+            return lowered[candidate]
+    raise ValueError(f"No text column found in {path}; pass one explicitly (columns: {columns})")
+
+
+def iter_comment_chunks(path: str, text_column: Optional[str] = None, chunk_size: int = 5000) -> Iterator[List[str]]:
+    """
+    Stream comment texts from a CSV, JSONL or Parquet file.
+
+    Args:
+        path: Input file
+        text_column: Column holding the comment text (auto-detected if None)
+        chunk_size: Number of rows read at a time
+
+    Yields:
+        list: Comment texts of one chunk
+    """
+    path = Path(path)
+    input_format = _input_format(path)
+    column = resolve_text_column(path, text_column)
+
+    if input_format == 'csv':
+        chunks = (chunk[column] for chunk in pd.read_csv(path, usecols=[column], chunksize=chunk_size, dtype=str))
+    elif input_format == 'jsonl':
+        chunks = (chunk[column] for chunk in pd.read_json(path, lines=True, chunksize=chunk_size, dtype=False))
+    else:
+        import pyarrow.parquet as pq
+        parquet_file = pq.ParquetFile(path)
+        chunks = (
+            batch.column(0).to_pandas()
+            for batch in parquet_file.iter_batches(batch_size=chunk_size, columns=[column])
+        )
+
+    for series in chunks:
+        yield series.dropna().astype(str).tolist()
+
+
+def analyze_text_file(
+    path: str,
+    sentiment_model,
+    output_path: str,
+    text_column: Optional[str] = None,
+    chunk_size: int = 5000,
+    sentiment_batch_size: int = 32,
+    columnar_path: Optional[str] = None,
+    on_records: Optional[Callable[[List[Dict]], None]] = None,
+    budget: Optional[MemoryBudget] = None
+) -> Dict:
+    """
+    Analyze every comment of a text export and append results to a CSV file.
+
+    Args:
+        path: Input CSV/JSONL/Parquet file
+        sentiment_model: Sentiment analysis pipeline
+        output_path: CSV file receiving one row per analyzed comment
+        text_column: Column holding the comment text (auto-detected if None)
+        chunk_size: Number of rows read and analyzed at a time
+        sentiment_batch_size: Number of texts per model forward pass
+        columnar_path: Parquet/Arrow file also receiving one row group per chunk, if given
+        on_records: Called with the records of each analyzed chunk
+        budget: Memory budget; each chunk waits for headroom before it is analyzed
+
+    Returns:
+        dict: Counts of read/analyzed comments, the pre-filter report and the ResultAggregates of the output
+    """
+    source = os.path.basename(path)
+    comment_filter = CommentFilter()
+    theme_index = LabelIndex()
+    topic_index = LabelIndex()
+    aggregates = ResultAggregates()
+    read = 0
+    analyzed = 0
+
+    if os.path.exists(output_path):
+        os.remove(output_path)
+    writer = ResultsWriter(columnar_path) if columnar_path else None
+
+    try:
+        for chunk_idx, texts in enumerate(iter_comment_chunks(path, text_column, chunk_size), 1):
+            read += len(texts)
+            with span("prefilter", items=len(texts)):
+                comments = comment_filter(texts)
+            if not comments:
+                continue
+
+            if budget is not None and budget.wait_for_headroom():
+                logger.info(f"Memory budget: resumed at {budget.sample():.0f}/{budget.limit_mb:.0f} MB")
+
+            logger.info(f"Chunk {chunk_idx}: analyzing {len(comments)} comment(s) ({read} read so far)")
+
+            sentiments = analyze_sentiment_batch(comments, sentiment_model, batch_size=sentiment_batch_size)
+            topics = identify_topics_and_themes_batch(comments)
+
+            frame = pd.DataFrame({
+                'image_source': source,
+                'comment': comments,
+                'sentiment': [sentiment for sentiment, _ in sentiments],
+                'confidence': [round(confidence, 4) for _, confidence in sentiments],
+                'topic': topic_index.canonicalize_many([topic for topic, _ in topics]),
+                'theme': theme_index.canonicalize_many([theme for _, theme in topics]),
+            }, columns=OUTPUT_COLUMNS)
+            with span("export.csv", items=len(frame)):
+                frame.to_csv(output_path, mode='a', header=analyzed == 0, index=False, encoding='utf-8')
+            if writer is not None:
+                with span("export.columnar", items=len(frame)):
+                    writer.write_batch(frame)
+            if on_records is not None:
+                on_records(frame.to_dict('records'))
+
+            analyzed += len(frame)
+            aggregates.update(frame)
+            for sentiment, count in frame['sentiment'].value_counts().items():
+                COMMENTS_PROCESSED.labels(sentiment).inc(count)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    logger.info(f"Text ingestion complete: {analyzed}/{read} comment(s) analyzed, saved to {output_path}")
+    logger.info(f"Pre-filter: {comment_filter.describe()}")
+    return {'read': read, 'analyzed': analyzed, 'filtered': comment_filter.report(), 'aggregates': aggregates}
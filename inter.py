@@ -8,16 +8,36 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime
+from collections import deque
 import os
 import json
 from pathlib import Path
 import io
 import base64
+import mimetypes
+import tempfile
 from typing import List, Dict
 import google.generativeai as genai
 from transformers import pipeline, CamembertTokenizer, AutoModelForSequenceClassification
 from dotenv import load_dotenv
+from openpyxl import Workbook
 import time
+from label_index import LabelIndex
+from jobs import JobQueue, estimate_progress
+from batching import MicroBatcher
+from analyse import analyze_sentiment_batch
+from filter_index import ResultsFilterIndex
+from aggregates import ResultAggregates
+from columnar import RecordBuilder, to_compact_frame, to_parquet_bytes
+from store import new_batch_id
+from cassette import install_from_env
+from memory import budget_from_env, budget_limit_from_env
+from thumbnails import ThumbnailCache
+from enrichment import TopicEnrichment
+from cascade import cascade_from_env
+from prefilter import AnalysisCache, CommentFilter
+from model_server import ModelServerError, RemoteSentimentModel, remote_model_from_env
+from metrics import COMMENTS_PROCESSED, QUEUE_DEPTH, metrics_port_from_env, start_metrics_server
 
 # Load environment
 load_dotenv()
@@ -906,8 +926,26 @@ if 'current_results' not in st.session_state:
     st.session_state.current_results = None
 if 'model_loaded' not in st.session_state:
     st.session_state.model_loaded = False
-if 'sentiment_model' not in st.session_state:
-    st.session_state.sentiment_model = None
+if 'sentiment_batcher' not in st.session_state:
+    st.session_state.sentiment_batcher = None
+if 'active_batch_id' not in st.session_state:
+    st.session_state.active_batch_id = None
+if 'job_notice' not in st.session_state:
+    st.session_state.job_notice = None
+if 'results_version' not in st.session_state:
+    st.session_state.results_version = 0
+if 'filter_index' not in st.session_state:
+    st.session_state.filter_index = None
+if 'result_aggregates' not in st.session_state:
+    st.session_state.result_aggregates = None
+if 'exports' not in st.session_state:
+    st.session_state.exports = {}
+if 'current_batch_id' not in st.session_state:
+    st.session_state.current_batch_id = None
+if 'enrichment_batch_id' not in st.session_state:
+    st.session_state.enrichment_batch_id = None
+if 'enrichment_seen' not in st.session_state:
+    st.session_state.enrichment_seen = 0
 
 # Prompts
 PROMPT_EXTRACT = """Extract all user comments from this screenshot.
@@ -928,7 +966,11 @@ Example output format:
 
 @st.cache_resource
 def load_sentiment_model():
-    """Load sentiment analysis model (cached)"""
+    """Load sentiment analysis model, behind the cascade first stage when one is configured (cached)"""
+    remote = remote_model_from_env()
+    if remote is not None:
+        # Weights live in the shared model server
+        return remote
     try:
         model_name = "cmarkea/distilcamembert-base-sentiment"
         tokenizer = CamembertTokenizer.from_pretrained(model_name, token=HF_TOKEN)
@@ -939,63 +981,102 @@ def load_sentiment_model():
             tokenizer=tokenizer,
             device=-1
         )
-        return sentiment_pipeline
+        return cascade_from_env(sentiment_pipeline)
     except Exception as e:
         st.error(f"Erreur lors du chargement du modèle: {e}")
         return None
 
+@st.cache_resource
+def get_sentiment_batcher():
+    """Request coalescer shared by all sessions around the cached model"""
+    sentiment_model = load_sentiment_model()
+    if sentiment_model is None:
+        return None
+    return MicroBatcher(
+        lambda texts: analyze_sentiment_batch(texts, sentiment_model)
+    )
+
+def reset_sentiment_model():
+    """Drop the cached model and batcher, so the next run reconnects to the model server or loads the model locally"""
+    get_sentiment_batcher.clear()
+    load_sentiment_model.clear()
+    st.session_state.sentiment_batcher = None
+    st.session_state.model_loaded = False
+
+@st.cache_resource
+def get_enrichment_tasks():
+    """Running topic/theme enrichments by batch_id, shared by all sessions (cached)"""
+    return {}
+
+@st.cache_resource
+def get_thumbnail_cache():
+    """Upload preview thumbnails shared by all sessions (cached)"""
+    return ThumbnailCache()
+
+@st.cache_resource
+def load_label_indexes():
+    """Canonical topic/theme labels shared by all sessions (cached)"""
+    return {'topic': LabelIndex(), 'theme': LabelIndex()}
+
+@st.cache_resource
+def get_job_queue():
+    """Background job queue shared by all sessions (cached)"""
+    queue = JobQueue()
+    QUEUE_DEPTH.labels('jobs').set_function(queue.pending_jobs)
+    return queue
+
+@st.cache_resource
+def start_metrics_endpoint():
+    """Prometheus endpoint of the app process, when SENTIMENTPRO_METRICS_PORT is set (started once)"""
+    port = metrics_port_from_env()
+    return start_metrics_server(port) if port is not None else None
+
+@st.cache_resource
+def install_gemini_cassette():
+    """Gemini record/replay cassette of the app process, when SENTIMENTPRO_GEMINI_CASSETTE is set (installed once)"""
+    return install_from_env()
+
+# Gemini requests are capped at 20 MB, larger images go through the Files API
+INLINE_IMAGE_MAX_BYTES = 15 * 1024 * 1024
+# Spool of those large images: tmpfs when available, never the working directory
+SPOOL_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else None
+
+def _extract_from_part(image_part):
+    """Send the extraction prompt with one image part (inline bytes or uploaded file)"""
+    model = genai.GenerativeModel(
+        model_name="gemini-2.0-flash",
+        generation_config={"response_mime_type": "application/json"}
+    )
+    
+    response = model.generate_content([PROMPT_EXTRACT, image_part])
+    result = json.loads(response.text)
+    
+    if isinstance(result, list):
+        return result
+    elif isinstance(result, dict):
+        return result.get("content", result.get("comments", []))
+    return []
+
 def extract_comments_from_image(image_file):
-    """Extract comments from uploaded image"""
+    """Extract comments from uploaded image, sent inline from memory (spooled to a private tmpfs folder when too large)"""
     try:
-        temp_path = f"temp_{image_file.name}"
-        with open(temp_path, "wb") as f:
-            f.write(image_file.getbuffer())
-        
-        uploaded_file = genai.upload_file(temp_path)
-        
-        model = genai.GenerativeModel(
-            model_name="gemini-2.0-flash",
-            generation_config={"response_mime_type": "application/json"}
-        )
+        # getvalue() shares the upload's bytes, no copy
+        data = image_file.getvalue()
+        if len(data) <= INLINE_IMAGE_MAX_BYTES:
+            mime_type = image_file.type or mimetypes.guess_type(image_file.name)[0] or "image/png"
+            return _extract_from_part({"mime_type": mime_type, "data": data})
         
-        response = model.generate_content([PROMPT_EXTRACT, uploaded_file])
-        result = json.loads(response.text)
-        
-        os.remove(temp_path)
-        
-        if isinstance(result, list):
-            return result
-        elif isinstance(result, dict):
-            return result.get("content", result.get("comments", []))
-        return []
+        # One folder per call: concurrent sessions uploading the same file name never collide
+        with tempfile.TemporaryDirectory(prefix="sentimentpro-upload-", dir=SPOOL_DIR) as spool:
+            path = os.path.join(spool, os.path.basename(image_file.name) or "image")
+            with open(path, "wb") as f:
+                f.write(data)
+            return _extract_from_part(genai.upload_file(path))
         
     except Exception as e:
         st.error(f"Erreur extraction {image_file.name}: {e}")
         return []
 
-def analyze_sentiment(text: str, sentiment_model):
-    """Analyze sentiment of text"""
-    try:
-        result = sentiment_model(text[:512])[0]
-        label = result['label'].lower()
-        score = result['score']
-        
-        if 'star' in label:
-            if label in ['1 star', '2 stars']:
-                return 'negative', score
-            elif label == '3 stars':
-                return 'neutral', score
-            else:
-                return 'positive', score
-        
-        if label in ['positive', 'negative', 'neutral']:
-            return label, score
-        
-        return "neutral", score
-        
-    except Exception as e:
-        return "neutral", 0.0
-
 def identify_topic_theme(text: str):
     """Identify topic and theme using Gemini"""
     try:
@@ -1027,52 +1108,293 @@ Example:
     except Exception as e:
         return "Non défini", "Non défini"
 
-def process_images(uploaded_files, sentiment_model, progress_bar, status_text, stats_container):
-    """Process multiple images"""
-    all_data = []
-    total_files = len(uploaded_files)
-    total_comments = 0
-    
-    for idx, file in enumerate(uploaded_files):
-        status_text.markdown(f"""
-            <div style="text-align: center; color: var(--neutral-500); font-size: 14px;">
-                Traitement de <strong>{file.name}</strong> ({idx + 1}/{total_files})
-            </div>
-        """, unsafe_allow_html=True)
-        
-        progress_bar.progress((idx + 0.3) / total_files)
+def process_images(uploaded_files, sentiment_batcher, on_progress=None, on_record=None, budget=None, two_phase=False, comment_filter=None):
+    """Process multiple images, reporting each stage and each record as soon as it is ready (one image at a time under a memory budget; topic/theme left empty in two-phase mode; repeated comments reuse their first analysis)"""
+    comment_filter = comment_filter if comment_filter is not None else CommentFilter()
+    analysis_cache = AnalysisCache()
+    results = RecordBuilder(started_at=datetime.now())
+    label_indexes = load_label_indexes()
+    progress = {
+        'total_images': len(uploaded_files),
+        'images_extracted': 0,
+        'images_done': 0,
+        'comments_found': 0,
+        'comments_done': 0,
+        'extract_seconds': 0.0,
+        'analyze_seconds': 0.0,
+        'current_image': None,
+        'memory_mb': None
+    }
+    
+    for file in uploaded_files:
+        progress['current_image'] = file.name
+        if budget is not None:
+            budget.wait_for_headroom()
+            progress['memory_mb'] = budget.sample()
+        if on_progress:
+            on_progress(progress)
         
+        started = time.perf_counter()
         comments = extract_comments_from_image(file)
-        total_comments += len(comments)
-        
-        stats_container.markdown(f"""
-            <div style="text-align: center; margin-top: 16px;">
-                <span class="badge badge-primary">{total_comments} commentaires extraits</span>
-            </div>
-        """, unsafe_allow_html=True)
+        comments = comment_filter(comments)
+        last = time.perf_counter()
+        progress['images_extracted'] += 1
+        progress['comments_found'] += len(comments)
+        progress['extract_seconds'] += last - started
+        if on_progress:
+            on_progress(progress)
         
-        progress_bar.progress((idx + 0.6) / total_files)
+        analyses = {}
+        for comment in comments:
+            if comment not in analyses:
+                analyses[comment] = analysis_cache.get(comment)
+        fresh = [comment for comment, analysis in analyses.items() if analysis is None]
+        sentiments = dict(zip(fresh, sentiment_batcher.submit(fresh))) if fresh else {}
         
         for comment in comments:
-            if len(comment.strip()) < 10:
-                continue
-            
-            sentiment, confidence = analyze_sentiment(comment, sentiment_model)
-            topic, theme = identify_topic_theme(comment)
+            analysis = analyses[comment]
+            if analysis is None:
+                sentiment, confidence = sentiments[comment]
+                if two_phase:
+                    # Filled in later by a TopicEnrichment
+                    topic, theme = None, None
+                else:
+                    topic, theme = identify_topic_theme(comment)
+                    topic = label_indexes['topic'].canonicalize(topic)
+                    theme = label_indexes['theme'].canonicalize(theme)
+                analysis = analyses[comment] = (sentiment, confidence, topic, theme)
+                analysis_cache.put(comment, analysis)
+            sentiment, confidence, topic, theme = analysis
             
-            all_data.append({
+            record = {
                 'image_source': file.name,
                 'comment': comment,
                 'sentiment': sentiment,
                 'confidence': round(confidence, 4),
                 'topic': topic,
-                'theme': theme,
-                'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            })
+                'theme': theme
+            }
+            results.append(record)
+            COMMENTS_PROCESSED.labels(sentiment).inc()
+            
+            now = time.perf_counter()
+            progress['comments_done'] += 1
+            progress['analyze_seconds'] += now - last
+            last = now
+            if on_record:
+                on_record(record)
+            if on_progress:
+                on_progress(progress)
         
-        progress_bar.progress((idx + 1) / total_files)
+        progress['images_done'] += 1
+    
+    progress['current_image'] = None
+    if on_progress:
+        on_progress(progress)
+    
+    return results.to_frame()
+
+def format_duration(seconds):
+    """Human-readable remaining time"""
+    if seconds is None:
+        return "estimation..."
+    seconds = int(round(seconds))
+    if seconds < 60:
+        return f"{seconds} s"
+    if seconds < 3600:
+        return f"{seconds // 60} min {seconds % 60:02d} s"
+    return f"{seconds // 3600} h {seconds % 3600 // 60:02d} min"
+
+def render_stage_progress(progress, title, subtitle):
+    """Render per-stage progress, throughput and ETA of a running batch"""
+    estimate = estimate_progress(progress)
+    total = progress['total_images']
+    extraction_done = progress['images_extracted'] >= total
+    analysis_done = extraction_done and progress['comments_done'] >= progress['comments_found']
+    extraction_state = 'completed' if extraction_done else 'active'
+    analysis_state = 'completed' if analysis_done else ('active' if progress['images_extracted'] else 'pending')
+    results_state = 'completed' if analysis_done else ('active' if progress['comments_done'] else 'pending')
+    
+    rate = estimate['comments_per_second']
+    rate_text = f"{rate * 60:.1f} commentaires/min" if rate else "débit en cours de mesure"
     
-    return pd.DataFrame(all_data)
+    st.markdown(f"""
+    <div class="progress-container">
+        <div class="progress-spinner"></div>
+        <div class="progress-title">{title}</div>
+        <div class="progress-subtitle">{subtitle} · {rate_text} · temps restant : {format_duration(estimate['eta_seconds'])}</div>
+        <div class="progress-steps">
+            <div class="progress-step">
+                <div class="progress-step-icon {extraction_state}">📷</div>
+                <div class="progress-step-label">Extraction {progress['images_extracted']}/{total}</div>
+            </div>
+            <div class="progress-step">
+                <div class="progress-step-icon {analysis_state}">🧠</div>
+                <div class="progress-step-label">Analyse {progress['comments_done']}/{progress['comments_found']}</div>
+            </div>
+            <div class="progress-step">
+                <div class="progress-step-icon {results_state}">✓</div>
+                <div class="progress-step-label">Images terminées {progress['images_done']}/{total}</div>
+            </div>
+        </div>
+    </div>
+    """, unsafe_allow_html=True)
+    st.progress(min(estimate['fraction'], 1.0))
+
+def get_results_store():
+    """Persistent results store, shared with the job queue"""
+    return get_job_queue().store
+
+def set_current_results(df, batch_id=None):
+    """Replace the current result set and invalidate everything derived from it"""
+    if df is not None and budget_limit_from_env() is not None:
+        df = to_compact_frame(df)
+    st.session_state.current_results = df
+    st.session_state.current_batch_id = batch_id
+    st.session_state.results_version += 1
+
+def append_current_results(new_rows):
+    """Append freshly analyzed rows to the current result set, updating its aggregates in place"""
+    combined = pd.concat([st.session_state.current_results, new_rows], ignore_index=True)
+    st.session_state.current_results = to_compact_frame(combined) if budget_limit_from_env() is not None else combined
+    st.session_state.results_version += 1
+    cached = st.session_state.result_aggregates
+    if cached is not None and cached[0] == st.session_state.results_version - 1:
+        cached[1].update(new_rows)
+        st.session_state.result_aggregates = (st.session_state.results_version, cached[1])
+
+def get_filter_index():
+    """Filter index of the current result set, built once per version"""
+    cached = st.session_state.filter_index
+    if cached is None or cached[0] != st.session_state.results_version:
+        cached = (st.session_state.results_version, ResultsFilterIndex(st.session_state.current_results))
+        st.session_state.filter_index = cached
+    return cached[1]
+
+def get_result_aggregates():
+    """Counts, crosstab and histograms of the current result set, built once per version"""
+    cached = st.session_state.result_aggregates
+    if cached is None or cached[0] != st.session_state.results_version:
+        batch_id = st.session_state.current_batch_id
+        # A streaming job already has more rows in the store than in the frame, and the rows
+        # loaded next are added with update(): count only what the frame holds
+        if batch_id is not None and batch_id != st.session_state.active_batch_id:
+            aggregates = get_results_store().aggregates(batch_id)
+        else:
+            aggregates = ResultAggregates.from_frame(st.session_state.current_results)
+        cached = (st.session_state.results_version, aggregates)
+        st.session_state.result_aggregates = cached
+    return cached[1]
+
+@st.fragment(run_every=2)
+def render_job_progress():
+    """Poll the background job of this session and stream its records into the results"""
+    batch_id = st.session_state.active_batch_id
+    if batch_id is None:
+        return
+    
+    queue = get_job_queue()
+    job = queue.get_job(batch_id)
+    if job is None:
+        st.session_state.active_batch_id = None
+        st.query_params.pop('job', None)
+        return
+    
+    # Records already shown for this batch; only the new ones are loaded
+    loaded = 0
+    if st.session_state.current_batch_id == batch_id and st.session_state.current_results is not None:
+        loaded = len(st.session_state.current_results)
+    
+    if job['status'] in ('queued', 'running'):
+        if job['status'] == 'queued':
+            render_stage_progress(job, "En attente d'un worker", f"Lot {batch_id}")
+        else:
+            render_stage_progress(job, "Analyse en cours", f"Lot {batch_id} · résultats affichés au fil de l'eau")
+        if job['comments_done'] > loaded:
+            new_rows = queue.get_results(batch_id, loaded)
+            if loaded:
+                append_current_results(new_rows)
+            else:
+                set_current_results(new_rows, batch_id)
+            st.rerun()
+        return
+    
+    st.session_state.active_batch_id = None
+    st.query_params.pop('job', None)
+    if job['status'] == 'failed':
+        st.session_state.job_notice = ('error', f"Erreur lors de l'analyse du lot {batch_id}: {job['error']}")
+    else:
+        new_rows = queue.get_results(batch_id, loaded)
+        if len(new_rows) > 0:
+            if loaded:
+                append_current_results(new_rows)
+            else:
+                set_current_results(new_rows, batch_id)
+        total = loaded + len(new_rows)
+        if total > 0:
+            st.session_state.analysis_history.append({
+                'timestamp': datetime.now(),
+                'batch_id': batch_id,
+                'images': job['total_images'],
+                'comments': total
+            })
+            st.session_state.job_notice = ('success', f"✅ Analyse terminée : {total} commentaires analysés")
+        else:
+            st.session_state.job_notice = ('warning', "⚠️ Aucun commentaire détecté dans les images")
+    st.rerun()
+
+def restore_active_job():
+    """Resume following the job named in the URL after a browser reload"""
+    batch_id = st.query_params.get('job')
+    if not batch_id or st.session_state.active_batch_id is not None:
+        return
+    if get_job_queue().get_job(batch_id) is None:
+        st.query_params.pop('job', None)
+    else:
+        st.session_state.active_batch_id = batch_id
+
+@st.fragment(run_every=2)
+def render_enrichment_progress():
+    """Poll the background topic/theme enrichment of this session and patch the results with its labels"""
+    batch_id = st.session_state.enrichment_batch_id
+    if batch_id is None:
+        return
+    
+    task = get_enrichment_tasks().get(batch_id)
+    if task is None:
+        st.session_state.enrichment_batch_id = None
+        return
+    
+    done, topics, themes = task.snapshot()
+    st.caption(f"🏷️ Thèmes et sujets en cours d'attribution : {done}/{task.total}")
+    st.progress(done / task.total if task.total else 1.0)
+    
+    if done != st.session_state.enrichment_seen or task.finished:
+        st.session_state.enrichment_seen = done
+        current = st.session_state.current_results
+        if st.session_state.current_batch_id == batch_id and current is not None and len(current) == task.total:
+            # Rows of the current results are in the order of the enriched comments
+            df = current.copy(deep=False)
+            df['topic'] = topics
+            df['theme'] = themes
+            set_current_results(df, batch_id)
+        if task.finished:
+            st.session_state.enrichment_batch_id = None
+            get_enrichment_tasks().pop(batch_id, None)
+            if task.error:
+                st.session_state.job_notice = ('error', f"Erreur lors de l'attribution des thèmes du lot {batch_id}: {task.error}")
+        st.rerun()
+
+def cancel_enrichment():
+    """Stop the background topic/theme enrichment of this session, if any"""
+    batch_id = st.session_state.enrichment_batch_id
+    if batch_id is None:
+        return
+    task = get_enrichment_tasks().pop(batch_id, None)
+    if task is not None:
+        task.cancel()
+    st.session_state.enrichment_batch_id = None
+    st.session_state.enrichment_seen = 0
 
 def render_navbar():
     """Render navigation bar"""
@@ -1099,12 +1421,12 @@ def render_navbar():
     </div>
     """, unsafe_allow_html=True)
 
-def render_metrics(df):
+def render_metrics(aggregates):
     """Render metrics cards"""
-    total = len(df)
-    positive = len(df[df['sentiment'] == 'positive'])
-    negative = len(df[df['sentiment'] == 'negative'])
-    neutral = len(df[df['sentiment'] == 'neutral'])
+    total = aggregates.total
+    positive = aggregates.sentiment_count('positive')
+    negative = aggregates.sentiment_count('negative')
+    neutral = aggregates.sentiment_count('neutral')
     
     pos_pct = round(positive/total*100) if total > 0 else 0
     neg_pct = round(negative/total*100) if total > 0 else 0
@@ -1144,41 +1466,84 @@ def render_metrics(df):
     </div>
     """, unsafe_allow_html=True)
 
-def render_comment_card(row, idx):
-    """Render a comment card"""
-    sentiment_config = {
-        'positive': ('✓ Positif', 'positive'),
-        'negative': ('✗ Négatif', 'negative'),
-        'neutral': ('○ Neutre', 'neutral')
-    }
-    
-    badge_text, badge_class = sentiment_config.get(row['sentiment'], ('○ Neutre', 'neutral'))
-    confidence = round(row['confidence'] * 100)
+SENTIMENT_BADGES = {
+    'positive': ('✓ Positif', 'positive'),
+    'negative': ('✗ Négatif', 'negative'),
+    'neutral': ('○ Neutre', 'neutral')
+}
+
+COMMENTS_PER_PAGE = 25
+PREVIEWS_PER_PAGE = 10
+# In-session runs store and render their records in groups, not one by one
+LIVE_FLUSH_RECORDS = 50
+LIVE_FLUSH_SECONDS = 1.0
+
+def _escape_html(series):
+    """HTML-escape a whole text column"""
+    return (
+        series.astype(object).fillna('').astype(str)
+        .str.replace('&', '&amp;', regex=False)
+        .str.replace('<', '&lt;', regex=False)
+        .str.replace('>', '&gt;', regex=False)
+        .str.replace('"', '&quot;', regex=False)
+    )
+
+def render_image_previews(uploaded_files):
+    """Paged grid of cached thumbnails of the uploads"""
+    total_pages = max(1, -(-len(uploaded_files) // PREVIEWS_PER_PAGE))
+    page = 1
+    if total_pages > 1:
+        st.session_state.preview_page = min(st.session_state.get('preview_page', 1), total_pages)
+        page = st.number_input("Page d'aperçu", min_value=1, max_value=total_pages, step=1, key="preview_page")
+    start = (page - 1) * PREVIEWS_PER_PAGE
+    page_files = uploaded_files[start:start + PREVIEWS_PER_PAGE]
+    
+    thumbnails = get_thumbnail_cache()
+    cols = st.columns(5)
+    for idx, file in enumerate(page_files):
+        with cols[idx % 5]:
+            try:
+                thumbnail = thumbnails.get(file.getvalue())
+            except Exception:
+                st.caption(f"{file.name} (aperçu indisponible)")
+                continue
+            # use_column_width: st.image has no use_container_width in the pinned Streamlit 1.39
+            st.image(thumbnail, caption=file.name, use_column_width=True)
+    if total_pages > 1:
+        st.caption(f"Images {start + 1}–{start + len(page_files)} sur {len(uploaded_files)}")
+
+def render_comment_page(page_df, start):
+    """Render one page of comment cards in a single markdown call"""
+    if page_df.empty:
+        return
+    
+    sentiment = page_df['sentiment'].astype(object)
+    badge_text = sentiment.map({k: v[0] for k, v in SENTIMENT_BADGES.items()}).fillna('○ Neutre')
+    badge_class = sentiment.map({k: v[1] for k, v in SENTIMENT_BADGES.items()}).fillna('neutral')
+    confidence = (page_df['confidence'].fillna(0) * 100).round().astype(int).astype(str)
+    number = pd.Series(range(start + 1, start + 1 + len(page_df)), index=page_df.index).astype(str)
+    
+    cards = (
+        '<div class="comment-card"><div class="comment-header"><div class="comment-meta">'
+        + '<span class="badge badge-' + badge_class + '">' + badge_text + '</span>'
+        + '<span class="badge badge-secondary">#' + number + '</span>'
+        + '</div><div class="comment-confidence">'
+        + '<div class="comment-confidence-label">Confiance</div>'
+        + '<div class="comment-confidence-value">' + confidence + '%</div>'
+        + '</div></div>'
+        + '<div class="comment-text">' + _escape_html(page_df['comment']) + '</div>'
+        + '<div class="comment-tags">'
+        + '<span class="badge badge-primary">🏷️ ' + _escape_html(page_df['theme'].astype(object).fillna('⏳ en cours')) + '</span>'
+        + '<span class="badge badge-secondary">📌 ' + _escape_html(page_df['topic'].astype(object).fillna('⏳ en cours')) + '</span>'
+        + '<span class="badge badge-secondary">📄 ' + _escape_html(page_df['image_source']) + '</span>'
+        + '</div></div>'
+    )
     
-    st.markdown(f"""
-    <div class="comment-card">
-        <div class="comment-header">
-            <div class="comment-meta">
-                <span class="badge badge-{badge_class}">{badge_text}</span>
-                <span class="badge badge-secondary">#{idx + 1}</span>
-            </div>
-            <div class="comment-confidence">
-                <div class="comment-confidence-label">Confiance</div>
-                <div class="comment-confidence-value">{confidence}%</div>
-            </div>
-        </div>
-        <div class="comment-text">{row['comment']}</div>
-        <div class="comment-tags">
-            <span class="badge badge-primary">🏷️ {row['theme']}</span>
-            <span class="badge badge-secondary">📌 {row['topic']}</span>
-            <span class="badge badge-secondary">📄 {row['image_source']}</span>
-        </div>
-    </div>
-    """, unsafe_allow_html=True)
+    st.markdown(''.join(cards), unsafe_allow_html=True)
 
-def create_sentiment_chart(df):
+def create_sentiment_chart(aggregates):
     """Create sentiment pie chart"""
-    sentiment_counts = df['sentiment'].value_counts()
+    sentiment_counts = aggregates.sentiment_distribution()
     
     colors = {'positive': '#00875A', 'neutral': '#FF8B00', 'negative': '#DE350B'}
     labels = {'positive': 'Positif', 'neutral': 'Neutre', 'negative': 'Négatif'}
@@ -1209,7 +1574,7 @@ def create_sentiment_chart(df):
         plot_bgcolor='rgba(0,0,0,0)',
         height=320,
         annotations=[dict(
-            text=f"<b>{len(df)}</b><br>Total",
+            text=f"<b>{aggregates.total}</b><br>Total",
             x=0.5, y=0.5,
             font_size=16,
             showarrow=False
@@ -1218,9 +1583,9 @@ def create_sentiment_chart(df):
     
     return fig
 
-def create_theme_chart(df):
+def create_theme_chart(aggregates):
     """Create theme bar chart"""
-    theme_counts = df['theme'].value_counts().head(8)
+    theme_counts = aggregates.top_themes(8)
     
     fig = go.Figure(data=[go.Bar(
         y=theme_counts.index,
@@ -1251,11 +1616,13 @@ def create_theme_chart(df):
     
     return fig
 
-def create_confidence_chart(df):
+def create_confidence_chart(aggregates):
     """Create confidence distribution chart"""
-    fig = go.Figure(data=[go.Histogram(
-        x=df['confidence'],
-        nbinsx=20,
+    edges = aggregates.confidence_edges
+    fig = go.Figure(data=[go.Bar(
+        x=(edges[:-1] + edges[1:]) / 2,
+        y=aggregates.confidence_counts,
+        width=edges[1] - edges[0],
         marker_color='#6554C0',
         hovertemplate="Confiance: %{x:.0%}<br>Nombre: %{y}<extra></extra>"
     )])
@@ -1285,14 +1652,55 @@ def export_data(df, format_type):
     if format_type == "CSV":
         return df.to_csv(index=False).encode('utf-8')
     elif format_type == "Excel":
+        # Write-only workbook: rows are streamed out instead of building the full cell tree
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet('Analyse')
+        sheet.append(list(df.columns))
+        for row in df.astype(object).where(df.notna(), None).itertuples(index=False, name=None):
+            sheet.append(row)
         output = io.BytesIO()
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            df.to_excel(writer, index=False, sheet_name='Analyse')
+        workbook.save(output)
         return output.getvalue()
     elif format_type == "JSON":
-        return df.to_json(orient='records', force_ascii=False).encode('utf-8')
+        return df.to_json(orient='records', force_ascii=False, date_format='iso', date_unit='s', double_precision=4).encode('utf-8')
+    elif format_type == "Parquet":
+        return to_parquet_bytes(df)
+
+EXPORT_FORMATS = {
+    "CSV": ("csv", "text/csv"),
+    "Excel": ("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "JSON": ("json", "application/json"),
+    "Parquet": ("parquet", "application/vnd.apache.parquet"),
+}
+
+def render_export_button(label, format_type, file_prefix, key):
+    """Download button whose file is generated on first request and cached per result-set version"""
+    version = st.session_state.results_version
+    cache_key = (version, format_type)
+    slot = st.empty()
+    
+    if cache_key not in st.session_state.exports:
+        if not slot.button(label, key=f"prepare_{key}", use_container_width=True):
+            return
+        with st.spinner(f"Génération de l'export {format_type}..."):
+            exports = {k: v for k, v in st.session_state.exports.items() if k[0] == version}
+            exports[cache_key] = export_data(st.session_state.current_results, format_type)
+            st.session_state.exports = exports
+    
+    extension, mime = EXPORT_FORMATS[format_type]
+    slot.download_button(
+        f"✓ {label}",
+        st.session_state.exports[cache_key],
+        f"{file_prefix}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{extension}",
+        mime,
+        key=f"download_{key}",
+        use_container_width=True
+    )
 
 def main():
+    start_metrics_endpoint()
+    install_gemini_cassette()
+    
     # Navbar
     render_navbar()
     
@@ -1307,12 +1715,14 @@ def main():
     </div>
     """, unsafe_allow_html=True)
     
-    # Metrics
+    # Metrics (in a slot so an in-session analysis can refresh them live)
+    metrics_slot = st.empty()
     if st.session_state.current_results is not None and len(st.session_state.current_results) > 0:
-        render_metrics(st.session_state.current_results)
+        with metrics_slot.container():
+            render_metrics(get_result_aggregates())
     
     # Tabs
-    tab1, tab2, tab3 = st.tabs(["📤 Importer", "💬 Résultats", "📊 Analytique"])
+    tab1, tab2, tab3, tab4 = st.tabs(["📤 Importer", "💬 Résultats", "📊 Analytique", "🕘 Historique"])
     
     # Tab 1: Upload
     with tab1:
@@ -1343,58 +1753,154 @@ def main():
             """, unsafe_allow_html=True)
             
             with st.expander("👁️ Aperçu des images", expanded=False):
-                cols = st.columns(min(5, len(uploaded_files)))
-                for idx, file in enumerate(uploaded_files[:10]):
-                    with cols[idx % 5]:
-                        st.image(file, caption=file.name, use_container_width=True)
-                if len(uploaded_files) > 10:
-                    st.info(f"+ {len(uploaded_files) - 10} autre(s) fichier(s)")
+                if budget_limit_from_env() is not None:
+                    # Memory-budget mode: no decoded previews, file names and sizes only
+                    st.dataframe(
+                        pd.DataFrame({
+                            'Fichier': [file.name for file in uploaded_files],
+                            'Taille (Ko)': [round(file.size / 1024) for file in uploaded_files]
+                        }),
+                        use_container_width=True,
+                        hide_index=True
+                    )
+                else:
+                    render_image_previews(uploaded_files)
         
         st.markdown('</div>', unsafe_allow_html=True)
         
+        restore_active_job()
+        if st.session_state.active_batch_id is not None:
+            render_job_progress()
+        
+        if st.session_state.enrichment_batch_id is not None:
+            render_enrichment_progress()
+        
+        if st.session_state.job_notice:
+            level, message = st.session_state.job_notice
+            getattr(st, level)(message)
+        
         if uploaded_files:
             st.markdown('<div class="card-footer">', unsafe_allow_html=True)
             col1, col2, col3 = st.columns([1, 2, 1])
             with col2:
-                if st.button("🚀 Lancer l'analyse", use_container_width=True, type="primary"):
-                    if not st.session_state.model_loaded:
-                        with st.spinner("Chargement du modèle d'analyse..."):
-                            st.session_state.sentiment_model = load_sentiment_model()
-                            st.session_state.model_loaded = True
-                    
-                    if st.session_state.sentiment_model:
-                        st.markdown("""
-                        <div class="progress-container">
-                            <div class="progress-spinner"></div>
-                            <div class="progress-title">Analyse en cours</div>
-                            <div class="progress-subtitle">Extraction et analyse des commentaires...</div>
-                        </div>
-                        """, unsafe_allow_html=True)
-                        
-                        progress_bar = st.progress(0)
-                        status_text = st.empty()
-                        stats_container = st.empty()
-                        
-                        df_results = process_images(
-                            uploaded_files,
-                            st.session_state.sentiment_model,
-                            progress_bar,
-                            status_text,
-                            stats_container
+                two_phase = st.toggle(
+                    "⚡ Sentiments d'abord, thèmes en arrière-plan",
+                    value=False,
+                    help="Analyse dans cette session : le tableau de bord s'affiche dès que les sentiments sont calculés, les thèmes et sujets sont complétés ensuite.",
+                    disabled=st.session_state.enrichment_batch_id is not None
+                )
+                if st.button("🚀 Lancer l'analyse", use_container_width=True, type="primary", disabled=st.session_state.active_batch_id is not None):
+                    cancel_enrichment()
+                    queue = get_job_queue()
+                    if queue.live_workers() > 0:
+                        st.session_state.active_batch_id = queue.submit(
+                            (file.name, file.getvalue()) for file in uploaded_files
                         )
+                        # Kept in the URL so a reload finds the job again
+                        st.query_params['job'] = st.session_state.active_batch_id
+                        st.session_state.job_notice = None
+                        st.rerun()
+                    else:
+                        st.info("Aucun worker actif (python worker.py) : analyse dans cette session.")
+                        if st.session_state.model_loaded:
+                            # The cached client outlives the model server it was connected to
+                            sentiment_model = load_sentiment_model()
+                            if isinstance(sentiment_model, RemoteSentimentModel) and not sentiment_model.ping():
+                                reset_sentiment_model()
+                        if not st.session_state.model_loaded:
+                            with st.spinner("Chargement du modèle d'analyse..."):
+                                st.session_state.sentiment_batcher = get_sentiment_batcher()
+                                st.session_state.model_loaded = True
                         
-                        if len(df_results) > 0:
-                            st.session_state.current_results = df_results
-                            st.session_state.analysis_history.append({
-                                'timestamp': datetime.now(),
-                                'images': len(uploaded_files),
-                                'comments': len(df_results)
-                            })
-                            st.success(f"✅ Analyse terminée : {len(df_results)} commentaires analysés")
-                            time.sleep(1.5)
-                            st.rerun()
-                        else:
-                            st.warning("⚠️ Aucun commentaire détecté dans les images")
+                        if st.session_state.sentiment_batcher:
+                            progress_slot = st.empty()
+                            preview_slot = st.empty()
+                            store = get_results_store()
+                            batch_id = new_batch_id()
+                            budget = budget_from_env()
+                            # Only the preview tail is kept here, the full records are in the store
+                            live_records = deque(maxlen=5)
+                            live_count = 0
+                            live_aggregates = ResultAggregates()
+                            pending_records = []
+                            last_flush = time.perf_counter()
+                            comment_filter = CommentFilter()
+                            
+                            def on_progress(progress):
+                                current = progress['current_image']
+                                subtitle = f"Traitement de <strong>{current}</strong>" if current else "Finalisation"
+                                if progress['memory_mb'] is not None:
+                                    subtitle += f" · mémoire {progress['memory_mb']:.0f}/{budget.limit_mb:.0f} Mo"
+                                with progress_slot.container():
+                                    render_stage_progress(progress, "Analyse en cours", subtitle)
+                            
+                            def flush_records():
+                                nonlocal live_count, last_flush
+                                last_flush = time.perf_counter()
+                                if not pending_records:
+                                    return
+                                if not live_count:
+                                    store.create_batch(batch_id, 'upload', images=len(uploaded_files))
+                                store.add_records(batch_id, pending_records)
+                                live_records.extend(pending_records)
+                                live_count += len(pending_records)
+                                live_aggregates.update(pending_records)
+                                pending_records.clear()
+                                with metrics_slot.container():
+                                    render_metrics(live_aggregates)
+                                with preview_slot.container():
+                                    st.caption("Derniers commentaires analysés")
+                                    render_comment_page(pd.DataFrame(list(live_records)), live_count - len(live_records))
+                            
+                            def on_record(record):
+                                pending_records.append(record)
+                                if len(pending_records) >= LIVE_FLUSH_RECORDS or time.perf_counter() - last_flush >= LIVE_FLUSH_SECONDS:
+                                    flush_records()
+                            
+                            try:
+                                df_results = process_images(
+                                    uploaded_files,
+                                    st.session_state.sentiment_batcher,
+                                    on_progress=on_progress,
+                                    on_record=on_record,
+                                    budget=budget,
+                                    two_phase=two_phase,
+                                    comment_filter=comment_filter
+                                )
+                            except (ModelServerError, OSError) as e:
+                                reset_sentiment_model()
+                                st.session_state.job_notice = ('error', f"Serveur de modèle indisponible, analyse interrompue : {e}. Relancez l'analyse.")
+                                st.rerun()
+                            finally:
+                                # The store must hold every record before a TopicEnrichment reads it back
+                                flush_records()
+                            
+                            if len(df_results) > 0:
+                                set_current_results(df_results, batch_id)
+                                if two_phase:
+                                    get_enrichment_tasks()[batch_id] = TopicEnrichment(
+                                        store, batch_id, df_results['comment'].tolist(), load_label_indexes()
+                                    ).start()
+                                    st.session_state.enrichment_batch_id = batch_id
+                                    st.session_state.enrichment_seen = 0
+                                st.session_state.result_aggregates = (st.session_state.results_version, live_aggregates)
+                                st.session_state.analysis_history.append({
+                                    'timestamp': datetime.now(),
+                                    'images': len(uploaded_files),
+                                    'comments': len(df_results)
+                                })
+                                message = f"✅ Analyse terminée : {len(df_results)} commentaires analysés"
+                                filtered = comment_filter.report()
+                                if filtered['removed']:
+                                    message += f" · {filtered['seen'] - filtered['kept']} ignorés (liens, emojis, texte d'interface)"
+                                if budget is not None:
+                                    memory = budget.report()
+                                    message += f" · pic mémoire {memory['peak_rss_mb']:.0f}/{memory['limit_mb']:.0f} Mo"
+                                st.success(message)
+                                time.sleep(1.5)
+                                st.rerun()
+                            else:
+                                st.warning("⚠️ Aucun commentaire détecté dans les images")
             st.markdown('</div>', unsafe_allow_html=True)
         
         st.markdown('</div>', unsafe_allow_html=True)
@@ -1403,6 +1909,7 @@ def main():
     with tab2:
         if st.session_state.current_results is not None and len(st.session_state.current_results) > 0:
             df = st.session_state.current_results
+            filter_index = get_filter_index()
             
             # Filters
             col1, col2, col3, col4, col5 = st.columns([3, 2, 2, 1, 1])
@@ -1412,38 +1919,53 @@ def main():
             with col2:
                 sentiment_filter = st.selectbox("Sentiment", ["Tous", "Positif", "Négatif", "Neutre"], label_visibility="collapsed")
             with col3:
-                themes = ["Tous les thèmes"] + list(df['theme'].unique())
+                themes = ["Tous les thèmes"] + filter_index.themes
                 theme_filter = st.selectbox("Thème", themes, label_visibility="collapsed")
             with col4:
-                csv = export_data(df, "CSV")
-                st.download_button("⬇️ CSV", csv, f"export_{datetime.now().strftime('%Y%m%d')}.csv", "text/csv", use_container_width=True)
+                render_export_button("⬇️ CSV", "CSV", "export", "results_csv")
             with col5:
                 if st.button("🗑️ Reset", use_container_width=True):
-                    st.session_state.current_results = None
+                    cancel_enrichment()
+                    set_current_results(None)
                     st.rerun()
             
-            # Apply filters
-            filtered = df.copy()
-            if search:
-                filtered = filtered[filtered['comment'].str.contains(search, case=False, na=False)]
-            if sentiment_filter != "Tous":
-                mapping = {"Positif": "positive", "Négatif": "negative", "Neutre": "neutral"}
-                filtered = filtered[filtered['sentiment'] == mapping[sentiment_filter]]
-            if theme_filter != "Tous les thèmes":
-                filtered = filtered[filtered['theme'] == theme_filter]
+            # Apply filters (row positions only, no copy of the frame)
+            mapping = {"Positif": "positive", "Négatif": "negative", "Neutre": "neutral"}
+            rows = filter_index.filter(
+                search,
+                mapping.get(sentiment_filter),
+                theme_filter if theme_filter != "Tous les thèmes" else None
+            )
             
-            st.markdown(f"""
-            <div style="margin: 16px 0; color: #5E6C84; font-size: 14px;">
-                Affichage de <strong>{len(filtered)}</strong> sur {len(df)} résultats
-            </div>
-            """, unsafe_allow_html=True)
+            # Pagination, back to the first page whenever the filters change
+            total_pages = max(1, -(-len(rows) // COMMENTS_PER_PAGE))
+            filter_key = (st.session_state.current_batch_id, search, sentiment_filter, theme_filter)
+            if st.session_state.get('results_filter_key') != filter_key or 'results_page' not in st.session_state:
+                st.session_state.results_filter_key = filter_key
+                st.session_state.results_page = 1
+            st.session_state.results_page = min(st.session_state.results_page, total_pages)
             
-            # Comments
-            for idx, (_, row) in enumerate(filtered.head(50).iterrows()):
-                render_comment_card(row, idx)
+            col1, col2 = st.columns([4, 1])
+            with col2:
+                page = st.number_input(
+                    "Page",
+                    min_value=1,
+                    max_value=total_pages,
+                    step=1,
+                    key="results_page",
+                    label_visibility="collapsed"
+                )
+            start = (page - 1) * COMMENTS_PER_PAGE
+            page_rows = rows[start:start + COMMENTS_PER_PAGE]
+            with col1:
+                st.markdown(f"""
+                <div style="margin: 16px 0; color: #5E6C84; font-size: 14px;">
+                    Affichage de <strong>{start + 1 if len(page_rows) else 0}–{start + len(page_rows)}</strong> sur {len(rows)} résultats filtrés ({len(df)} au total) · page {page}/{total_pages}
+                </div>
+                """, unsafe_allow_html=True)
             
-            if len(filtered) > 50:
-                st.info(f"Affichage limité aux 50 premiers résultats. {len(filtered) - 50} résultats supplémentaires.")
+            # Comments
+            render_comment_page(df.iloc[page_rows], start)
         else:
             st.markdown("""
             <div class="empty-state">
@@ -1457,6 +1979,7 @@ def main():
     with tab3:
         if st.session_state.current_results is not None and len(st.session_state.current_results) > 0:
             df = st.session_state.current_results
+            aggregates = get_result_aggregates()
             
             col1, col2 = st.columns(2)
             
@@ -1466,7 +1989,7 @@ def main():
                     <div class="chart-title">📊 Distribution des sentiments</div>
                 </div>
                 """, unsafe_allow_html=True)
-                fig = create_sentiment_chart(df)
+                fig = create_sentiment_chart(aggregates)
                 st.plotly_chart(fig, use_container_width=True)
             
             with col2:
@@ -1475,7 +1998,7 @@ def main():
                     <div class="chart-title">🏷️ Thèmes principaux</div>
                 </div>
                 """, unsafe_allow_html=True)
-                fig = create_theme_chart(df)
+                fig = create_theme_chart(aggregates)
                 st.plotly_chart(fig, use_container_width=True)
             
             # Confidence distribution
@@ -1484,7 +2007,7 @@ def main():
                 <div class="chart-title">📈 Distribution des scores de confiance</div>
             </div>
             """, unsafe_allow_html=True)
-            fig = create_confidence_chart(df)
+            fig = create_confidence_chart(aggregates)
             st.plotly_chart(fig, use_container_width=True)
             
             # Data table
@@ -1504,31 +2027,15 @@ def main():
             
             # Export options
             st.markdown("<br>", unsafe_allow_html=True)
-            col1, col2, col3 = st.columns(3)
+            col1, col2, col3, col4 = st.columns(4)
             with col1:
-                st.download_button(
-                    "📥 Exporter en CSV",
-                    export_data(df, "CSV"),
-                    f"analyse_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                    "text/csv",
-                    use_container_width=True
-                )
+                render_export_button("📥 Exporter en CSV", "CSV", "analyse", "analytics_csv")
             with col2:
-                st.download_button(
-                    "📥 Exporter en Excel",
-                    export_data(df, "Excel"),
-                    f"analyse_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
-                    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                    use_container_width=True
-                )
+                render_export_button("📥 Exporter en Excel", "Excel", "analyse", "analytics_excel")
             with col3:
-                st.download_button(
-                    "📥 Exporter en JSON",
-                    export_data(df, "JSON"),
-                    f"analyse_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
-                    "application/json",
-                    use_container_width=True
-                )
+                render_export_button("📥 Exporter en JSON", "JSON", "analyse", "analytics_json")
+            with col4:
+                render_export_button("📥 Exporter en Parquet", "Parquet", "analyse", "analytics_parquet")
         else:
             st.markdown("""
             <div class="empty-state">
@@ -1538,6 +2045,41 @@ def main():
             </div>
             """, unsafe_allow_html=True)
     
+    # Tab 4: History
+    with tab4:
+        batches = get_results_store().list_batches()
+        if len(batches) > 0:
+            history_df = batches.rename(columns={
+                'batch_id': 'Lot',
+                'created_at': 'Date',
+                'source': 'Origine',
+                'images': 'Images',
+                'comments': 'Commentaires'
+            })
+            st.dataframe(history_df, use_container_width=True, hide_index=True, height=320)
+            
+            comment_counts = dict(zip(batches['batch_id'], batches['comments']))
+            col1, col2 = st.columns([3, 1])
+            with col1:
+                selected_batch = st.selectbox(
+                    "Lot",
+                    batches['batch_id'],
+                    format_func=lambda b: f"{b} · {comment_counts[b]} commentaires",
+                    label_visibility="collapsed"
+                )
+            with col2:
+                if st.button("📂 Ouvrir", use_container_width=True, disabled=selected_batch == st.session_state.current_batch_id):
+                    set_current_results(get_results_store().load_batch(selected_batch), selected_batch)
+                    st.rerun()
+        else:
+            st.markdown("""
+            <div class="empty-state">
+                <div class="empty-state-icon">🕘</div>
+                <div class="empty-state-title">Aucun historique</div>
+                <div class="empty-state-description">Les analyses terminées sont conservées ici et peuvent être rouvertes à tout moment.</div>
+            </div>
+            """, unsafe_allow_html=True)
+    
     st.markdown('</div>', unsafe_allow_html=True)
 
 if __name__ == "__main__":
@@ -0,0 +1,292 @@
+"""
+SQLite-backed job queue for batch analyses.
+
+The Streamlit UI submits uploads as jobs; worker processes (worker.py) claim
+them, run the analyse.py pipeline and write progress and records back here.
+Records go to the ResultsStore (store.py) under the job's batch_id, so
+results survive browser reloads.
+"""
+
+import os
+import re
+import shutil
+import sqlite3
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+import pandas as pd
+
+from store import DATA_DIR, ResultsStore, new_batch_id
+
+DB_PATH = DATA_DIR / "jobs.db"
+SPOOL_DIR = DATA_DIR / "spool"
+
+# A worker that has not sent a heartbeat for this long is considered dead
+WORKER_TIMEOUT_SECONDS = 60
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    batch_id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    started_at TEXT,
+    finished_at TEXT,
+    worker_id TEXT,
+    total_images INTEGER NOT NULL,
+    images_extracted INTEGER NOT NULL DEFAULT 0,
+    images_done INTEGER NOT NULL DEFAULT 0,
+    comments_found INTEGER NOT NULL DEFAULT 0,
+    comments_done INTEGER NOT NULL DEFAULT 0,
+    extract_seconds REAL NOT NULL DEFAULT 0,
+    analyze_seconds REAL NOT NULL DEFAULT 0,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS job_images (
+    batch_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    path TEXT NOT NULL,
+    PRIMARY KEY (batch_id, position)
+);
+CREATE TABLE IF NOT EXISTS workers (
+    worker_id TEXT PRIMARY KEY,
+    pid INTEGER,
+    last_seen REAL NOT NULL
+);
+"""
+
+_RESET_PROGRESS = (
+    "images_extracted = 0, images_done = 0, comments_found = 0, comments_done = 0, "
+    "extract_seconds = 0, analyze_seconds = 0"
+)
+
+_UNSAFE_CHARS = re.compile(r"[^A-Za-z0-9._-]+")
+
+
+def estimate_progress(job: Dict) -> Dict:
+    """
+    Overall progress and remaining time of a job from its measured stage throughput.
+
+    Extraction time per image, comments per image and analysis time per
+    comment are all measured so far, so the estimate sharpens as the job runs.
+
+    Args:
+        job: Job row (or any dict with the same progress counters)
+
+    Returns:
+        dict: 'fraction' in [0, 1], 'eta_seconds' (None until an image is extracted)
+            and 'comments_per_second' (None until a comment is analyzed)
+    """
+    total = job['total_images']
+    extracted = job['images_extracted']
+    if not total:
+        return {'fraction': 1.0, 'eta_seconds': 0.0, 'comments_per_second': None}
+    if not extracted:
+        return {'fraction': 0.0, 'eta_seconds': None, 'comments_per_second': None}
+
+    seconds_per_image = job['extract_seconds'] / extracted
+    comments_per_image = job['comments_found'] / extracted
+    seconds_per_comment = job['analyze_seconds'] / job['comments_done'] if job['comments_done'] else seconds_per_image
+
+    remaining = (
+        (total - extracted) * (seconds_per_image + comments_per_image * seconds_per_comment)
+        + (job['comments_found'] - job['comments_done']) * seconds_per_comment
+    )
+    spent = job['extract_seconds'] + job['analyze_seconds']
+    return {
+        'fraction': spent / (spent + remaining) if spent + remaining > 0 else extracted / total,
+        'eta_seconds': remaining,
+        'comments_per_second': job['comments_done'] / spent if job['comments_done'] and spent > 0 else None,
+    }
+
+
+class JobQueue:
+    """
+    Job queue shared by the UI and the workers.
+
+    Each call opens its own connection, so one instance can be used from
+    several threads and every process simply creates its own instance.
+    """
+
+    def __init__(self, db_path: Path = DB_PATH, spool_dir: Path = SPOOL_DIR, store: ResultsStore = None):
+        self.db_path = Path(db_path)
+        self.spool_dir = Path(spool_dir)
+        self.store = store if store is not None else ResultsStore()
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.spool_dir.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    # Submission side (UI)
+
+    def submit(self, files: Iterable[Tuple[str, bytes]]) -> str:
+        """
+        Spool uploaded images to disk and enqueue them as one job.
+
+        Args:
+            files: (file name, file content) pairs
+
+        Returns:
+            str: batch_id of the new job
+        """
+        batch_id = new_batch_id()
+        job_dir = self.spool_dir / batch_id
+        job_dir.mkdir(parents=True)
+
+        images = []
+        for position, (name, content) in enumerate(files):
+            path = job_dir / f"{position:05d}_{_UNSAFE_CHARS.sub('_', name)}"
+            path.write_bytes(content)
+            images.append((batch_id, position, name, str(path)))
+
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (batch_id, status, created_at, total_images) VALUES (?, 'queued', ?, ?)",
+                (batch_id, datetime.now().isoformat(timespec='seconds'), len(images))
+            )
+            conn.executemany("INSERT INTO job_images VALUES (?, ?, ?, ?)", images)
+        self.store.create_batch(batch_id, 'upload', images=len(images))
+        return batch_id
+
+    def get_job(self, batch_id: str) -> Optional[Dict]:
+        """Return the job row as a dict, or None if unknown."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE batch_id = ?", (batch_id,)).fetchone()
+        return dict(row) if row else None
+
+    def get_results(self, batch_id: str, offset: int = 0) -> pd.DataFrame:
+        """Load the records stored for a batch, skipping the first `offset` ones."""
+        return self.store.load_batch(batch_id, offset)
+
+    def pending_jobs(self) -> int:
+        """Number of jobs waiting for a worker."""
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()[0]
+
+    def live_workers(self) -> int:
+        """Number of workers that sent a heartbeat recently."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT COUNT(*) FROM workers WHERE last_seen >= ?",
+                (time.time() - WORKER_TIMEOUT_SECONDS,)
+            ).fetchone()
+        return row[0]
+
+    # Worker side
+
+    def heartbeat(self, worker_id: str):
+        """Record that a worker is alive."""
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO workers VALUES (?, ?, ?) "
+                "ON CONFLICT(worker_id) DO UPDATE SET last_seen = excluded.last_seen",
+                (worker_id, os.getpid(), time.time())
+            )
+
+    def claim(self, worker_id: str) -> Optional[Dict]:
+        """
+        Atomically take the oldest queued job.
+
+        Jobs left running by a dead worker are put back in the queue first.
+
+        Args:
+            worker_id: Identifier of the claiming worker
+
+        Returns:
+            dict: Job row with an extra 'images' list of (name, path), or None
+        """
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            stale = conn.execute(
+                "SELECT j.batch_id FROM jobs j LEFT JOIN workers w ON j.worker_id = w.worker_id "
+                "WHERE j.status = 'running' AND (w.last_seen IS NULL OR w.last_seen < ?)",
+                (time.time() - WORKER_TIMEOUT_SECONDS,)
+            ).fetchall()
+            for row in stale:
+                self.store.delete_records(row['batch_id'])
+                conn.execute(
+                    f"UPDATE jobs SET status = 'queued', worker_id = NULL, {_RESET_PROGRESS} WHERE batch_id = ?",
+                    (row['batch_id'],)
+                )
+
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE status = 'queued' ORDER BY created_at, rowid LIMIT 1"
+            ).fetchone()
+            if row is None:
+                conn.commit()
+                return None
+
+            conn.execute(
+                "UPDATE jobs SET status = 'running', worker_id = ?, started_at = ? WHERE batch_id = ?",
+                (worker_id, datetime.now().isoformat(timespec='seconds'), row['batch_id'])
+            )
+            images = conn.execute(
+                "SELECT name, path FROM job_images WHERE batch_id = ? ORDER BY position",
+                (row['batch_id'],)
+            ).fetchall()
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+        job = dict(row)
+        job['images'] = [(image['name'], image['path']) for image in images]
+        return job
+
+    def record_extraction(self, batch_id: str, comments: int, seconds: float):
+        """
+        Account for one image whose comments have been extracted.
+
+        Args:
+            batch_id: Batch the image belongs to
+            comments: Number of comments to analyze from the image
+            seconds: Time spent extracting them
+        """
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET images_extracted = images_extracted + 1, comments_found = comments_found + ?, "
+                "extract_seconds = extract_seconds + ? WHERE batch_id = ?",
+                (comments, seconds, batch_id)
+            )
+
+    def add_record(self, batch_id: str, record: Dict, seconds: float):
+        """
+        Store one analyzed comment so the UI can show it right away.
+
+        Args:
+            batch_id: Batch the record belongs to
+            record: Dict following Entities/CommentAnalysis.json
+            seconds: Time spent analyzing the comment
+        """
+        self.store.add_records(batch_id, [record])
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET comments_done = comments_done + 1, analyze_seconds = analyze_seconds + ? "
+                "WHERE batch_id = ?",
+                (seconds, batch_id)
+            )
+
+    def image_done(self, batch_id: str):
+        """Account for one image whose comments have all been analyzed."""
+        with self._connect() as conn:
+            conn.execute("UPDATE jobs SET images_done = images_done + 1 WHERE batch_id = ?", (batch_id,))
+
+    def finish(self, batch_id: str, error: str = None):
+        """Mark a job as done (or failed) and drop its spooled images."""
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, finished_at = ?, error = ? WHERE batch_id = ?",
+                ('failed' if error else 'done', datetime.now().isoformat(timespec='seconds'), error, batch_id)
+            )
+        shutil.rmtree(self.spool_dir / batch_id, ignore_errors=True)
@@ -0,0 +1,205 @@
+"""
+Label canonicalization for Gemini topic/theme outputs.
+
+Gemini returns free-form French labels, so the same category shows up as
+"Problème de connexion", "Problèmes de connexion" or "probleme connexion".
+LabelIndex folds those variants onto one canonical label as comments stream in.
+"""
+
+import re
+import threading
+import unicodedata
+import zlib
+from typing import Dict, Iterable, List
+
+import numpy as np
+
+from metrics import CACHE_LOOKUPS
+
+# Words that carry no meaning for category matching
+STOPWORDS = {"de", "du", "des", "d", "la", "le", "les", "l", "et", "a", "au", "aux", "en", "un", "une"}
+
+# Labels that must never be merged into a real category
+RESERVED_LABELS = {"Non défini", "Généré par IA"}
+
+# Singular words ending in s/x, never plural-folded (keys are accent-free)
+INVARIABLE_WORDS = {
+    "acces", "bras", "cas", "choix", "corps", "croix", "dos", "faux", "fois", "frais", "gaz", "heureux",
+    "mieux", "mois", "moins", "pays", "plus", "poids", "prix", "proces", "processus", "progres", "sans",
+    "sous", "succes", "taux", "temps", "virus", "voix",
+}
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+
+def normalize_label(label: str) -> str:
+    """
+    Build the lookup key of a label: accents, casing and stopwords removed.
+
+    Args:
+        label: Raw label returned by Gemini
+
+    Returns:
+        str: Normalized key ("Problèmes de Connexion" -> "problemes connexion")
+    """
+    folded = unicodedata.normalize("NFKD", str(label))
+    folded = "".join(c for c in folded if not unicodedata.combining(c)).lower()
+    return " ".join(token for token in _NON_ALNUM.split(folded) if token and token not in STOPWORDS)
+
+
+def fold_plurals(key: str) -> str:
+    """
+    Singular form of a normalized key, used only to match keys of known labels.
+
+    Args:
+        key: Key built by normalize_label
+
+    Returns:
+        str: Key with plural endings removed ("problemes connexion" -> "probleme connexion"),
+             invariable words ("prix", "acces", "choix") left as they are
+    """
+    tokens = []
+    for token in key.split():
+        # Naive French plural folding: "problemes" -> "probleme", "reseaux" -> "reseau"
+        if len(token) > 3 and token[-1] in "sx" and token not in INVARIABLE_WORDS:
+            token = token[:-1]
+        tokens.append(token)
+    return " ".join(tokens)
+
+
+def _trigram_vectors(keys: List[str], dim: int) -> np.ndarray:
+    """Hash the character trigrams of each key into L2-normalized float32 rows."""
+    vectors = np.zeros((len(keys), dim), dtype=np.float32)
+    for row, key in enumerate(keys):
+        padded = f"  {key} "
+        for i in range(len(padded) - 2):
+            vectors[row, zlib.crc32(padded[i:i + 3].encode("utf-8")) % dim] += 1.0
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class LabelIndex:
+    """
+    Growing set of canonical labels with an exact-key index and fuzzy fallback.
+
+    Exact hits on the normalized key are a dict lookup, then singular/plural
+    variants of a known key (same fold_plurals form). Remaining misses are
+    matched in one matrix product against the trigram vectors of all
+    canonical labels; a miss below the similarity threshold becomes a new
+    canonical label.
+    """
+
+    def __init__(self, threshold: float = 0.85, dim: int = 2048):
+        self.threshold = threshold
+        self.dim = dim
+        self._lock = threading.Lock()
+        self._key_to_id: Dict[str, int] = {}
+        self._folded_to_id: Dict[str, int] = {}
+        self._labels: List[str] = []
+        self._vectors = np.zeros((64, dim), dtype=np.float32)
+
+    def __len__(self):
+        return len(self._labels)
+
+    @property
+    def labels(self) -> List[str]:
+        """Canonical labels in order of first appearance."""
+        return list(self._labels)
+
+    def canonicalize(self, label: str) -> str:
+        """
+        Map one label to its canonical form.
+
+        Args:
+            label: Raw label
+
+        Returns:
+            str: Canonical label
+        """
+        return self.canonicalize_many([label])[0]
+
+    def canonicalize_many(self, labels: Iterable[str]) -> List[str]:
+        """
+        Map a batch of labels to their canonical forms.
+
+        Args:
+            labels: Raw labels
+
+        Returns:
+            list: Canonical labels, aligned with the input
+        """
+        labels = [str(label).strip() for label in labels]
+        keys = [normalize_label(label) for label in labels]
+
+        with self._lock:
+            ids = [self._lookup(key) for key in keys]
+            hits = sum(label_id is not None for label_id in ids)
+            CACHE_LOOKUPS.labels('label_index', 'hit').inc(hits)
+            CACHE_LOOKUPS.labels('label_index', 'miss').inc(len(ids) - hits)
+            misses = {}
+            for label, key, label_id in zip(labels, keys, ids):
+                if label_id is None and key not in misses and label not in RESERVED_LABELS:
+                    misses[key] = label
+
+            if misses:
+                self._resolve_misses(misses)
+
+            return [
+                label if label in RESERVED_LABELS or not key else self._labels[self._key_to_id[key]]
+                for label, key in zip(labels, keys)
+            ]
+
+    def _lookup(self, key: str):
+        """Label id of a key or of a known singular/plural variant of it, or None."""
+        label_id = self._key_to_id.get(key)
+        if label_id is None:
+            label_id = self._folded_to_id.get(fold_plurals(key))
+            if label_id is not None:
+                self._key_to_id[key] = label_id
+        return label_id
+
+    def _register(self, key: str, label_id: int):
+        self._key_to_id[key] = label_id
+        self._folded_to_id.setdefault(fold_plurals(key), label_id)
+
+    def _resolve_misses(self, misses: Dict[str, str]):
+        """Match unseen keys against the canonical set, creating labels as needed."""
+        miss_keys = [key for key in misses if key]
+        if not miss_keys:
+            return
+        miss_vectors = _trigram_vectors(miss_keys, self.dim)
+
+        known = len(self._labels)
+        if known:
+            similarity = miss_vectors @ self._vectors[:known].T
+            best_ids = similarity.argmax(axis=1)
+            best_scores = similarity[np.arange(len(miss_keys)), best_ids]
+        else:
+            best_ids = np.zeros(len(miss_keys), dtype=np.int64)
+            best_scores = np.zeros(len(miss_keys), dtype=np.float32)
+
+        for row, key in enumerate(miss_keys):
+            if best_scores[row] >= self.threshold:
+                self._register(key, int(best_ids[row]))
+                continue
+            # Compare against labels created earlier in this same batch
+            added = len(self._labels) - known
+            if added:
+                scores = self._vectors[known:known + added] @ miss_vectors[row]
+                best_new = int(scores.argmax())
+                if scores[best_new] >= self.threshold:
+                    self._register(key, known + best_new)
+                    continue
+            self._add_label(key, misses[key], miss_vectors[row])
+
+    def _add_label(self, key: str, label: str, vector: np.ndarray):
+        """Register a new canonical label, growing the vector matrix if needed."""
+        label_id = len(self._labels)
+        if label_id == len(self._vectors):
+            grown = np.zeros((len(self._vectors) * 2, self.dim), dtype=np.float32)
+            grown[:label_id] = self._vectors
+            self._vectors = grown
+        self._vectors[label_id] = vector
+        self._labels.append(label)
+        self._register(key, label_id)
@@ -0,0 +1,151 @@
+"""
+Memory budget for the analysis pipeline.
+
+A MemoryBudget samples the resident set size of the process between
+pipeline steps. Before an image (or a text chunk) is read, the pipeline
+calls wait_for_headroom(): when RSS is above the high-water mark of the
+budget, garbage is collected and the step waits for in-flight work (the
+shared sentiment batcher, other sessions) to drain before pulling more
+input. RSS often stays high after work drains (the allocator keeps freed
+pages), so a wait stops as soon as RSS stops dropping, and later steps only
+wait again once RSS has grown past that plateau. Runs report the peak RSS
+they observed.
+
+Result sets kept in memory by the app are converted to compact dtypes
+(columnar.to_compact_frame).
+
+Enabled with --memory-budget-mb in analyse.py, or SENTIMENTPRO_MEMORY_BUDGET_MB
+for the workers and the Streamlit app.
+"""
+
+import gc
+import os
+import resource
+import sys
+import time
+from typing import Dict, Optional
+
+from metrics import MEMORY_THROTTLE_SECONDS, RESIDENT_MEMORY
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def rss_mb() -> float:
+    """Current resident set size of the process, in MB."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        # No procfs: the peak is the best available approximation
+        return peak_rss_mb()
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of the process since it started, in MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+
+RESIDENT_MEMORY.set_function(lambda: rss_mb() * 1024 * 1024)
+
+
+class MemoryBudget:
+    """
+    RSS budget of one run, with backpressure and peak tracking.
+
+    Args:
+        limit_mb: Budget for the resident set size of the process
+        high_water: Fraction of the budget above which new input waits
+        max_wait_seconds: Longest wait for headroom before carrying on anyway
+        poll_seconds: Delay between two checks while waiting
+        stall_seconds: Wait given up when RSS has not dropped for this long
+    """
+
+    # RSS changes smaller than this fraction of the budget are noise
+    _DROP_FRACTION = 0.01
+    # Growth above a plateau, as a fraction of the budget, that makes steps wait again
+    _REGROWTH_FRACTION = 0.05
+
+    def __init__(self, limit_mb: float, high_water: float = 0.85,
+                 max_wait_seconds: float = 30.0, poll_seconds: float = 0.25, stall_seconds: float = 2.0):
+        if limit_mb <= 0:
+            raise ValueError("Memory budget must be positive")
+        self.limit_mb = limit_mb
+        self.high_water_mb = limit_mb * high_water
+        self.max_wait_seconds = max_wait_seconds
+        self.poll_seconds = poll_seconds
+        self.stall_seconds = stall_seconds
+        self._plateau_mb = None
+        self.start_mb = rss_mb()
+        self.peak_mb = self.start_mb
+        self.throttled = 0
+        self.throttle_seconds = 0.0
+
+    def sample(self) -> float:
+        """Current RSS in MB, also folded into the peak of the run."""
+        current = rss_mb()
+        self.peak_mb = max(self.peak_mb, current)
+        return current
+
+    def wait_for_headroom(self) -> float:
+        """
+        Block until RSS is under the high-water mark, stops dropping, or max_wait_seconds.
+
+        Returns:
+            float: Seconds spent waiting
+        """
+        current = self.sample()
+        if current < self.high_water_mb:
+            self._plateau_mb = None
+            return 0.0
+        # Waiting did not bring RSS down at this level before, it would not now
+        if self._plateau_mb is not None and current < self._plateau_mb + self.limit_mb * self._REGROWTH_FRACTION:
+            return 0.0
+
+        started = time.perf_counter()
+        lowest, last_drop = current, started
+        gc.collect()
+        while True:
+            current = self.sample()
+            if current < self.high_water_mb:
+                self._plateau_mb = None
+                break
+            now = time.perf_counter()
+            if current < lowest - self.limit_mb * self._DROP_FRACTION:
+                lowest, last_drop = current, now
+            elif now - last_drop >= self.stall_seconds or now - started >= self.max_wait_seconds:
+                self._plateau_mb = current
+                break
+            time.sleep(self.poll_seconds)
+            gc.collect()
+
+        waited = time.perf_counter() - started
+        self.throttled += 1
+        self.throttle_seconds += waited
+        MEMORY_THROTTLE_SECONDS.inc(waited)
+        return waited
+
+    def report(self) -> Dict:
+        """Budget, start/peak RSS of the run and time spent under backpressure."""
+        self.sample()
+        return {
+            'limit_mb': round(self.limit_mb, 1),
+            'start_rss_mb': round(self.start_mb, 1),
+            'peak_rss_mb': round(self.peak_mb, 1),
+            'process_peak_rss_mb': round(peak_rss_mb(), 1),
+            'throttled': self.throttled,
+            'throttle_seconds': round(self.throttle_seconds, 3),
+        }
+
+
+def budget_limit_from_env() -> Optional[float]:
+    """Budget in MB set in SENTIMENTPRO_MEMORY_BUDGET_MB, or None when memory-budget mode is off."""
+    limit = os.getenv("SENTIMENTPRO_MEMORY_BUDGET_MB")
+    return float(limit) if limit else None
+
+
+def budget_from_env() -> Optional[MemoryBudget]:
+    """New MemoryBudget for one run, or None when memory-budget mode is off."""
+    limit = budget_limit_from_env()
+    return MemoryBudget(limit) if limit is not None else None
@@ -0,0 +1,293 @@
+"""
+Prometheus-style metrics for the analysis processes.
+
+Counters, gauges and histograms live in one process-wide REGISTRY and are
+rendered in the Prometheus text exposition format, either by the API's
+GET /metrics or by a small local HTTP endpoint (start_metrics_server) for
+analyse.py, the workers and the Streamlit app.
+
+Updating a metric is a dict lookup plus a short locked update, so the
+pipeline functions record on every call.
+"""
+
+import os
+import threading
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    escaped = (
+        str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+        for value in values
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(names, escaped)) + "}"
+
+
+class _CounterChild:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0.0
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self.value += amount
+
+    def samples(self, name: str) -> List[Tuple[str, Dict, float]]:
+        return [(name, {}, self.value)]
+
+
+class _GaugeChild:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._value = 0.0
+        self._function = None
+
+    def set(self, value: float):
+        with self._lock:
+            self._value = value
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount: float = 1):
+        self.inc(-amount)
+
+    def set_function(self, function: Callable[[], float]):
+        """Read the value from function at scrape time instead."""
+        self._function = function
+
+    @property
+    def value(self) -> float:
+        return self._function() if self._function is not None else self._value
+
+    def samples(self, name: str) -> List[Tuple[str, Dict, float]]:
+        return [(name, {}, self.value)]
+
+
+class _HistogramChild:
+    def __init__(self, buckets: Tuple[float, ...]):
+        self._lock = threading.Lock()
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def samples(self, name: str) -> List[Tuple[str, Dict, float]]:
+        with self._lock:
+            counts = list(self.counts)
+            total = self.sum
+        samples = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += count
+            samples.append((f"{name}_bucket", {'le': _format_value(bound)}, cumulative))
+        samples.append((f"{name}_sum", {}, total))
+        samples.append((f"{name}_count", {}, cumulative))
+        return samples
+
+
+class Metric:
+    """
+    A named metric family, optionally split by labels.
+
+    Args:
+        name: Metric name
+        documentation: HELP text
+        labelnames: Label names; children are created by labels()
+    """
+
+    type = None
+    _child_class = None
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._children: Dict[Tuple[str, ...], object] = {}
+        if not self.labelnames:
+            self._children[()] = self._new_child()
+
+    def _new_child(self):
+        return self._child_class()
+
+    def labels(self, *values, **labels):
+        """Child metric for one combination of label values."""
+        if labels:
+            values = tuple(labels[name] for name in self.labelnames)
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {key}")
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def collect(self) -> List[str]:
+        """Exposition lines of the family."""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        for key, child in sorted(self._children.items()):
+            for sample_name, extra, value in child.samples(self.name):
+                names = self.labelnames + tuple(extra)
+                values = key + tuple(extra.values())
+                lines.append(f"{sample_name}{_format_labels(names, values)} {_format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    """Monotonically increasing count."""
+
+    type = "counter"
+    _child_class = _CounterChild
+
+    def inc(self, amount: float = 1):
+        self._children[()].inc(amount)
+
+
+class Gauge(Metric):
+    """Value that can go up and down, or be read from a function at scrape time."""
+
+    type = "gauge"
+    _child_class = _GaugeChild
+
+    def set(self, value: float):
+        self._children[()].set(value)
+
+    def set_function(self, function: Callable[[], float]):
+        self._children[()].set_function(function)
+
+
+class Histogram(Metric):
+    """Bucketed distribution of observed values."""
+
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self._children[()].observe(value)
+
+
+class Registry:
+    """Metric families of one process, rendered together."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        """Add a family; registering an existing name returns the existing family."""
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def exposition(self) -> str:
+        """All families in the Prometheus text format."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+COMMENTS_PROCESSED = REGISTRY.register(Counter(
+    "sentimentpro_comments_processed_total", "Comments analyzed, by sentiment", ["sentiment"]
+))
+API_CALLS = REGISTRY.register(Counter(
+    "sentimentpro_api_calls_total", "External API calls, by call and outcome", ["api", "outcome"]
+))
+CACHE_LOOKUPS = REGISTRY.register(Counter(
+    "sentimentpro_cache_lookups_total", "Cache lookups, by cache and result", ["cache", "result"]
+))
+MODEL_BATCH_SIZE = REGISTRY.register(Histogram(
+    "sentimentpro_model_batch_size", "Texts per sentiment model forward pass", buckets=SIZE_BUCKETS
+))
+QUEUE_DEPTH = REGISTRY.register(Gauge(
+    "sentimentpro_queue_depth", "Pending items, by queue", ["queue"]
+))
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "sentimentpro_stage_seconds", "Pipeline stage latency in seconds", ["stage"]
+))
+RESIDENT_MEMORY = REGISTRY.register(Gauge(
+    "sentimentpro_resident_memory_bytes", "Resident set size of the process"
+))
+MEMORY_THROTTLE_SECONDS = REGISTRY.register(Counter(
+    "sentimentpro_memory_throttle_seconds_total", "Time input was held back by the memory budget"
+))
+COMMENTS_FILTERED = REGISTRY.register(Counter(
+    "sentimentpro_comments_filtered_total", "Comments dropped before analysis, by reason", ["reason"]
+))
+CASCADE_COMMENTS = REGISTRY.register(Counter(
+    "sentimentpro_cascade_comments_total", "Comments scored by the sentiment cascade, by deciding stage", ["stage"]
+))
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        data = REGISTRY.exposition().encode('utf-8')
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def start_metrics_server(port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """
+    Serve GET /metrics from a daemon thread.
+
+    Args:
+        port: Port to listen on (0 picks a free one)
+        host: Interface to bind, local only by default
+
+    Returns:
+        ThreadingHTTPServer: The running server (server_address holds the actual port)
+    """
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server
+
+
+def metrics_port_from_env():
+    """Port set in SENTIMENTPRO_METRICS_PORT, or None when the endpoint is disabled."""
+    port = os.getenv("SENTIMENTPRO_METRICS_PORT")
+    return int(port) if port else None
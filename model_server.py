@@ -0,0 +1,276 @@
+"""
+Shared sentiment model server on a local Unix socket.
+
+One process loads the sentiment model (and the cascade first stage, if
+configured) once; Streamlit replicas, analyse.py runs, workers and the API
+send it batches of texts instead of loading their own copy. Requests from
+every client go through one MicroBatcher, so concurrent clients also share
+forward passes.
+
+Usage:
+    python model_server.py                       # listens on .sentimentpro/model.sock
+    SENTIMENTPRO_MODEL_SOCKET=.sentimentpro/model.sock streamlit run inter.py
+
+Clients get a RemoteSentimentModel from load_models() (analyse.py) when
+SENTIMENTPRO_MODEL_SOCKET is set or --model-server is given; it is called
+like the transformers pipeline. When the server cannot be reached the
+model is loaded locally as before.
+
+Protocol: each message is a 4-byte big-endian length followed by a UTF-8
+JSON object. Requests are {"op": "sentiment", "texts": [...]}, {"op": "ping"}
+or {"op": "stats"}; replies carry "results"/"stats", or "error".
+"""
+
+import argparse
+import json
+import os
+import signal
+import socket
+import socketserver
+import struct
+import sys
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+from batching import DEFAULT_MAX_BATCH_SIZE, DEFAULT_MAX_WAIT_MS, MicroBatcher
+from profiling import span
+from store import DATA_DIR
+
+DEFAULT_SOCKET_PATH = DATA_DIR / "model.sock"
+MAX_MESSAGE_BYTES = 64 * 1024 * 1024
+
+_HEADER = struct.Struct(">I")
+
+
+class ModelServerError(RuntimeError):
+    """The model server answered a request with an error."""
+
+
+def send_message(sock: socket.socket, message: Dict):
+    data = json.dumps(message, ensure_ascii=False).encode('utf-8')
+    sock.sendall(_HEADER.pack(len(data)) + data)
+
+
+def _recv_exactly(sock: socket.socket, size: int) -> Optional[bytes]:
+    buffer = bytearray()
+    while len(buffer) < size:
+        chunk = sock.recv(size - len(buffer))
+        if not chunk:
+            if buffer:
+                raise ConnectionError("connection closed in the middle of a message")
+            return None
+        buffer += chunk
+    return bytes(buffer)
+
+
+def recv_message(sock: socket.socket) -> Optional[Dict]:
+    """Next message on the socket, or None when the peer closed the connection."""
+    header = _recv_exactly(sock, _HEADER.size)
+    if header is None:
+        return None
+    (size,) = _HEADER.unpack(header)
+    if size > MAX_MESSAGE_BYTES:
+        raise ConnectionError(f"message of {size} bytes exceeds the {MAX_MESSAGE_BYTES} byte limit")
+    data = _recv_exactly(sock, size)
+    if data is None:
+        raise ConnectionError("connection closed in the middle of a message")
+    return json.loads(data)
+
+
+class RemoteSentimentModel:
+    """
+    Client of the model server, callable like pipeline("sentiment-analysis").
+
+    Each thread keeps its own connection; a broken connection is reopened
+    once per call, which is safe because sentiment requests are idempotent.
+
+    Args:
+        socket_path: Unix socket of the server
+        timeout: Seconds to wait for a reply
+    """
+
+    def __init__(self, socket_path: Union[str, Path] = DEFAULT_SOCKET_PATH, timeout: float = 120.0):
+        self.socket_path = str(socket_path)
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connect(self) -> socket.socket:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.socket_path)
+        return sock
+
+    def _close(self):
+        sock = getattr(self._local, 'sock', None)
+        if sock is not None:
+            sock.close()
+            self._local.sock = None
+
+    def request(self, message: Dict) -> Dict:
+        """Send one request and wait for its reply."""
+        for attempt in range(2):
+            try:
+                if getattr(self._local, 'sock', None) is None:
+                    self._local.sock = self._connect()
+                send_message(self._local.sock, message)
+                reply = recv_message(self._local.sock)
+                if reply is None:
+                    raise ConnectionError("model server closed the connection")
+                break
+            except OSError:
+                self._close()
+                if attempt:
+                    raise
+        if 'error' in reply:
+            raise ModelServerError(reply['error'])
+        return reply
+
+    def __call__(self, texts: Union[str, List[str]], batch_size: int = 1, **kwargs) -> List[Dict]:
+        if isinstance(texts, str):
+            texts = [texts]
+        with span("sentiment.remote", items=len(texts)):
+            return self.request({'op': 'sentiment', 'texts': list(texts)})['results']
+
+    def ping(self) -> bool:
+        """Whether the server answers."""
+        try:
+            self.request({'op': 'ping'})
+            return True
+        except (OSError, ModelServerError):
+            return False
+
+    def stats(self) -> Dict:
+        """Server pid, model and coalescer metrics."""
+        return self.request({'op': 'stats'})['stats']
+
+
+def remote_model_from_env() -> Optional[RemoteSentimentModel]:
+    """
+    Client of the server set in SENTIMENTPRO_MODEL_SOCKET, if any.
+
+    Returns:
+        RemoteSentimentModel: A client of a server that answered, or None when unset or unreachable
+    """
+    path = os.getenv("SENTIMENTPRO_MODEL_SOCKET")
+    if not path:
+        return None
+    model = RemoteSentimentModel(path)
+    return model if model.ping() else None
+
+
+class _ModelHandler(socketserver.StreamRequestHandler):
+    """Answers the requests of one client connection until it closes."""
+
+    def handle(self):
+        server = self.server
+        while True:
+            try:
+                message = recv_message(self.connection)
+            except (OSError, ValueError) as e:
+                server.logger.warning(f"Dropping model client: {e}")
+                return
+            if message is None:
+                return
+            try:
+                op = message.get('op')
+                if op == 'sentiment':
+                    texts = message.get('texts')
+                    if not isinstance(texts, list) or not all(isinstance(text, str) for text in texts):
+                        raise ValueError("'texts' must be a list of strings")
+                    reply = {'results': server.batcher.submit([text[:512] for text in texts])}
+                elif op == 'ping':
+                    reply = {'pid': os.getpid()}
+                elif op == 'stats':
+                    reply = {'stats': {
+                        'pid': os.getpid(),
+                        'model': type(server.sentiment_model).__name__,
+                        'batching': server.batcher.stats(),
+                    }}
+                else:
+                    raise ValueError(f"unknown op {op!r}")
+            except ValueError as e:
+                server.logger.warning(f"Rejected model server request: {e}")
+                reply = {'error': str(e)}
+            except Exception as e:
+                server.logger.error(f"Model server request failed: {e}", exc_info=True)
+                reply = {'error': str(e)}
+            try:
+                send_message(self.connection, reply)
+            except OSError:
+                return
+
+
+class ModelServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Unix socket server around one sentiment model and its request coalescer.
+
+    Args:
+        socket_path: Socket file to create
+        sentiment_model: Sentiment pipeline (or cascade) answering the requests
+        logger: Logger of the server
+        max_batch_size: Largest coalesced forward pass
+        max_wait_ms: Longest wait for more texts before a forward pass
+    """
+
+    daemon_threads = True
+    # Every client thread holds its own connection
+    request_queue_size = 128
+
+    def __init__(self, socket_path: Union[str, Path], sentiment_model, logger,
+                 max_batch_size: int = DEFAULT_MAX_BATCH_SIZE, max_wait_ms: float = DEFAULT_MAX_WAIT_MS):
+        self.socket_path = Path(socket_path)
+        self.sentiment_model = sentiment_model
+        self.logger = logger
+        self.batcher = MicroBatcher(
+            lambda texts: sentiment_model(texts, batch_size=max_batch_size),
+            max_batch_size=max_batch_size,
+            max_wait_ms=max_wait_ms
+        )
+        if self.socket_path.exists():
+            if RemoteSentimentModel(self.socket_path, timeout=5).ping():
+                raise RuntimeError(f"A model server is already listening on {self.socket_path}")
+            # Left behind by a server that did not shut down cleanly
+            self.socket_path.unlink()
+        self.socket_path.parent.mkdir(parents=True, exist_ok=True)
+        super().__init__(str(self.socket_path), _ModelHandler)
+
+    def server_close(self):
+        super().server_close()
+        if self.socket_path.exists():
+            self.socket_path.unlink()
+
+
+def main():
+    """
+    Main execution function.
+    """
+    parser = argparse.ArgumentParser(description="SentimentPro shared sentiment model server")
+    parser.add_argument("--socket", default=os.getenv("SENTIMENTPRO_MODEL_SOCKET") or str(DEFAULT_SOCKET_PATH),
+                        help="Unix socket to listen on")
+    parser.add_argument("--max-batch-size", type=int, default=DEFAULT_MAX_BATCH_SIZE)
+    parser.add_argument("--max-wait-ms", type=float, default=DEFAULT_MAX_WAIT_MS)
+    parser.add_argument("--metrics-port", type=int, help="Serve Prometheus metrics of the server on this port")
+    args = parser.parse_args()
+
+    from analyse import load_models, logger
+    from metrics import start_metrics_server
+
+    sentiment_model = load_models(model_server="")
+    server = ModelServer(args.socket, sentiment_model, logger, args.max_batch_size, args.max_wait_ms)
+    # Unlink the socket on SIGTERM as well as on Ctrl-C
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    if args.metrics_port is not None:
+        start_metrics_server(args.metrics_port)
+    logger.info(f"Model server {os.getpid()} listening on {args.socket}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        logger.info("Model server stopped")
+
+
+if __name__ == "__main__":
+    main()
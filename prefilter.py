@@ -0,0 +1,163 @@
+"""
+Comment normalization and pre-filter, run before model inference.
+
+Extracted comments still carry junk that costs a sentiment forward pass and
+a Gemini topic call each: links, @mentions, UI leftovers captured with the
+comment ("Répondre", "J'aime", "2 h") and emoji-only lines. A CommentFilter
+cleans and screens a whole batch at once with precompiled regexes over a
+pandas string column, and counts what it removed and why for the run report.
+
+The same comment seen on two overlapping screenshots (or posted by several
+users) stays a row of its own; an AnalysisCache hands the first analysis of
+a text to its repeats instead of running the models again.
+"""
+
+import re
+import threading
+from collections import Counter, OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from metrics import CACHE_LOOKUPS, COMMENTS_FILTERED
+
+MIN_COMMENT_LENGTH = 10
+ANALYSIS_CACHE_ENTRIES = 10000
+
+# Interface text captured around comments on social/app screenshots
+UI_LEFTOVERS = [
+    r"répondre", r"j['’]aime", r"je n['’]aime (?:plus|pas)", r"voir (?:la traduction|plus|moins|les réponses)",
+    r"voir \d+ réponses?", r"afficher (?:plus|la traduction)", r"traduire", r"partager", r"signaler",
+    r"modifié", r"épinglé", r"auteur", r"il y a \d+\s*\w+", r"\d+\s*(?:s|min|h|j|sem|mois|ans?)",
+    r"\d+\s*(?:j['’]aime|réponses?|likes?)",
+]
+_UI = "(?:" + "|".join(UI_LEFTOVERS) + ")"
+_SEPARATORS = r"[\s·•|:\-]*"
+
+URL = re.compile(r"(?:https?://|www\.)\S+", re.IGNORECASE)
+MENTION = re.compile(r"(?<!\w)@[\w.]+")
+# A line made of UI text only
+UI_LINE = re.compile(rf"{_SEPARATORS}{_UI}(?:{_SEPARATORS}{_UI})*{_SEPARATORS}", re.IGNORECASE)
+# UI text after a hard separator at the end of a comment ("Super service · 2 h · Répondre")
+UI_TRAILER = re.compile(rf"\s*[·•|\n]{_SEPARATORS}{_UI}(?:{_SEPARATORS}{_UI})*{_SEPARATORS}$", re.IGNORECASE)
+WHITESPACE = re.compile(r"\s+")
+LETTER = re.compile(r"[^\W\d_]")
+
+REASONS = ['ui', 'link_only', 'no_text', 'too_short']
+
+
+class CommentFilter:
+    """
+    Batch normalizer and junk filter for the comments of one run.
+
+    Args:
+        min_length: Shortest cleaned comment kept
+    """
+
+    def __init__(self, min_length: int = MIN_COMMENT_LENGTH):
+        self.min_length = min_length
+        self.seen = 0
+        self.kept = 0
+        self.removed = Counter()
+        self.cleaned = Counter()
+        self._lock = threading.Lock()
+
+    def __call__(self, comments: List[str]) -> List[str]:
+        """
+        Clean a batch of comments and drop the junk.
+
+        Args:
+            comments: Raw comment texts
+
+        Returns:
+            list: Cleaned comments worth analyzing, in their original order
+        """
+        if not comments:
+            return []
+        text = pd.Series(comments, dtype=object).fillna('').astype(str).str.normalize('NFC')
+
+        ui_only = text.str.fullmatch(UI_LINE)
+        has_url = text.str.contains(URL)
+        has_mention = text.str.contains(MENTION)
+        text = text.str.replace(URL, ' ', regex=True).str.replace(MENTION, ' ', regex=True)
+        stripped = text.str.replace(UI_TRAILER, '', regex=True)
+        has_ui = stripped != text
+        text = stripped.str.replace(WHITESPACE, ' ', regex=True).str.strip()
+        has_letters = text.str.contains(LETTER)
+
+        reason = pd.Series(np.select(
+            [ui_only, ~has_letters & (has_url | has_mention), ~has_letters, text.str.len() < self.min_length],
+            ['ui', 'link_only', 'no_text', 'too_short'],
+            default=''
+        ), index=text.index)
+        keep = reason == ''
+
+        removed = reason[~keep].value_counts()
+        cleaned = {'url': int((keep & has_url).sum()), 'mention': int((keep & has_mention).sum()),
+                   'ui': int((keep & has_ui).sum())}
+        with self._lock:
+            self.seen += len(text)
+            self.kept += int(keep.sum())
+            self.removed.update(removed.to_dict())
+            self.cleaned.update({name: count for name, count in cleaned.items() if count})
+        for name, count in removed.items():
+            COMMENTS_FILTERED.labels(name).inc(int(count))
+        return text[keep].tolist()
+
+    def report(self) -> Dict:
+        """Comments seen and kept, removals by reason and kept comments cleaned of links/mentions/UI text."""
+        with self._lock:
+            return {
+                'seen': self.seen,
+                'kept': self.kept,
+                'removed': {name: self.removed[name] for name in REASONS if self.removed[name]},
+                'cleaned': dict(self.cleaned),
+            }
+
+    def describe(self) -> str:
+        """One-line summary of report() for the logs."""
+        report = self.report()
+        removed = ", ".join(f"{name}={count}" for name, count in report['removed'].items()) or "none"
+        cleaned = ", ".join(f"{name}={count}" for name, count in report['cleaned'].items()) or "none"
+        return (f"{report['seen'] - report['kept']}/{report['seen']} comment(s) removed ({removed}), "
+                f"cleaned: {cleaned}")
+
+
+class AnalysisCache:
+    """
+    Bounded LRU of analysis results by comment text (case-insensitive).
+
+    Repeated comments keep their own record but reuse the sentiment and
+    topic/theme of the first occurrence. Least recently used texts are
+    evicted past max_entries, so memory stays flat on long runs.
+
+    Args:
+        max_entries: Most comment texts remembered
+    """
+
+    def __init__(self, max_entries: int = ANALYSIS_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self.hits = 0
+        self._entries: "OrderedDict[str, Tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, comment: str) -> Optional[Tuple]:
+        """Analysis stored for this text, or None."""
+        key = comment.casefold()
+        with self._lock:
+            analysis = self._entries.get(key)
+            if analysis is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+        CACHE_LOOKUPS.labels('analysis', 'miss' if analysis is None else 'hit').inc()
+        return analysis
+
+    def put(self, comment: str, analysis: Tuple):
+        """Remember the analysis of a text, evicting the least recently used one if full."""
+        key = comment.casefold()
+        with self._lock:
+            self._entries[key] = analysis
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
@@ -0,0 +1,191 @@
+"""
+Per-stage timing spans and the end-of-run profile.
+
+Pipeline functions are wrapped in timed() or span() blocks and their
+external API calls in api_call() blocks. The process-wide PROFILE collects durations and
+call outcomes, and reports p50/p95/p99 latency, throughput and call counts
+per stage, as a DataFrame for the logs or as JSON.
+"""
+
+import functools
+import json
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+from metrics import API_CALLS, STAGE_SECONDS
+
+STAGE_COLUMNS = ['count', 'items', 'total_seconds', 'mean_ms', 'p50_ms', 'p95_ms', 'p99_ms', 'items_per_second']
+
+
+class RunProfile:
+    """
+    Thread-safe collector of stage durations and API call outcomes.
+
+    Stages are free-form dotted names ('extract', 'gemini.upload',
+    'sentiment.forward', 'export.csv', ...). Each span records one duration
+    and the number of items it processed. Counts and totals are exact;
+    percentiles use the most recent max_samples durations of each stage, so
+    long-running workers keep a bounded footprint.
+
+    Args:
+        max_samples: Durations kept per stage for percentiles
+        export_metrics: Also feed the stage latency and API call metrics (metrics.py)
+    """
+
+    def __init__(self, max_samples: int = 10000, export_metrics: bool = False):
+        self.max_samples = max_samples
+        self.export_metrics = export_metrics
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Drop everything recorded so far and restart the wall clock."""
+        with self._lock:
+            self._durations = defaultdict(lambda: deque(maxlen=self.max_samples))
+            self._counts = Counter()
+            self._totals = Counter()
+            self._items = Counter()
+            self._calls = defaultdict(Counter)
+            self.started = time.perf_counter()
+
+    def record(self, stage: str, seconds: float, items: int = 1):
+        """Add one measured duration to a stage."""
+        with self._lock:
+            self._durations[stage].append(seconds)
+            self._counts[stage] += 1
+            self._totals[stage] += seconds
+            self._items[stage] += items
+        if self.export_metrics:
+            STAGE_SECONDS.labels(stage).observe(seconds)
+
+    def count_call(self, api: str, outcome: str = 'ok'):
+        """Count one call to an external API by outcome ('ok', 'error', ...)."""
+        with self._lock:
+            self._calls[api][outcome] += 1
+        if self.export_metrics:
+            API_CALLS.labels(api, outcome).inc()
+
+    @contextmanager
+    def span(self, stage: str, items: int = 1):
+        """Time the enclosed block as one occurrence of a stage."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start, items)
+
+    @contextmanager
+    def api_call(self, api: str):
+        """Time an external API call and count it as 'ok' or 'error'."""
+        start = time.perf_counter()
+        outcome = 'error'
+        try:
+            yield
+            outcome = 'ok'
+        finally:
+            self.record(api, time.perf_counter() - start)
+            self.count_call(api, outcome)
+
+    def report(self) -> Dict:
+        """
+        Summarize everything recorded since the last reset.
+
+        Returns:
+            dict: 'wall_seconds', per-stage 'stages' statistics (milliseconds,
+                items per second of stage time) and 'api_calls' counts by outcome
+        """
+        with self._lock:
+            durations = {stage: np.array(values) for stage, values in self._durations.items()}
+            counts = dict(self._counts)
+            totals = dict(self._totals)
+            items = dict(self._items)
+            calls = {api: dict(outcomes) for api, outcomes in self._calls.items()}
+            wall = time.perf_counter() - self.started
+
+        stages = {}
+        for stage in sorted(durations):
+            total = totals[stage]
+            p50, p95, p99 = np.percentile(durations[stage], [50, 95, 99]) * 1000
+            stages[stage] = {
+                'count': counts[stage],
+                'items': items[stage],
+                'total_seconds': round(total, 4),
+                'mean_ms': round(total / counts[stage] * 1000, 2),
+                'p50_ms': round(float(p50), 2),
+                'p95_ms': round(float(p95), 2),
+                'p99_ms': round(float(p99), 2),
+                'items_per_second': round(items[stage] / total, 2) if total > 0 else None,
+            }
+        return {'wall_seconds': round(wall, 4), 'stages': stages, 'api_calls': calls}
+
+    def frame(self) -> pd.DataFrame:
+        """Per-stage statistics as a DataFrame, for log summaries."""
+        stages = self.report()['stages']
+        return pd.DataFrame.from_dict(stages, orient='index', columns=STAGE_COLUMNS)
+
+    def write_json(self, path: str, **extra) -> Dict:
+        """
+        Write the report to a JSON file.
+
+        Args:
+            path: Output file
+            **extra: Run-level values added to the report (e.g. comments, comments_per_second)
+
+        Returns:
+            dict: The report as written
+        """
+        report = {**self.report(), **extra}
+        Path(path).write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding='utf-8')
+        return report
+
+
+# Process-wide profile used by the pipeline functions
+PROFILE = RunProfile(export_metrics=True)
+
+
+def span(stage: str, items: int = 1):
+    """Time a block as one occurrence of a stage of the process-wide profile."""
+    return PROFILE.span(stage, items)
+
+
+def api_call(api: str):
+    """Time and count an external API call on the process-wide profile."""
+    return PROFILE.api_call(api)
+
+
+def timed(stage: str):
+    """Decorator timing every call of a function as one occurrence of a stage."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with PROFILE.span(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def instrument_pipeline(sentiment_pipeline, profile: RunProfile = None):
+    """
+    Split a transformers pipeline's time into tokenization and model forward spans.
+
+    The pipeline looks up preprocess/forward on the instance for every call,
+    so wrapping them there is enough; the pipeline is returned for chaining.
+    """
+    profile = profile if profile is not None else PROFILE
+
+    def wrap(stage, method):
+        def wrapper(*args, **kwargs):
+            with profile.span(stage):
+                return method(*args, **kwargs)
+        return wrapper
+
+    sentiment_pipeline.preprocess = wrap('sentiment.tokenize', sentiment_pipeline.preprocess)
+    sentiment_pipeline.forward = wrap('sentiment.forward', sentiment_pipeline.forward)
+    return sentiment_pipeline
@@ -0,0 +1,207 @@
+"""
+Persistent SQLite store of analysis results.
+
+Every batch (UI upload or worker job, CLI run, API request) is stored under its batch_id
+with records following Entities/CommentAnalysis.json, so past analyses can
+be listed and reopened without calling the APIs again. Aggregates are
+computed in SQL rather than over a full DataFrame.
+"""
+
+import os
+import sqlite3
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from aggregates import ResultAggregates
+
+DATA_DIR = Path(os.getenv("SENTIMENTPRO_DATA_DIR", ".sentimentpro"))
+STORE_PATH = DATA_DIR / "results.db"
+
+RECORD_COLUMNS = ['image_source', 'comment', 'sentiment', 'confidence', 'topic', 'theme']
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS batches (
+    batch_id TEXT PRIMARY KEY,
+    created_at TEXT NOT NULL,
+    source TEXT NOT NULL,
+    images INTEGER NOT NULL DEFAULT 0,
+    comments INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS comments (
+    batch_id TEXT NOT NULL,
+    image_source TEXT,
+    comment TEXT NOT NULL,
+    sentiment TEXT NOT NULL,
+    confidence REAL,
+    topic TEXT,
+    theme TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_comments_batch ON comments (batch_id);
+"""
+
+
+def new_batch_id() -> str:
+    """Generate a sortable, unique batch identifier."""
+    return f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+
+
+class ResultsStore:
+    """
+    Batches and their analyzed comments in one SQLite file.
+
+    Each call opens its own connection, so instances are safe to share
+    between threads and cheap to create in every process.
+    """
+
+    def __init__(self, db_path: Path = STORE_PATH):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def create_batch(self, batch_id: str, source: str, images: int = 0):
+        """
+        Register a batch (idempotent).
+
+        Args:
+            batch_id: Batch identifier
+            source: Where the batch comes from ('upload', 'cli', 'text', 'api')
+            images: Number of images in the batch
+        """
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO batches (batch_id, created_at, source, images) VALUES (?, ?, ?, ?)",
+                (batch_id, datetime.now().isoformat(timespec='seconds'), source, images)
+            )
+
+    def add_records(self, batch_id: str, records: List[Dict]):
+        """Append analyzed records to a batch."""
+        if not records:
+            return
+        with self._connect() as conn:
+            conn.executemany(
+                f"INSERT INTO comments (batch_id, {', '.join(RECORD_COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(batch_id, *(record.get(column) for column in RECORD_COLUMNS)) for record in records]
+            )
+            conn.execute(
+                "UPDATE batches SET comments = comments + ? WHERE batch_id = ?",
+                (len(records), batch_id)
+            )
+
+    def comment_ids(self, batch_id: str) -> List[int]:
+        """Row ids of the records of a batch, in insertion order (aligned with load_batch)."""
+        with self._connect() as conn:
+            return [row[0] for row in conn.execute(
+                "SELECT rowid FROM comments WHERE batch_id = ? ORDER BY rowid", (batch_id,)
+            )]
+
+    def set_labels(self, labels: List[Tuple[int, str, str]]):
+        """
+        Fill in the topic and theme of stored records.
+
+        Args:
+            labels: (row id from comment_ids, topic, theme) triples
+        """
+        with self._connect() as conn:
+            conn.executemany(
+                "UPDATE comments SET topic = ?, theme = ? WHERE rowid = ?",
+                [(topic, theme, row_id) for row_id, topic, theme in labels]
+            )
+
+    def delete_records(self, batch_id: str):
+        """Drop every record of a batch, keeping the batch itself."""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM comments WHERE batch_id = ?", (batch_id,))
+            conn.execute("UPDATE batches SET comments = 0 WHERE batch_id = ?", (batch_id,))
+
+    def labeled_comments(self) -> pd.DataFrame:
+        """Comment text and sentiment of every stored record, oldest first."""
+        with self._connect() as conn:
+            return pd.read_sql_query("SELECT comment, sentiment FROM comments ORDER BY rowid", conn)
+
+    def list_batches(self, limit: int = 100) -> pd.DataFrame:
+        """Most recent batches first."""
+        with self._connect() as conn:
+            return pd.read_sql_query(
+                "SELECT batch_id, created_at, source, images, comments FROM batches "
+                "ORDER BY created_at DESC, rowid DESC LIMIT ?",
+                conn,
+                params=(limit,)
+            )
+
+    def load_batch(self, batch_id: str, offset: int = 0) -> pd.DataFrame:
+        """
+        Records of a batch, in insertion order.
+
+        Args:
+            batch_id: Batch identifier
+            offset: Number of leading records to skip (already loaded by the caller)
+
+        Returns:
+            pd.DataFrame: Records following Entities/CommentAnalysis.json
+        """
+        with self._connect() as conn:
+            return pd.read_sql_query(
+                f"SELECT {', '.join(RECORD_COLUMNS)} FROM comments WHERE batch_id = ? "
+                "ORDER BY rowid LIMIT -1 OFFSET ?",
+                conn,
+                params=(batch_id, offset)
+            )
+
+    def aggregates(self, batch_id: str, bins: Optional[int] = None) -> ResultAggregates:
+        """
+        Build the aggregates of a batch with GROUP BY queries.
+
+        Args:
+            batch_id: Batch identifier
+            bins: Number of confidence histogram bins (ResultAggregates default if None)
+
+        Returns:
+            ResultAggregates: Same structure as ResultAggregates.from_frame
+        """
+        aggregates = ResultAggregates() if bins is None else ResultAggregates(bins)
+        n_bins = len(aggregates.confidence_counts)
+        with self._connect() as conn:
+            total, confidence_sum = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(confidence), 0) FROM comments WHERE batch_id = ?",
+                (batch_id,)
+            ).fetchone()
+            aggregates.total = total
+            aggregates.confidence_sum = confidence_sum
+
+            for column, counter in (('sentiment', aggregates.sentiments),
+                                    ('theme', aggregates.themes),
+                                    ('topic', aggregates.topics)):
+                for value, count in conn.execute(
+                    f"SELECT {column}, COUNT(*) FROM comments WHERE batch_id = ? AND {column} IS NOT NULL "
+                    f"GROUP BY {column}",
+                    (batch_id,)
+                ):
+                    counter[value] = count
+
+            for theme, sentiment, count in conn.execute(
+                "SELECT theme, sentiment, COUNT(*) FROM comments "
+                "WHERE batch_id = ? AND theme IS NOT NULL GROUP BY theme, sentiment",
+                (batch_id,)
+            ):
+                aggregates.crosstab[(theme, sentiment)] = count
+
+            # Same bins as np.histogram over [0, 1]: the last bin includes 1.0
+            for bin_idx, count in conn.execute(
+                "SELECT MIN(MAX(CAST(confidence * ? AS INTEGER), 0), ? - 1), COUNT(*) FROM comments "
+                "WHERE batch_id = ? AND confidence IS NOT NULL GROUP BY 1",
+                (n_bins, n_bins, batch_id)
+            ):
+                aggregates.confidence_counts[bin_idx] = count
+
+        return aggregates
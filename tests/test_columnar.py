@@ -0,0 +1,60 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from columnar import RESULT_COLUMNS, RecordBuilder, ResultsWriter, read_results
+
+
+def make_records(count):
+    return [
+        {
+            'image_source': f"img{i % 3}.png",
+            'comment': f"Commentaire {i}",
+            'sentiment': ['positive', 'negative', 'neutral'][i % 3],
+            'confidence': 0.5 + (i % 50) / 100,
+            'topic': None if i % 7 == 0 else f"Sujet {i % 300}",
+            'theme': f"Thème {i % 4}",
+        }
+        for i in range(count)
+    ]
+
+
+def test_record_builder_round_trip():
+    # Enough rows to flush several times and more topics than int8 codes hold
+    records = make_records(10000)
+    builder = RecordBuilder()
+    builder.extend(records)
+
+    df = builder.to_frame()
+    expected = pd.DataFrame(records, columns=RESULT_COLUMNS)
+    assert len(builder) == len(df) == len(records)
+    assert list(df.columns) == RESULT_COLUMNS
+    for column in ('image_source', 'comment', 'sentiment', 'topic', 'theme'):
+        assert df[column].astype(object).where(df[column].notna(), None).tolist() == expected[column].tolist()
+    assert df['confidence'].dtype == np.float32
+    np.testing.assert_allclose(df['confidence'], expected['confidence'], rtol=1e-6)
+    assert isinstance(df['topic'].dtype, pd.CategoricalDtype)
+
+
+def test_record_builder_frames_are_stable_across_appends():
+    builder = RecordBuilder(started_at=datetime(2024, 1, 1, 12, 0, 0, 123))
+    builder.extend(make_records(5))
+    first = builder.to_frame()
+    snapshot = first.copy()
+    builder.extend(make_records(5000))
+
+    pd.testing.assert_frame_equal(first, snapshot)
+    assert len(builder.to_frame()) == 5005
+    assert (first['timestamp'] >= pd.Timestamp('2024-01-01 12:00:00')).all()
+
+
+def test_results_writer_round_trip(tmp_path):
+    records = make_records(50)
+    for name in ('results.parquet', 'results.arrow'):
+        with ResultsWriter(tmp_path / name) as writer:
+            writer.write_batch(records[:20])
+            writer.write_batch(pd.DataFrame(records[20:]))
+        df = read_results(tmp_path / name)
+        assert df['comment'].tolist() == [record['comment'] for record in records]
+        assert df['topic'].isna().sum() == sum(record['topic'] is None for record in records)
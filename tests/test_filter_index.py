@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from filter_index import ResultsFilterIndex, fold_series, fold_text
+
+WORDS = ["connexion", "coupée", "Cœur", "réseau", "débit", "très", "lent", "Super", "l'appli",
+         "ex-aequo", "4G", "ÆSTHÉTIQUE", "panne", "service"]
+
+
+@pytest.fixture(scope="module")
+def results():
+    rng = np.random.default_rng(0)
+    size = 2000
+    return pd.DataFrame({
+        'comment': [" ".join(rng.choice(WORDS, 5)) for _ in range(size)],
+        'sentiment': rng.choice(['positive', 'negative', 'neutral'], size),
+        'theme': rng.choice(['Réseau', 'Service', None], size),
+    })
+
+
+def baseline_rows(df, search="", sentiment=None, theme=None):
+    mask = pd.Series(True, index=df.index)
+    if sentiment is not None:
+        mask &= df['sentiment'] == sentiment
+    if theme is not None:
+        mask &= df['theme'] == theme
+    if search.strip():
+        mask &= fold_series(df['comment']).str.contains(fold_text(search.strip()), regex=False)
+    return np.flatnonzero(mask.to_numpy())
+
+
+@pytest.mark.parametrize("search", [
+    "", "connexion", "onnexion", "CONNEX", "coupee", "coupée", "cœur", "coeur", "aesthe", "eau déb",
+    "l'app", "-aeq", "4g", "e", "nnexion coup", "  panne ", "introuvable",
+])
+def test_search_matches_str_contains(results, search):
+    index = ResultsFilterIndex(results)
+    assert np.array_equal(index.filter(search), baseline_rows(results, search))
+
+
+def test_combined_filters_match_baseline(results):
+    index = ResultsFilterIndex(results)
+    for search, sentiment, theme in [("panne", "negative", None), ("", None, "Service"),
+                                     ("débit", "positive", "Réseau"), ("cœur", None, "Inconnu")]:
+        rows = index.filter(search, sentiment, theme)
+        assert np.array_equal(rows, baseline_rows(results, search, sentiment, theme))
+        # Memoized results are the same rows
+        assert index.filter(search, sentiment, theme) is rows
+
+
+@pytest.mark.parametrize("search", ["😡", "🔥 ✨", "\u200b"])
+def test_search_folding_to_nothing_matches_nothing(results, search):
+    index = ResultsFilterIndex(results)
+    assert len(index.filter(search)) == 0
+    assert len(index.filter("   ")) == len(results)
+
+
+def test_fold_text_spells_out_ligatures():
+    assert fold_text("Cœur ÆSTHÉTIQUE") == "coeur aesthetique"
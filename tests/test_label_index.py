@@ -0,0 +1,27 @@
+import pytest
+
+from label_index import INVARIABLE_WORDS, LabelIndex, fold_plurals, normalize_label
+
+
+@pytest.mark.parametrize("label", ["Prix", "Accès", "Choix", "Succès", "Procès", "Progrès", "Temps d'accès"])
+def test_fold_plurals_keeps_invariable_words(label):
+    key = normalize_label(label)
+    assert fold_plurals(key) == key
+
+
+def test_invariable_words_are_normalized_keys():
+    assert all(normalize_label(word) == word for word in INVARIABLE_WORDS)
+
+
+def test_fold_plurals_singularizes_plurals():
+    assert fold_plurals(normalize_label("Problèmes de connexion")) == "probleme connexion"
+    assert fold_plurals(normalize_label("Réseaux")) == "reseau"
+
+
+def test_singular_and_plural_labels_merge():
+    index = LabelIndex()
+    assert index.canonicalize("Problèmes de connexion") == "Problèmes de connexion"
+    assert index.canonicalize("Problème de connexion") == "Problèmes de connexion"
+    assert index.canonicalize("Prix") == "Prix"
+    assert index.canonicalize("Accès") == "Accès"
+    assert index.canonicalize("Pris") != "Prix"
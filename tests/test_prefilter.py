@@ -0,0 +1,50 @@
+from prefilter import AnalysisCache, CommentFilter
+
+
+def test_comment_filter_cleans_and_drops_junk():
+    comment_filter = CommentFilter()
+    comments = comment_filter([
+        "Répondre",
+        "https://example.com/promo",
+        "😡😡😡",
+        "Nul !",
+        "Service client  injoignable depuis hier https://t.co/x @operateur · 2 h · Répondre",
+        "La fibre fonctionne enfin, merci !",
+    ])
+
+    assert comments == ["Service client injoignable depuis hier", "La fibre fonctionne enfin, merci !"]
+    report = comment_filter.report()
+    assert report['seen'] == 6
+    assert report['kept'] == 2
+    assert report['removed'] == {'ui': 1, 'link_only': 1, 'no_text': 1, 'too_short': 1}
+    assert report['cleaned'] == {'url': 1, 'mention': 1, 'ui': 1}
+
+
+def test_comment_filter_keeps_repeated_comments():
+    comment_filter = CommentFilter()
+    first = comment_filter(["Encore une coupure ce matin", "encore une coupure ce matin"])
+    second = comment_filter(["Encore une coupure ce matin"])
+
+    assert first == ["Encore une coupure ce matin", "encore une coupure ce matin"]
+    assert second == ["Encore une coupure ce matin"]
+    assert comment_filter.report()['kept'] == 3
+
+
+def test_comment_filter_empty_batch():
+    comment_filter = CommentFilter()
+    assert comment_filter([]) == []
+    assert comment_filter.report() == {'seen': 0, 'kept': 0, 'removed': {}, 'cleaned': {}}
+
+
+def test_analysis_cache_is_case_insensitive_and_bounded():
+    cache = AnalysisCache(max_entries=2)
+    cache.put("Très bon service", ('positive', 0.9, "Support", "Qualité de service"))
+    cache.put("Réseau en panne", ('negative', 0.8, "Panne", "Problème technique"))
+
+    assert cache.get("TRÈS BON SERVICE") == ('positive', 0.9, "Support", "Qualité de service")
+    cache.put("Débit correct", ('neutral', 0.6, "Débit", "Avis général"))
+
+    # The least recently used text is evicted
+    assert cache.get("Réseau en panne") is None
+    assert cache.get("Très bon service") is not None
+    assert cache.hits == 2
@@ -0,0 +1,92 @@
+"""
+Thumbnail cache for the upload preview.
+
+Previews are small JPEGs built once per image content (BLAKE2 digest of the
+bytes) and kept in an in-memory LRU bounded by entry count and total size,
+so reruns and other sessions uploading the same screenshot reuse them
+instead of shipping the full-resolution upload to the browser again.
+"""
+
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+from typing import Tuple
+
+from PIL import Image
+
+from metrics import CACHE_LOOKUPS
+
+THUMBNAIL_SIZE = (320, 320)
+
+
+def content_digest(data: bytes) -> str:
+    """Hex digest identifying an image by its bytes."""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def make_thumbnail(data: bytes, size: Tuple[int, int] = THUMBNAIL_SIZE, quality: int = 80) -> bytes:
+    """
+    Downscale an encoded image to a JPEG preview.
+
+    Args:
+        data: Encoded image (PNG, JPEG...)
+        size: Bounding box of the preview, aspect ratio is kept
+        quality: JPEG quality
+
+    Returns:
+        bytes: JPEG-encoded thumbnail
+    """
+    with Image.open(io.BytesIO(data)) as image:
+        # JPEG decoders can downscale while decoding
+        image.draft('RGB', size)
+        image.thumbnail(size)
+        if image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        output = io.BytesIO()
+        image.save(output, format='JPEG', quality=quality, optimize=True)
+    return output.getvalue()
+
+
+class ThumbnailCache:
+    """
+    LRU of JPEG thumbnails keyed by image content digest, safe to share between sessions.
+
+    Args:
+        max_entries: Number of thumbnails kept
+        max_bytes: Total size of the kept thumbnails
+        size: Bounding box of the thumbnails
+    """
+
+    def __init__(self, max_entries: int = 512, max_bytes: int = 32 * 1024 * 1024,
+                 size: Tuple[int, int] = THUMBNAIL_SIZE):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size = size
+        self.bytes = 0
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, data: bytes) -> bytes:
+        """Thumbnail of an encoded image, built on the first request for its content."""
+        digest = content_digest(data)
+        with self._lock:
+            thumbnail = self._entries.get(digest)
+            if thumbnail is not None:
+                self._entries.move_to_end(digest)
+                CACHE_LOOKUPS.labels('thumbnails', 'hit').inc()
+                return thumbnail
+        CACHE_LOOKUPS.labels('thumbnails', 'miss').inc()
+
+        thumbnail = make_thumbnail(data, self.size)
+        with self._lock:
+            if digest not in self._entries:
+                self._entries[digest] = thumbnail
+                self.bytes += len(thumbnail)
+                while self._entries and (len(self._entries) > self.max_entries or self.bytes > self.max_bytes):
+                    _, evicted = self._entries.popitem(last=False)
+                    self.bytes -= len(evicted)
+        return thumbnail
@@ -0,0 +1,155 @@
+"""
+Analysis worker processes for the SentimentPro job queue.
+
+Usage:
+    python worker.py --workers 2
+
+Each process loads the sentiment model once, then claims queued jobs from
+jobs.py and runs the analyse.py pipeline on them, one image at a time.
+"""
+
+import argparse
+import multiprocessing
+import os
+import socket
+import threading
+import time
+
+from analyse import (
+    GOOGLE_API_KEY,
+    analyze_comments,
+    extract_comments_from_screenshot,
+    load_models,
+    logger,
+)
+from cassette import env_mode, install_from_env
+from jobs import JobQueue
+from label_index import LabelIndex
+from memory import budget_from_env
+from metrics import QUEUE_DEPTH, metrics_port_from_env, start_metrics_server
+from prefilter import AnalysisCache, CommentFilter
+from profiling import PROFILE
+
+HEARTBEAT_SECONDS = 10
+
+
+def run_job(queue: JobQueue, job, sentiment_model, theme_index: LabelIndex, topic_index: LabelIndex):
+    """
+    Analyze every image of a claimed job, storing each record as soon as it is ready.
+
+    Args:
+        queue: Job queue the job was claimed from
+        job: Job dict returned by JobQueue.claim
+        sentiment_model: Sentiment analysis pipeline
+        theme_index: Canonical theme labels
+        topic_index: Canonical topic labels
+    """
+    batch_id = job['batch_id']
+    logger.info(f"Starting job {batch_id} ({job['total_images']} image(s))")
+    PROFILE.reset()
+    budget = budget_from_env()
+    comment_filter = CommentFilter()
+    analysis_cache = AnalysisCache()
+    try:
+        for name, path in job['images']:
+            if budget is not None:
+                budget.wait_for_headroom()
+            started = time.perf_counter()
+            comments = extract_comments_from_screenshot(path)
+            comments = comment_filter(comments)
+            last = time.perf_counter()
+            queue.record_extraction(batch_id, len(comments), last - started)
+
+            def on_record(record):
+                nonlocal last
+                now = time.perf_counter()
+                queue.add_record(batch_id, record, now - last)
+                last = now
+
+            analyze_comments(comments, name, sentiment_model, theme_index, topic_index, on_record=on_record,
+                             analysis_cache=analysis_cache)
+            queue.image_done(batch_id)
+        queue.finish(batch_id)
+        logger.info(f"Job {batch_id} done, stage timings:\n{PROFILE.frame().to_string()}")
+        logger.info(f"Job {batch_id} pre-filter: {comment_filter.describe()}")
+        if budget is not None:
+            logger.info(f"Job {batch_id} memory: {budget.report()}")
+    except Exception as e:
+        logger.error(f"Job {batch_id} failed: {e}", exc_info=True)
+        queue.finish(batch_id, error=str(e))
+
+
+def worker_loop(poll_interval: float, metrics_port: int = None):
+    """
+    Claim and run jobs forever.
+
+    Args:
+        poll_interval: Seconds to wait when the queue is empty
+        metrics_port: Serve Prometheus metrics of this process on this port, if given
+    """
+    worker_id = f"{socket.gethostname()}-{os.getpid()}"
+    install_from_env()
+    queue = JobQueue()
+    QUEUE_DEPTH.labels('jobs').set_function(queue.pending_jobs)
+    if metrics_port is not None:
+        start_metrics_server(metrics_port)
+        logger.info(f"Worker {worker_id} metrics on port {metrics_port}")
+    sentiment_model = load_models()
+    theme_index = LabelIndex()
+    topic_index = LabelIndex()
+
+    def beat():
+        while True:
+            queue.heartbeat(worker_id)
+            time.sleep(HEARTBEAT_SECONDS)
+
+    threading.Thread(target=beat, daemon=True).start()
+    logger.info(f"Worker {worker_id} ready")
+
+    while True:
+        job = queue.claim(worker_id)
+        if job is None:
+            time.sleep(poll_interval)
+            continue
+        run_job(queue, job, sentiment_model, theme_index, topic_index)
+
+
+def main():
+    """
+    Main execution function.
+    """
+    parser = argparse.ArgumentParser(description="SentimentPro analysis workers")
+    parser.add_argument("--workers", type=int, default=1, help="Number of worker processes")
+    parser.add_argument("--poll-interval", type=float, default=1.0, help="Seconds between queue polls")
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        default=metrics_port_from_env(),
+        help="Serve Prometheus metrics; worker i listens on this port + i"
+    )
+    args = parser.parse_args()
+
+    if not GOOGLE_API_KEY and env_mode() != 'replay':
+        logger.error("FATAL: GOOGLE_API_KEY not found.")
+        return
+
+    if args.workers == 1:
+        worker_loop(args.poll_interval, args.metrics_port)
+        return
+
+    processes = [
+        multiprocessing.Process(
+            target=worker_loop,
+            args=(args.poll_interval, None if args.metrics_port is None else args.metrics_port + index),
+            daemon=True
+        )
+        for index in range(args.workers)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+
+if __name__ == "__main__":
+    main()